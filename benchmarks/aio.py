@@ -0,0 +1,91 @@
+"""How long an event loop is held up while a large script is parsed
+
+A task ticks every millisecond while the script is parsed inline
+with loads, in a pool of threads and of processes with aloads,
+and a batch at a time with aiterload. The longest wait between
+ticks is how long any other request would have been held up.
+
+    python -m benchmarks.aio [size] [workers]
+"""
+
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import clouscript
+from clouscript.aio import AsyncParser
+
+from .corpus import WORKLOADS
+
+
+async def ticking(coroutine):
+    """Await a coroutine while ticking, giving back its result,
+    the time it took and the longest wait between two ticks"""
+
+    waits = []
+
+    async def tick():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            waits.append(time.perf_counter() - start)
+
+    ticker = asyncio.ensure_future(tick())
+    await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    result = await coroutine
+    elapsed = time.perf_counter() - start
+
+    # Let the tick which was held up last finish
+    await asyncio.sleep(0.01)
+    ticker.cancel()
+
+    return result, elapsed, max(waits)
+
+
+async def inline(source):
+    return clouscript.loads(source)
+
+
+async def collect(iterator):
+    return [element async for element in iterator]
+
+
+async def run(source, workers):
+    tree = clouscript.loads(source)
+    elements = list(clouscript.iterload(io.StringIO(source)))
+
+    with ThreadPoolExecutor(workers) as threads, ProcessPoolExecutor(workers) as processes:
+        # Start the processes before timing
+        await AsyncParser(executor=processes).loads('')
+
+        cases = [
+            ('inline', lambda: inline(source)),
+            ('threads', lambda: AsyncParser(executor=threads).loads(source)),
+            ('processes', lambda: AsyncParser(executor=processes).loads(source)),
+            ('iterload', lambda: collect(AsyncParser(executor=threads).iterload(io.StringIO(source)))),
+        ]
+
+        for name, coroutine in cases:
+            result, elapsed, wait = await ticking(coroutine())
+
+            if name == 'iterload':
+                assert result == elements
+            else:
+                assert result == tree
+
+            print(f'  {name:>9}: {elapsed:7.3f} s, held up for {wait * 1000:8.1f} ms at most')
+
+
+def main(size=1000000, workers=4):
+    source = WORKLOADS['calls'](size, 0)
+    print(f'{len(source)} characters')
+
+    asyncio.run(run(source, workers))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
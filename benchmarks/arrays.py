@@ -0,0 +1,78 @@
+"""Time and peak memory to parse a script of large numeric arrays,
+with an element for every number and with arrays lexed in one go
+
+The script assigns arrays of floats and of integers to labels, one
+array on every line. With the arrays option of the grammar, every
+array becomes a single ARRAY element holding an array.array.
+
+    python -m benchmarks.arrays [numbers per array] [arrays] [seed]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from clouscript.grammar import Grammar
+from clouscript.lexer import Lexer
+from clouscript.parser import Parser
+
+
+def script(numbers, arrays, seed=0):
+    """Lines of labels set to arrays, every other of floats and integers"""
+
+    rng = random.Random(seed)
+    lines = []
+
+    for i in range(arrays):
+        if i % 2:
+            values = (str(rng.randrange(-10 ** 6, 10 ** 6)) for _ in range(numbers))
+        else:
+            values = (f'{rng.uniform(-1000, 1000):.6f}' for _ in range(numbers))
+
+        lines.append(f'column{i} = [{", ".join(values)}]')
+
+    return '\n'.join(lines)
+
+
+def measured(function):
+    """Get the result of a function, the time it took and its peak memory
+
+    The function is called twice, since tracing memory
+    slows down the allocations which are being compared
+    """
+
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def main(numbers=200000, arrays=4, seed=0):
+    source = script(numbers, arrays, seed)
+    print(f'{arrays} arrays of {numbers} numbers, {len(source)} characters')
+
+    results = {}
+
+    for name, grammar in (('elements', Grammar()), ('arrays', Grammar(arrays=16))):
+        lexer = Lexer(grammar=grammar)
+        parser = Parser(grammar=grammar)
+
+        tree, elapsed, peak = measured(lambda: parser.parse(list(lexer.lex(source))))
+        print(f'  {name + ":":9} {elapsed:7.3f} s {peak / 2 ** 20:8.2f} MiB peak')
+
+        results[name] = tree
+
+    # Both give the same numbers for every label
+    for section, array in zip(results['elements'].value, results['arrays'].value):
+        assert [e.value for e in section.value[1].value] == array.value[1].value.tolist()
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
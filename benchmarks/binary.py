@@ -0,0 +1,92 @@
+"""Size of a large script's tree, and time to write and load it,
+in the binary format and pickled
+
+Loading from a memory mapped file is timed both lazily, where only
+the root is made, and eagerly, where every element is, and lastly
+through the on-disk store of a ParseCache.
+
+    python -m benchmarks.binary [workload] [size] [seed]
+"""
+
+import os
+import pickle
+import sys
+import tempfile
+import time
+import zlib
+
+import clouscript
+from clouscript import binary
+from clouscript.cache import ParseCache
+
+from .corpus import WORKLOADS
+
+
+def timed(function):
+    """Get the result of a function and the time it took"""
+
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def walk(tree):
+    """Read every element in a tree"""
+
+    count = 0
+    stack = [tree]
+
+    while stack:
+        element = stack.pop()
+        count += 1
+
+        if type(element.value) is tuple:
+            stack.extend(element.value)
+
+    return count
+
+
+def main(workload='nested', size=2000000, seed=0):
+    source = WORKLOADS[workload](size, seed)
+    tree = clouscript.loads(source)
+
+    print(f'{workload}: {len(source)} characters, {walk(tree)} elements')
+
+    data, elapsed = timed(lambda: binary.dumps(tree))
+    print(f'  binary:  {len(data) / 2 ** 20:6.2f} MiB written in {elapsed:6.3f} s')
+
+    pickled, elapsed = timed(lambda: zlib.compress(pickle.dumps(tree, pickle.HIGHEST_PROTOCOL)))
+    print(f'  pickled: {len(pickled) / 2 ** 20:6.2f} MiB written in {elapsed:6.3f} s')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'tree.bin')
+        with open(path, 'wb') as file:
+            binary.dump(tree, file)
+
+        loaded, elapsed = timed(lambda: binary.load_mapped(path, lazy=True))
+        print(f'  mapped, lazily:  {elapsed * 1000:9.3f} ms')
+
+        _, elapsed = timed(lambda: walk(loaded))
+        print(f'    and read:      {elapsed * 1000:9.3f} ms')
+
+        loaded, elapsed = timed(lambda: binary.load_mapped(path))
+        print(f'  mapped, eagerly: {elapsed * 1000:9.3f} ms')
+        assert loaded == tree
+
+        _, elapsed = timed(lambda: pickle.loads(zlib.decompress(pickled)))
+        print(f'  unpickled:       {elapsed * 1000:9.3f} ms')
+
+        # Parse once to fill the store on disk, then load
+        # from it with a cache whose memory is empty
+        ParseCache(directory=directory).loads(source, clouscript.default_lexer(),
+                                             clouscript.default_parser())
+        cache = ParseCache(directory=directory)
+
+        loaded, elapsed = timed(lambda: cache.loads(source, clouscript.default_lexer(),
+                                                    clouscript.default_parser()))
+        print(f'  from the cache:  {elapsed * 1000:9.3f} ms')
+        assert cache.disk_hits == 1 and loaded == tree
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *map(int, sys.argv[2:]))
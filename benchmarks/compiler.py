@@ -0,0 +1,89 @@
+"""Time to evaluate an expression with many bindings of its variables
+
+The expression is evaluated by walking its tree, with the function
+compiled from it, and with the same expression written in Python.
+
+    python -m benchmarks.compiler [bindings]
+"""
+
+import operator
+import random
+import sys
+import time
+
+import clouscript
+from clouscript.compiler import Compiler
+from clouscript.lexer import unescape
+
+
+EXPRESSION = 'price * qty + fee(region) > limit and region == "EU"'
+
+OPERATORS = {
+    'ADD': operator.add, 'MUL': operator.mul,
+    'GT': operator.gt, 'EQ': operator.eq,
+}
+
+
+def walk(element, variables, functions):
+    """Evaluate a tree by walking it, the way it would be done without compiling"""
+
+    type_ = element.type
+    value = element.value
+
+    if type_ == '':
+        return walk(value[0], variables, functions)
+    if type_ == 'LABEL':
+        return variables[value]
+    if type_ == 'STRING':
+        return unescape(value)
+    if type_ in ('INTEGER', 'FLOAT'):
+        return value
+    if type_ == 'CALL':
+        return functions[value[0].value](*(walk(e, variables, functions) for e in value[1:]))
+    if type_ == 'and':
+        return walk(value[0], variables, functions) and walk(value[1], variables, functions)
+
+    left, right = value
+    return OPERATORS[type_](walk(left, variables, functions), walk(right, variables, functions))
+
+
+def timed(function, rows):
+    start = time.perf_counter()
+    for variables in rows:
+        function(variables)
+    return time.perf_counter() - start
+
+
+def main(bindings=200000):
+    rng = random.Random(0)
+    rows = [{
+        'price': rng.random() * 100,
+        'qty': rng.randrange(10),
+        'limit': 300,
+        'region': rng.choice(['EU', 'US']),
+    } for _ in range(bindings)]
+
+    functions = {'fee': lambda region: 10 if region == 'EU' else 5}
+    fee = functions['fee']
+
+    tree = clouscript.loads(EXPRESSION)
+    compiler = Compiler(functions)
+
+    native = lambda V: V['price'] * V['qty'] + fee(V['region']) > V['limit'] and V['region'] == 'EU'
+    compiled = compiler.compile(tree)
+
+    assert all(compiled(row) == native(row) == walk(tree, row, functions) for row in rows[:1000])
+
+    print(f'{EXPRESSION}')
+    print(f'  compiled to {compiled.source}')
+
+    for name, function in (
+            ('walked', lambda row: walk(tree, row, functions)),
+            ('compiled', compiled),
+            ('python', native)):
+        elapsed = timed(function, rows)
+        print(f'  {name:>8}: {elapsed / bindings * 1e9:7.0f} ns per evaluation')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
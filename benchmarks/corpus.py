@@ -0,0 +1,163 @@
+"""Synthetic scripts which each stress one part of the lexer or parser
+
+Every workload is a function of a size in characters and a random seed,
+and gives a script of about that size which clouscript.loads can parse.
+The same size and seed always give the same script.
+
+    python -m benchmarks.corpus workload [size] [seed]
+"""
+
+import random
+import sys
+
+from clouscript.grammar import default_grammar
+
+
+def labels(rng, count):
+    return [f'{rng.choice("abcdefghxyz")}{rng.randrange(1000)}' for _ in range(count)]
+
+
+def operand(rng):
+    """A label, integer, float, hexadecimal, string or boolean"""
+
+    return rng.choice([
+        lambda: labels(rng, 1)[0],
+        lambda: str(rng.randrange(-999, 1000)),
+        lambda: f'{rng.random() * 100:.3f}',
+        lambda: f'0x{rng.randrange(1 << 16):x}',
+        lambda: f'"{labels(rng, 1)[0]}"',
+        lambda: rng.choice(['true', 'false', 'null']),
+    ])()
+
+
+def infixes(size, seed=0):
+    """Long infix chains using the infixes of every priority"""
+
+    rng = random.Random(seed)
+    words = sorted(default_grammar().infixes.infixes)
+
+    lines = []
+    length = 0
+
+    while length < size:
+        # Go through every infix at least once on each line
+        chain = words + [rng.choice(words) for _ in range(len(words))]
+        rng.shuffle(chain)
+
+        line = operand(rng) + ''.join(f' {infix} {operand(rng)}' for infix in chain) + '\n'
+        lines.append(line)
+        length += len(line)
+
+    return ''.join(lines)
+
+
+def nested(size, seed=0, depth=40):
+    """Deeply nested round, square and curly sections"""
+
+    rng = random.Random(seed)
+    pairs = ['()', '[]', '{}']
+
+    lines = []
+    length = 0
+
+    while length < size:
+        opened = [rng.choice(pairs) for _ in range(rng.randrange(depth // 2, depth + 1))]
+
+        line = ''.join(f'{operand(rng)} {pair[0]}' for pair in opened) + operand(rng) \
+             + ''.join(pair[1] for pair in reversed(opened)) + '\n'
+        lines.append(line)
+        length += len(line)
+
+    return ''.join(lines)
+
+
+def lists(size, seed=0, width=200):
+    """Wide lists delimited by semicolons and commas"""
+
+    rng = random.Random(seed)
+
+    lines = []
+    length = 0
+
+    while length < size:
+        rows = [
+            ', '.join(operand(rng) for _ in range(width // 10))
+            for _ in range(10)
+        ]
+
+        line = f'{labels(rng, 1)[0]} = [' + '; '.join(rows) + ']\n'
+        lines.append(line)
+        length += len(line)
+
+    return ''.join(lines)
+
+
+def literals(size, seed=0, length=4000):
+    """Large string literals and comments"""
+
+    rng = random.Random(seed)
+    words = labels(rng, 200)
+
+    def text(count):
+        return ' '.join(rng.choice(words) for _ in range(count))
+
+    parts = []
+    total = 0
+
+    while total < size:
+        kind = rng.randrange(3)
+        count = rng.randrange(length // 16, length // 4)
+
+        if kind == 0:
+            # Strings with escaped quotes and line breaks in them
+            body = text(count).replace(' x', ' \\"x').replace(' y', '\ny')
+            part = f'{labels(rng, 1)[0]} = "{body}"\n'
+        elif kind == 1:
+            part = f'// {text(count)}\n'
+        else:
+            part = f'/* {text(count)} */\n'
+
+        parts.append(part)
+        total += len(part)
+
+    return ''.join(parts)
+
+
+def calls(size, seed=0):
+    """Many calls, with calls among their arguments"""
+
+    rng = random.Random(seed)
+
+    def call(depth):
+        arguments = [
+            call(depth - 1) if depth and rng.random() < 0.3 else operand(rng)
+            for _ in range(rng.randrange(4))
+        ]
+        return f'{labels(rng, 1)[0]}({", ".join(arguments)})'
+
+    lines = []
+    length = 0
+
+    while length < size:
+        line = ' '.join(call(3) for _ in range(8)) + '\n'
+        lines.append(line)
+        length += len(line)
+
+    return ''.join(lines)
+
+
+WORKLOADS = {
+    'infixes': infixes,
+    'nested': nested,
+    'lists': lists,
+    'literals': literals,
+    'calls': calls,
+}
+
+
+def main(workload, size=1000, seed=0):
+    sys.stdout.write(WORKLOADS[workload](int(size), int(seed)))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
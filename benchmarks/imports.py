@@ -0,0 +1,92 @@
+"""Time to import clouscript, and to import it and parse a first string,
+in fresh interpreters, checked against a budget
+
+Imports are timed by python -X importtime, and the best of a number
+of runs is kept. Cached bytecode is written on the first run, as it
+would be once installed. Modules from outside the standard library
+which are imported along the way are listed, since there should be none.
+Exits with an error if either time is over its budget.
+
+    python -m benchmarks.imports [runs] [import budget in ms] [parse budget in ms]
+"""
+
+import os
+import subprocess
+import sys
+
+
+IMPORT = 'import clouscript'
+
+# Prints the packages which are imported once it is done
+MODULES = '''
+import sys
+print(*sorted({name.partition('.')[0] for name in sys.modules}), file=sys.stderr)
+'''
+
+PARSE = '''
+import clouscript
+clouscript.loads('curse(true, 10)')
+''' + MODULES
+
+
+def importtime(code, env):
+    """Run code in a fresh interpreter, getting the microseconds each
+    module it imported at the top level took, including the modules
+    those imported, and the last line it printed to stderr"""
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            env=env, stderr=subprocess.PIPE, text=True, check=True)
+
+    times = {}
+    last = ''
+
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            last = line
+            continue
+
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit() and not name.startswith(' ' * 2):
+            times[name.strip()] = int(cumulative)
+
+    return times, last
+
+
+def best(code, env, runs, startup):
+    """Get the least time the imports of code took over a number of runs,
+    leaving out the modules imported when the interpreter starts up,
+    along with the names of the modules imported"""
+
+    results = [importtime(code, env) for _ in range(runs)]
+    total = min(
+        sum(time for name, time in times.items() if name not in startup)
+        for times, _ in results
+    )
+
+    return total, results[-1][1].split()
+
+
+def main(runs=10, import_budget=5, parse_budget=30):
+    env = dict(os.environ, PYTHONPATH=os.getcwd())
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    # What the interpreter imports when it starts up is left out
+    startup = set(importtime(MODULES, env)[1].split())
+
+    imported, _ = best(IMPORT, env, runs, startup)
+    parsed, modules = best(PARSE, env, runs, startup)
+
+    print(f'import:           {imported / 1000:7.3f} ms (budget {import_budget} ms)')
+    print(f'import and parse: {parsed / 1000:7.3f} ms (budget {parse_budget} ms)')
+
+    third_party = sorted(
+        set(modules) - startup - set(sys.stdlib_module_names) - {'clouscript'}
+    )
+    print(f'outside the standard library: {", ".join(third_party) or "none"}')
+
+    if imported > import_budget * 1000 or parsed > parse_budget * 1000 or third_party:
+        sys.exit('Over budget')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
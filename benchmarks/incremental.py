@@ -0,0 +1,108 @@
+"""Time taken by small edits of a large document
+
+A document is parsed once, and then edited the way it is typed into:
+in bursts at random places, typing into a number, adding a line and
+removing it again. The tree is only put together when it is read,
+which is timed on its own. Every so often it is checked against loads.
+
+Typing a call leaves its parenthesis open until it is closed, so every
+burst also types one, which fails until the right-hand parenthesis is
+typed. These edits are timed on their own.
+
+The same lines are then put in one large block, on their own and
+between delimiters, so that every edit is made inside of it.
+
+    python -m benchmarks.incremental [lines] [bursts]
+"""
+
+import random
+import statistics
+import sys
+import time
+
+import clouscript
+from clouscript.exceptions import MismatchedParentheses
+from clouscript.incremental import Document
+
+
+SCRIPT = '''\
+total = price * qty + 0x10 - discount(region, "EU")
+items = [1, 2.5, -3, 4, 5, 6]
+config { name = "server" ; ports = [80, 443] ; enabled = true }
+'''
+
+
+def report(name, times):
+    times = sorted(times)
+    print(f'{name}: median {statistics.median(times) * 1000:7.3f} ms,'
+          f' p99 {times[int(len(times) * 0.99)] * 1000:7.3f} ms')
+
+
+def block(source, delimiter=''):
+    """Put the lines of a source in a block, with a delimiter after each but the last"""
+    return 'config {\n' + f'{delimiter}\n'.join(source.splitlines()) + '\n}\n'
+
+
+def run(source, lines, bursts):
+    """Time editing a source in bursts, and reading the tree after each"""
+
+    start = time.perf_counter()
+    document = Document(source)
+    print(f'{lines} lines parsed in {time.perf_counter() - start:.2f} s')
+
+    random.seed(0)
+    edits = []
+    unbalanced = []
+    reads = []
+
+    for k in range(bursts):
+        # Somewhere in the middle of a line
+        offset = source.index('2.5', random.randrange(len(source) - 100))
+
+        burst = [(offset + i, 0, digit) for i, digit in enumerate('1234')] \
+              + [(offset, 4, ''), (offset - 4, 0, '\nx = 1 +\n'), (offset - 4, 9, '')]
+
+        for edit in burst:
+            start = time.perf_counter()
+            document.edit(*edit)
+            edits.append(time.perf_counter() - start)
+
+        # The parenthesis is left open until the third edit
+        typed = [(offset, 0, 'f('), (offset + 2, 0, '1'),
+                 (offset + 3, 0, ') '), (offset, 5, '')]
+
+        for edit in typed:
+            start = time.perf_counter()
+            try:
+                document.edit(*edit)
+            except MismatchedParentheses:
+                pass
+            unbalanced.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        tree = document.tree
+        reads.append(time.perf_counter() - start)
+
+        if k % 10 == 0:
+            assert tree == clouscript.loads(document.text)
+
+    report(f'{len(edits)} edits', edits)
+    report(f'{len(unbalanced)} unbalanced edits', unbalanced)
+    report(f'{len(reads)} reads', reads)
+
+
+def main(lines=100000, bursts=50):
+    source = SCRIPT * (lines // SCRIPT.count('\n'))
+
+    print('At the top level')
+    run(source, lines, bursts)
+
+    print('In a block')
+    run(block(source), lines, bursts)
+
+    print('In a block with delimiters')
+    run(block(source, ';'), lines, bursts)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
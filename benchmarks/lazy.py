@@ -0,0 +1,55 @@
+"""Time to parse a script and read only some of it, eagerly and lazily
+
+The script is made of calls with large bodies in curly brackets.
+Only the top-level calls are read at first, then one body,
+and then the whole tree, which is checked against the eager one.
+
+    python -m benchmarks.lazy [calls] [lines]
+"""
+
+import sys
+import time
+
+import clouscript
+from clouscript.parser import Parser
+
+
+BODY = '''\
+    total = price * qty + 0x10 - discount(region, "EU")
+    items = [1, 2.5, -3; 4, 5, 6]
+'''
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(calls=50, lines=200):
+    body = BODY * (lines // BODY.count('\n'))
+    source = ''.join(f'section{k} {{\n{body}}}\n' for k in range(calls))
+
+    lazy = Parser(lazy=True)
+
+    # Build the default lexer and parser up front
+    clouscript.loads('')
+
+    tree, eager = timed(lambda: clouscript.loads(source))
+    print(f'{len(source)} characters in {calls} sections')
+    print(f'         eager: {eager:7.3f} s')
+
+    lazy_tree, elapsed = timed(lambda: clouscript.loads(source, parser=lazy))
+    print(f'     top level: {elapsed:7.3f} s')
+
+    _, elapsed = timed(lambda: lazy_tree.value[1].value)
+    print(f'    +1 section: {elapsed:7.3f} s')
+
+    same, elapsed = timed(lambda: lazy_tree == tree)
+    print(f'  +all of them: {elapsed:7.3f} s')
+
+    assert same
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
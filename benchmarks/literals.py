@@ -0,0 +1,72 @@
+"""Time to lex strings and comments made to make regular expressions backtrack
+
+Every input is lexed at doubling sizes, both with the default rules
+and with the rules strings and comments used to have. The time should
+double along with the size, and inputs which are never closed should
+fail as fast as the others are lexed. Block comments used to end at the
+end of their line, so the rules before fail on the comments right away.
+
+    python -m benchmarks.literals [size] [steps]
+"""
+
+import sys
+import time
+
+from clouscript.exceptions import NoMatch
+from clouscript.grammar import default_grammar
+from clouscript.lexer import Lexer
+
+
+INPUTS = {
+    'long string': lambda n: 'x = "' + 'a\n' * (n // 2) + '"',
+    'escaped quotes': lambda n: 'x = "' + '\\"' * (n // 2),
+    'unclosed string': lambda n: 'x = "' + 'a' * n,
+    'long comment': lambda n: '/*' + ' * /\n' * (n // 4) + '*/ x',
+    'unclosed comment': lambda n: 'x /*' + ' * /' * (n // 4),
+    'line comments': lambda n: '// a /* b " c\n' * (n // 14) + 'x',
+}
+
+
+def legacy():
+    """A lexer with the rules strings and comments used to have"""
+
+    grammar = default_grammar()
+
+    solids = [rule for rule in grammar.solids if rule is not grammar.unclosed]
+    spacious = list(grammar.spacious)
+
+    solids[3] = (r'(?://.*)?[\s\n]+|\/\*.*\*\/', solids[3][1])
+    spacious[3] = (r'\"((?:\\"|.|\n)*?)\"', spacious[3][1])
+
+    return Lexer(solids=solids, spacious=spacious)
+
+
+def timed(lexer, string):
+    start = time.perf_counter()
+
+    try:
+        list(lexer.lex(string))
+    except NoMatch:
+        pass
+
+    return time.perf_counter() - start
+
+
+def main(size=1 << 16, steps=5):
+    lexers = {'now': Lexer(), 'before': legacy()}
+
+    for name, build in INPUTS.items():
+        print(name)
+
+        for step in range(steps):
+            string = build(size << step)
+
+            times = '  '.join(
+                f'{label}: {timed(lexer, string) * 1000:9.3f} ms'
+                for label, lexer in lexers.items()
+            )
+            print(f'  {len(string):9} characters  {times}')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
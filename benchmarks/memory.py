@@ -0,0 +1,99 @@
+"""Memory held by the nodes of a parsed tree, in bytes per node
+
+The tree from clouscript.loads is rebuilt twice: once the way elements
+are stored now, and once the way they used to be stored before they had
+slots, as plain objects with an instance dictionary and sections in lists.
+Both share the values of the original tree, so only the nodes are measured.
+
+    python -m benchmarks.memory [lines]
+"""
+
+import sys
+import tracemalloc
+
+import clouscript
+from clouscript.element import Element
+
+
+SCRIPT = '''\
+total = price * qty + 0x10 - discount(region, "EU")
+items = [1, 2.5, -3; 4, 5, 6]
+config { name = "server" ; ports = [80, 443] ; enabled = true }
+'''
+
+
+class PlainElement:
+    """An element with an instance dictionary"""
+
+    def __init__(self, type_, value):
+        self.type = type_
+        self.value = value
+
+
+def slotted(element):
+    """Rebuild a tree from elements with slots"""
+
+    value = element.value
+
+    if type(value) is tuple:
+        value = tuple(slotted(e) for e in value)
+
+    return Element(element.type, value)
+
+
+def plain(element, sections):
+    """Rebuild a tree from plain elements with sections in lists"""
+
+    value = element.value
+
+    if type(value) is tuple:
+        value = [plain(e, sections) for e in value]
+
+        # Only infix and capsule functions used to hold tuples
+        if element.type not in sections:
+            value = tuple(value)
+
+    return PlainElement(element.type, value)
+
+
+def count(element):
+    """Count the elements in a tree"""
+
+    if type(element.value) in (list, tuple):
+        return 1 + sum(count(e) for e in element.value)
+    return 1
+
+
+def measure(build):
+    """Get the result of a function and the memory it holds on to"""
+
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, size
+
+
+def main(lines=2000):
+    source = SCRIPT * (lines // SCRIPT.count('\n'))
+
+    # Build the default lexer and parser up front
+    clouscript.loads('')
+
+    parser = clouscript.default_parser()
+    sections = {'', 'SEQUENCE', *parser.parentheses.groups}
+
+    tree = clouscript.loads(source)
+    nodes = count(tree)
+
+    _, size = measure(lambda: slotted(tree))
+    _, plain_size = measure(lambda: plain(tree, sections))
+
+    print(f'{nodes} nodes from {len(source)} characters')
+    print(f'before: {plain_size / nodes:7.1f} bytes per node')
+    print(f' after: {size / nodes:7.1f} bytes per node')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
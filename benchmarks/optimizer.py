@@ -0,0 +1,71 @@
+"""Memory held by a generated script's tree, and time to evaluate it,
+before and after optimizing it
+
+The script sets many variables to expressions made of constants
+and of the same few subexpressions over and over.
+
+    python -m benchmarks.optimizer [lines]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import clouscript
+from clouscript.compiler import Compiler
+from clouscript.optimizer import optimize
+
+
+LINES = [
+    'timeout{k} = 60 * 60 * 24 * {k}',
+    'mask{k} = 0x10 + 0xff * 2 - {k}',
+    'score{k} = weight(a + b * 2) + weight(a + b * 2) * {k}',
+    'ok{k} = 1 < 2 and limit * 2 >= a + b * 2',
+]
+
+
+def measure(build):
+    """Get the result of a function and the memory it holds on to"""
+
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, size
+
+
+def timed(function, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+
+def main(lines=2000):
+    source = ' ; '.join(LINES[k % len(LINES)].format(k=k) for k in range(lines))
+
+    # Build the default lexer and parser up front
+    clouscript.loads('')
+
+    tree, size = measure(lambda: clouscript.loads(source))
+    (optimized, report), optimized_size = measure(lambda: optimize(clouscript.loads(source)))
+
+    print(report)
+    print(f'   before: {size / 1024:8.1f} KiB')
+    print(f'    after: {optimized_size / 1024:8.1f} KiB')
+
+    compiler = Compiler({'weight': lambda value: value * 0.5})
+    variables = {'a': 1, 'b': 2, 'limit': 10}
+
+    before = compiler.compile(tree)
+    after = compiler.compile(optimized)
+
+    assert before(dict(variables)) == after(dict(variables))
+
+    print(f'  evaluated before: {timed(lambda: before(dict(variables))) * 1000:7.3f} ms')
+    print(f'  evaluated after:  {timed(lambda: after(dict(variables))) * 1000:7.3f} ms')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
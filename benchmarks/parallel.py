@@ -0,0 +1,58 @@
+"""Time to parse a large string with an increasing number of processes
+
+The string is parsed once with loads in this process, and then
+with a pool of each number of processes. The pool is started
+before the timing, since it is reused for every string parsed.
+
+    python -m benchmarks.parallel [lines] [chunk_size]
+"""
+
+import os
+import sys
+import time
+
+import clouscript
+from clouscript.parallel import ParallelParser
+
+
+SCRIPT = '''\
+total = price * qty + 0x10 - discount(region, "EU")
+items = [1, 2.5, -3; 4, 5, 6]
+config { name = "server" ; ports = [80, 443] ; enabled = true }
+'''
+
+
+def best(function, repeat=3):
+    """Get the shortest time of a number of runs"""
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+
+    return min(times)
+
+
+def main(lines=60000, chunk_size=1 << 16):
+    source = SCRIPT * (lines // SCRIPT.count('\n'))
+    tree = clouscript.loads(source)
+
+    serial = best(lambda: clouscript.loads(source))
+    print(f'{len(source)} characters on {os.cpu_count()} processors')
+    print(f'  loads: {serial:7.3f} s')
+
+    workers = 1
+    while workers <= max(os.cpu_count(), 2):
+        with ParallelParser(workers=workers, chunk_size=chunk_size) as parallel:
+            # Start the processes before timing
+            assert parallel.loads(source) == tree
+
+            elapsed = best(lambda: parallel.loads(source))
+            print(f'{workers:7}: {elapsed:7.3f} s  {serial / elapsed:5.2f}x')
+
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
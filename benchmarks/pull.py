@@ -0,0 +1,124 @@
+"""Peak memory and time to find every call and assignment in a script,
+by building its tree and by pulling events from it
+
+The script is read from a file of doubling sizes. Building the tree
+takes memory along with the size of the script, while pulling events
+only takes what the open sections and pending infixes need,
+besides the counts of the names found.
+
+    python -m benchmarks.pull [size] [doublings] [seed]
+"""
+
+import io
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+import clouscript
+from clouscript.pull import ENTER, LEAVE, TOKEN, INFIX, CALL
+
+from .corpus import WORKLOADS
+
+
+def measured(function):
+    """Get the result of a function, the time it took and its peak memory"""
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    result = function()
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def from_tree(fp):
+    """Count the names of the functions called and the labels set in a tree"""
+
+    found = Counter()
+    stack = [clouscript.load(fp)]
+
+    while stack:
+        element = stack.pop()
+        value = element.value
+
+        if type(value) is not tuple:
+            continue
+
+        if element.type in ('CALL', 'SET') and value[0].type == 'LABEL':
+            found[element.type, value[0].value] += 1
+
+        stack.extend(value)
+
+    return found
+
+
+def from_events(fp):
+    """Count the names of the functions called and the labels set
+    while pulling events, keeping only the first element of what
+    every call and infix is going to be applied to"""
+
+    found = Counter()
+
+    # Operands of the sections which are open, of which only the
+    # last two are kept, and only as labels or nothing
+    stack = [[]]
+
+    for kind, value in clouscript.iterevents(fp):
+        operands = stack[-1]
+
+        if kind == TOKEN:
+            operands.append(value.value if value.type == 'LABEL' else None)
+
+        elif kind == ENTER:
+            stack.append([])
+
+        elif kind == LEAVE:
+            stack.pop()
+            if stack:
+                stack[-1].append(None)
+
+        elif kind == INFIX:
+            operands.pop()
+            if value == 'SET' and operands[-1] is not None:
+                found['SET', operands[-1]] += 1
+            operands[-1] = None
+
+        elif kind == CALL:
+            operands.pop()
+            if operands[-1] is not None:
+                found['CALL', operands[-1]] += 1
+            operands[-1] = None
+
+        del operands[:-2]
+
+    return found
+
+
+def main(size=250000, doublings=4, seed=0):
+    # Build the default lexer and parser up front
+    clouscript.loads('')
+
+    for _ in range(doublings):
+        source = WORKLOADS['calls'](size, seed)
+        print(f'{len(source)} characters')
+
+        # The files are made up front, so that only reading them is measured
+        files = io.StringIO(source), io.StringIO(source)
+
+        tree, elapsed, peak = measured(lambda: from_tree(files[0]))
+        print(f'    tree: {elapsed:7.3f} s {peak / 2 ** 20:8.2f} MiB peak')
+
+        events, elapsed, peak = measured(lambda: from_events(files[1]))
+        print(f'  events: {elapsed:7.3f} s {peak / 2 ** 20:8.2f} MiB peak')
+
+        assert tree == events
+        size *= 2
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
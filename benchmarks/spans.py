@@ -0,0 +1,83 @@
+"""Time and peak memory to parse every workload with and without spans,
+and time to find the line and column of every element afterwards
+
+Spans are given by a lexer made with spans=True, and the parser passes
+them on to the elements it forms. Lines and columns are only found
+once they are asked for, by bisecting the offsets of the line breaks.
+
+    python -m benchmarks.spans [size] [runs] [seed]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import clouscript
+from clouscript.lexer import Lexer
+from clouscript.spans import Lines
+
+from .corpus import WORKLOADS
+
+
+def best(function, runs):
+    """Get the result of a function and the least time it took over a number of runs"""
+
+    elapsed = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = function()
+        elapsed.append(time.perf_counter() - start)
+
+    return result, min(elapsed)
+
+
+def peak(function):
+    """Get the peak memory allocated while calling a function"""
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak
+
+
+def elements(tree):
+    """Yield every element of a tree below its top level"""
+
+    for e in tree.value:
+        yield e
+
+        if isinstance(e.value, tuple):
+            yield from elements(e)
+
+
+def main(size=200000, runs=5, seed=0):
+    plain = Lexer()
+    spanned = Lexer(spans=True)
+
+    for name, workload in sorted(WORKLOADS.items()):
+        source = workload(size, seed)
+
+        expected, without = best(lambda: clouscript.loads(source, plain), runs)
+        tree, within = best(lambda: clouscript.loads(source, spanned), runs)
+
+        # Spans do not take part in comparisons
+        assert tree == expected
+
+        memory = peak(lambda: clouscript.loads(source, plain))
+        spanned_memory = peak(lambda: clouscript.loads(source, spanned))
+
+        every = list(elements(tree))
+        _, locating = best(lambda: list(map(Lines(source).span, every)), runs)
+
+        print(f'{name}: {len(source)} characters, {len(every)} elements')
+        print(f'  without spans: {without:7.3f} s {memory / 2 ** 20:8.2f} MiB peak')
+        print(f'  with spans:    {within:7.3f} s {spanned_memory / 2 ** 20:8.2f} MiB peak'
+              f' {100 * (within / without - 1):+6.1f}%')
+        print(f'  lines and columns of every element: {locating:7.3f} s')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,71 @@
+"""Peak memory and time to parse a file with iterload,
+with its statements on lines of their own and all on a single line
+
+The file is read in chunks, and what is read is only held until
+the elements in it are finished, up to a line break or a delimiter.
+The peak should stay the same however large the file is.
+
+    python -m benchmarks.streaming [statements] [runs]
+"""
+
+import io
+import sys
+import time
+import tracemalloc
+
+import clouscript
+
+
+def script(statements, separator):
+    """Get statements separated by a delimiter and a separator"""
+
+    # Labels repeat, since they are interned and kept for good
+    return f';{separator}'.join(
+        f'x{k % 100} = f({k}, "a;b", [1, 2.5]) + {k}.5' for k in range(statements)
+    )
+
+
+def peak(source):
+    """Get the peak memory allocated while parsing a file"""
+
+    fp = io.StringIO(source)
+
+    tracemalloc.start()
+    for _ in clouscript.iterload(fp):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return peak
+
+
+def best(source, runs):
+    """Get the least time it took to parse a file over a number of runs"""
+
+    elapsed = []
+
+    for _ in range(runs):
+        fp = io.StringIO(source)
+
+        start = time.perf_counter()
+        for _ in clouscript.iterload(fp):
+            pass
+        elapsed.append(time.perf_counter() - start)
+
+    return min(elapsed)
+
+
+def main(statements=64000, runs=3):
+    # Compile everything before measuring
+    best(script(100, ' '), 1)
+
+    for count in (statements // 16, statements // 4, statements):
+        for name, separator in (('lines', '\n'), ('one line', ' ')):
+            source = script(count, separator)
+
+            print(f'{name:>8}: {len(source) / 2 ** 20:6.2f} MiB, '
+                  f'{peak(source) / 2 ** 10:8.0f} KiB peak, {best(source, runs):7.3f} s')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
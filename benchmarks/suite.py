@@ -0,0 +1,203 @@
+"""Throughput and peak memory of every stage on each synthetic workload
+
+Every workload of benchmarks.corpus is parsed with loads to time it as a
+whole, and with clouscript.profile and the staged pipeline to time each stage. Peak memory is
+measured in a separate run, since tracing allocations slows everything down.
+For the stages which reduce sections, it is the most any one section took.
+
+The results can be saved as a baseline, and compared against one later.
+Any workload which got slower or took more memory than the threshold
+allows makes the suite exit with a failure.
+
+    python -m benchmarks.suite [--size N] [--save FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+import clouscript
+from clouscript.parser import Parser
+from clouscript.stats import Stats, ProfilingParser
+
+from .corpus import WORKLOADS
+
+
+STAGES = ('lex', 'encapsulate', 'structure', 'segment', 'parse')
+
+# Stages taking less time than this are too noisy to compare
+FLOOR = 0.001
+
+
+class MemoryParser(ProfilingParser):
+    """A profiling parser which also keeps the peak memory of each stage"""
+
+    def __init__(self, parser, peaks):
+        super().__init__(Stats(), parser)
+        self.peaks = peaks
+
+    def stage(self, name, function, elements):
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+
+        elements = super().stage(name, function, elements)
+
+        _, peak = tracemalloc.get_traced_memory()
+        self.peaks[name] = max(self.peaks[name], peak - size)
+
+        return elements
+
+
+def traced(function):
+    """Get the result of a function and the peak memory
+    it took on top of what was already held"""
+
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+
+    result = function()
+
+    _, peak = tracemalloc.get_traced_memory()
+    return result, peak - size
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def measure(source, repeat):
+    """Time and measure the memory of parsing a script"""
+
+    lexer = clouscript.default_lexer()
+
+    # Sections are reduced in three stages, so that each of them can be timed
+    parser = Parser(pipeline='staged')
+
+    size = len(source.encode())
+
+    # The shortest time of every stage over the runs
+    loads = min(timed(lambda: clouscript.loads(source)) for _ in range(repeat))
+
+    times = dict.fromkeys(STAGES, float('inf'))
+    for _ in range(repeat):
+        _, stats = clouscript.profile(source, parser=parser)
+        for stage in STAGES:
+            times[stage] = min(times[stage], stats.times[stage])
+
+    peaks = dict.fromkeys(STAGES, 0)
+
+    tracemalloc.start()
+    try:
+        elements, peaks['lex'] = traced(lambda: list(lexer.lex(source)))
+
+        memory = MemoryParser(parser, peaks)
+        _, peaks['parse'] = traced(lambda: memory.parse(elements))
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'bytes': size,
+        'tokens': stats.tokens,
+        'sections': stats.sections,
+        'depth': stats.depth,
+        'loads': loads,
+        'mb/s': size / loads / 1e6,
+        'tokens/s': stats.tokens / loads,
+        'times': times,
+        'peaks': peaks,
+    }
+
+
+def report(name, result):
+    print(f'{name}: {result["bytes"]} bytes, {result["tokens"]} tokens, '
+          f'{result["sections"]} sections, {result["depth"]} deep')
+    print(f'  {"loads":>11}: {result["loads"] * 1000:9.3f} ms '
+          f'{result["mb/s"]:7.2f} MB/s {result["tokens/s"] / 1e6:7.3f} M tokens/s')
+
+    for stage in STAGES:
+        elapsed = result['times'][stage]
+        print(f'  {stage:>11}: {elapsed * 1000:9.3f} ms '
+              f'{result["bytes"] / elapsed / 1e6:7.2f} MB/s '
+              f'{result["peaks"][stage] / 1024:9.1f} KiB peak')
+
+
+def regressions(results, baseline, threshold):
+    """Find every measurement which is worse than in the baseline
+    by more than the threshold, as a fraction of the baseline"""
+
+    found = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        before = baseline[name]
+
+        if before['bytes'] != result['bytes']:
+            found.append(f'{name}: the script is not the same as in the baseline')
+            continue
+
+        measurements = [('loads', before['loads'], result['loads'], FLOOR)]
+        for stage in STAGES:
+            measurements.append((stage, before['times'][stage], result['times'][stage], FLOOR))
+            measurements.append((f'{stage} peak', before['peaks'][stage], result['peaks'][stage], 0))
+
+        for what, old, new, floor in measurements:
+            if max(old, new) >= floor and new > old * (1 + threshold):
+                found.append(f'{name} {what}: {old:.6g} -> {new:.6g} '
+                             f'(+{(new / old - 1) * 100 if old else float("inf"):.0f}%)')
+
+    return found
+
+
+def main(arguments=None):
+    options = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    options.add_argument('--size', type=int, default=1 << 20,
+                         help='characters in each script')
+    options.add_argument('--seed', type=int, default=0)
+    options.add_argument('--repeat', type=int, default=3,
+                         help='runs to take the shortest time of')
+    options.add_argument('--workloads', default=','.join(WORKLOADS),
+                         help='comma-separated workloads to run')
+    options.add_argument('--save', metavar='FILE',
+                         help='save the results as a baseline')
+    options.add_argument('--baseline', metavar='FILE',
+                         help='compare the results against a baseline')
+    options.add_argument('--threshold', type=float, default=0.2,
+                         help='fraction by which a measurement may be worse')
+    options = options.parse_args(arguments)
+
+    # Build the default lexer and parser up front
+    clouscript.loads('')
+
+    results = {}
+    for name in options.workloads.split(','):
+        source = WORKLOADS[name](options.size, options.seed)
+        results[name] = measure(source, options.repeat)
+        report(name, results[name])
+
+    if options.save:
+        with open(options.save, 'w') as fp:
+            json.dump(results, fp, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as fp:
+            baseline = json.load(fp)
+
+        found = regressions(results, baseline, options.threshold)
+
+        for regression in found:
+            print(f'REGRESSION {regression}')
+
+        if found:
+            sys.exit(1)
+
+        print(f'No regressions beyond {options.threshold:.0%} of the baseline')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Time to parse many scripts one after another,
+and in pools of threads sharing one lexer and parser
+
+Threads only parse faster than one after another on builds of Python
+without the global interpreter lock, such as python3.13t. With the lock,
+the times show what sharing the lexer and parser costs.
+
+    python -m benchmarks.threads [count] [size] [seed]
+"""
+
+import sys
+import time
+
+import clouscript
+
+from .corpus import WORKLOADS
+
+
+def timed(function):
+    """Get the result of a function and the time it took"""
+
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main(count=64, size=20000, seed=0):
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'global interpreter lock: {"enabled" if gil else "disabled"}')
+
+    # Every script is of a workload of its own kind
+    kinds = sorted(WORKLOADS)
+    sources = [WORKLOADS[kinds[i % len(kinds)]](size, seed + i) for i in range(count)]
+    print(f'{count} scripts of {sum(map(len, sources)) // count} characters on average')
+
+    # Build the default lexer and parser up front
+    clouscript.loads('')
+
+    expected, serial = timed(lambda: [clouscript.loads(source) for source in sources])
+    print(f'  one after another: {serial:7.3f} s')
+
+    for workers in (1, 2, 4, 8):
+        trees, elapsed = timed(lambda: clouscript.loads_many(sources, workers=workers))
+        print(f'  {workers} threads:         {elapsed:7.3f} s {serial / elapsed:5.2f}x')
+
+        assert trees == expected
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
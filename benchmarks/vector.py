@@ -0,0 +1,78 @@
+"""Time and memory to evaluate a filter expression over many rows
+
+The expression is evaluated row by row with the compiled function,
+and over whole columns with NumPy, both at once and in chunks.
+Peak memory is what the arrays in between took on top of the columns.
+
+    python -m benchmarks.vector [rows] [chunk_size]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy
+
+import clouscript
+from clouscript.compiler import Compiler
+from clouscript.vector import VectorCompiler
+
+
+EXPRESSION = 'price * qty > limit and region == "EU" or qty * 2 + 1 >= 19'
+
+
+def measured(function):
+    """Get the result of a function, the time it took and its peak memory"""
+
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    result = function()
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+
+def main(rows=1000000, chunk_size=65536):
+    rng = numpy.random.default_rng(0)
+    columns = {
+        'price': rng.random(rows) * 100,
+        'qty': rng.integers(0, 10, rows),
+        'limit': 300,
+        'region': rng.choice(['EU', 'US'], rows),
+    }
+
+    tree = clouscript.loads(EXPRESSION)
+    vector = VectorCompiler()
+
+    print(f'{EXPRESSION}')
+    print(f'  over {rows} rows')
+
+    # Only a part of the rows, since it takes long
+    sample = min(rows, 100000)
+    compiled = Compiler().compile(tree)
+    records = [{
+        'price': float(columns['price'][i]),
+        'qty': int(columns['qty'][i]),
+        'limit': 300,
+        'region': str(columns['region'][i]),
+    } for i in range(sample)]
+
+    expected, elapsed, _ = measured(lambda: [compiled(record) for record in records])
+    print(f'  row by row: {elapsed / sample * rows:7.3f} s (estimated from {sample} rows)')
+
+    whole, elapsed, peak = measured(lambda: vector.evaluate(tree, columns))
+    print(f'      arrays: {elapsed:7.3f} s {peak / 2 ** 20:8.1f} MiB peak')
+
+    chunked, elapsed, peak = measured(lambda: vector.evaluate(tree, columns, chunk_size))
+    print(f'      chunks: {elapsed:7.3f} s {peak / 2 ** 20:8.1f} MiB peak')
+
+    assert whole.tolist()[:sample] == expected
+    assert numpy.array_equal(whole, chunked)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -1,15 +1,336 @@
+from _thread import allocate_lock
 
 
-def loads(string, lexer=None, parser=None):
-    """Parses a string into ClouScript"""
+# The lexer and parser used when none are given,
+# built from the default grammar the first time they are needed
+_lexer = None
+_parser = None
+_lock = allocate_lock()
 
-    if lexer is None:
+# The pool of processes kept for loads with workers, along with what it was
+# started for. Starting one for every call would take longer than most
+# strings take to parse, so it is kept until it is asked for differently
+_parallel = None
+_parallel_key = None
+
+# Number of calls using each ParallelParser. One which is replaced
+# is only shut down once the last call using it is done
+_parallel_users = {}
+
+
+def default_lexer():
+    """Get the shared lexer for the default grammar"""
+    global _lexer
+
+    if _lexer is None:
         from .lexer import Lexer
-        lexer = Lexer()
 
-    if parser is None:
+        # Threads asking for it at once all get the same one
+        with _lock:
+            if _lexer is None:
+                _lexer = Lexer()
+
+    return _lexer
+
+
+def default_parser():
+    """Get the shared parser for the default grammar"""
+    global _parser
+
+    if _parser is None:
         from .parser import Parser
-        parser = Parser()
 
-    elements = list(lexer.lex(string))
-    return parser.parse(elements)
\ No newline at end of file
+        with _lock:
+            if _parser is None:
+                _parser = Parser()
+
+    return _parser
+
+
+def loads(string, lexer=None, parser=None, cache=None, workers=None, chunk_size=65536,
+          cache_key=None):
+    """Parses a string into ClouScript
+
+    cache -- ParseCache: Reuse the tree from the last time
+                         the same string was parsed the same way
+    cache_key -- str: Tells the configuration apart in the cache in place
+                      of the fingerprint of the lexer, for lexers whose
+                      rules depend on what can not be fingerprinted
+    workers -- int: Parse chunks of the string in this many processes.
+                    The processes are kept for the next call with the same
+                    lexer, parser, workers and chunk size, and are shut down
+                    once called with others and every call still using them
+                    is done, or when the interpreter exits. Strings lexed
+                    with spans or rules of the lexer's own are parsed here
+    chunk_size -- int: Number of characters in each chunk at least
+    """
+
+    if lexer is None:
+        lexer = default_lexer()
+
+    if parser is None:
+        parser = default_parser()
+
+    from .exceptions import ClouScriptException
+
+    try:
+        if workers is not None:
+            parallel = _parallel_parser(lexer, parser, workers, chunk_size)
+
+            try:
+                if cache is not None:
+                    return cache.loads(string, lexer, parser, parallel.loads, cache_key)
+                return parallel.loads(string)
+            finally:
+                _release_parallel(parallel)
+
+        if cache is not None:
+            return cache.loads(string, lexer, parser, key=cache_key)
+
+        # A lazy parser only converts the tokens it needs
+        if parser.lazy:
+            return parser.parse_tokens(lexer.tokens(string))
+
+        elements = list(lexer.lex(string))
+        return parser.parse(elements, (0, len(string)) if lexer.spans else None)
+
+    except ClouScriptException as exception:
+        # Errors with a span can then tell the line and column
+        if exception.source is None:
+            exception.source = string
+        raise
+
+
+def _parallel_parser(lexer, parser, workers, chunk_size):
+    """Get the kept ParallelParser for a lexer, parser, number of
+    workers and chunk size, replacing the one kept for any others
+
+    Every call has to be followed by one of _release_parallel
+    once the parser is no longer used
+    """
+    global _parallel, _parallel_key
+
+    from .parallel import ParallelParser
+
+    key = (lexer, parser, workers, chunk_size)
+    replaced = None
+
+    with _lock:
+        if _parallel_key != key:
+            # Other threads may still be parsing with the one replaced
+            if _parallel is not None and not _parallel_users.get(_parallel):
+                replaced = _parallel
+
+            _parallel = ParallelParser(lexer, parser, workers, chunk_size)
+            _parallel_key = key
+
+        parallel = _parallel
+        _parallel_users[parallel] = _parallel_users.get(parallel, 0) + 1
+
+    if replaced is not None:
+        replaced.close()
+
+    return parallel
+
+
+def _release_parallel(parallel):
+    """Stop using a ParallelParser from _parallel_parser,
+    shutting it down if it has been replaced and nobody else uses it"""
+
+    with _lock:
+        users = _parallel_users.pop(parallel) - 1
+
+        if users:
+            _parallel_users[parallel] = users
+            return
+
+        replaced = parallel is not _parallel
+
+    if replaced:
+        parallel.close()
+
+
+def loads_many(sources, lexer=None, parser=None, workers=None):
+    """Parses many strings into ClouScript in a pool of threads
+
+    The lexer and parser are shared by all threads. Returns the trees
+    in the same order as the strings. Parsing only gets faster with
+    more threads on builds of Python without the global interpreter lock.
+
+    workers -- int: Number of threads, as many as ThreadPoolExecutor
+                    picks if None
+    """
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    if lexer is None:
+        lexer = default_lexer()
+
+    if parser is None:
+        parser = default_parser()
+
+    with ThreadPoolExecutor(workers) as executor:
+        return list(executor.map(lambda string: loads(string, lexer, parser), sources))
+
+
+def profile(string, lexer=None, parser=None, callback=None):
+    """Parses a string into ClouScript like loads, and measures it
+
+    Returns the tree along with a Stats object holding the time spent
+    in each stage, the number of tokens and sections, the deepest nesting,
+    and how many times each rule of the lexer matched and missed.
+    The string is parsed with the pipeline and laziness of the parser,
+    and the spans of the lexer, so the three stages of reducing sections
+    are only timed apart for a parser with the staged pipeline.
+
+    callback -- callable: Called with the name of a stage
+                          and the seconds spent in it as it is timed
+    """
+
+    from .stats import profile
+
+    if lexer is None:
+        lexer = default_lexer()
+
+    if parser is None:
+        parser = default_parser()
+
+    return profile(string, lexer, parser, callback)
+
+
+def iterload(fp, lexer=None, parser=None, chunk_size=65536):
+    """Parses a file into ClouScript, yielding each top-level
+    element as soon as it is finished
+
+    Top-level delimiters separate the elements and are left out.
+    The file is read in chunks, so only what has not been
+    finished yet is kept in memory.
+
+    chunk_size -- int: Number of characters read at a time
+    """
+
+    if lexer is None:
+        lexer = default_lexer()
+
+    if parser is None:
+        parser = default_parser()
+
+    chunks = iter(lambda: fp.read(chunk_size), '')
+    return parser.iterparse(lexer.lex_chunks(chunks))
+
+
+async def aloads(string, lexer=None, parser=None, executor=None, max_in_flight=None):
+    """Parses a string into ClouScript like loads, in an executor
+    so that the event loop is not blocked
+
+    executor -- Executor: Pool of threads or processes to parse in,
+                          the default one of the loop if None
+    max_in_flight -- int: Number of strings handed to the executor at once
+                          by all calls on the loop with the same executor
+                          and number, as many as there are processors if None
+    """
+
+    from .aio import aloads
+    return await aloads(string, lexer, parser, executor, max_in_flight)
+
+
+async def aiterload(fp, lexer=None, parser=None, executor=None, chunk_size=65536,
+                    max_in_flight=None):
+    """Parses a file into ClouScript like iterload, in an executor,
+    yielding each top-level element as soon as it is finished
+
+    max_in_flight -- int: The same as for aloads, with which it is shared
+    """
+
+    from .aio import aiterload
+
+    async for element in aiterload(fp, lexer, parser, executor, chunk_size,
+                                   max_in_flight=max_in_flight):
+        yield element
+
+
+def events(string, lexer=None, parser=None):
+    """Parses a string into a stream of events instead of a tree
+
+    Events are pairs of a kind and a value, such as ('token', element)
+    or ('infix', 'ADD'), and are generated as the string is parsed.
+    See PullParser for all of them and the order they come in.
+    """
+
+    if lexer is None:
+        lexer = default_lexer()
+
+    if parser is None:
+        parser = default_parser()
+
+    return parser.events(lexer.lex(string))
+
+
+def iterevents(fp, lexer=None, parser=None, chunk_size=65536):
+    """Parses a file into a stream of events like events
+
+    The file is read in chunks, so only the sections which are open
+    and the elements which have not been finished are kept in memory.
+
+    chunk_size -- int: Number of characters read at a time
+    """
+
+    if lexer is None:
+        lexer = default_lexer()
+
+    if parser is None:
+        parser = default_parser()
+
+    chunks = iter(lambda: fp.read(chunk_size), '')
+    return parser.events(lexer.lex_chunks(chunks))
+
+
+def pprint(tree, file=None):
+    """Prints a tree as from Element.asstring, highlighted by rich
+    if it is installed
+
+    rich is only imported here, so that importing and parsing
+    does not need it or spend any time on it.
+
+    file -- file: Where to print, sys.stdout if None
+    """
+
+    text = tree.asstring()
+
+    try:
+        from rich.console import Console
+    except ImportError:
+        print(text, file=file)
+    else:
+        Console(file=file).print(text, markup=False)
+
+
+def load(fp, lexer=None, parser=None, chunk_size=65536):
+    """Parses a file into ClouScript
+
+    The file is lexed in chunks as it is read, and the tree is the same
+    as the one from loads, with the top level segmented by its delimiters.
+    Only iterload leaves the top-level elements ungrouped. All of it is
+    lexed before it is parsed, so that errors are also those of loads.
+
+    chunk_size -- int: Number of characters read at a time
+    """
+
+    if lexer is None:
+        lexer = default_lexer()
+
+    if parser is None:
+        parser = default_parser()
+
+    # The length of the file is counted as it is read,
+    # for the span of errors of the top level
+    length = 0
+
+    def read():
+        nonlocal length
+        chunk = fp.read(chunk_size)
+        length += len(chunk)
+        return chunk
+
+    elements = list(lexer.lex_chunks(iter(read, '')))
+    return parser.parse(elements, (0, length) if lexer.spans else None)
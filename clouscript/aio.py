@@ -0,0 +1,312 @@
+import asyncio
+import os
+import weakref
+from _thread import allocate_lock
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from . import binary
+from .exceptions import ClouScriptException
+
+
+class AsyncParser:
+    """Parse strings and files from asyncio without blocking the event loop
+
+    Lexing and parsing is done in an executor, the default one
+    of the loop if none is given. With a pool of threads, the lexer
+    and parser are shared by all of them. With a pool of processes,
+    the grammars are sent along with every string and a lexer and parser
+    are built from them once in every process, so lexers with rules
+    of their own can only be used with threads.
+
+    Trees come back from other processes in the binary format, and are
+    built in a thread while the garbage collector is paused. With a pool
+    of threads, the garbage collector may go through all elements
+    in memory while a tree is being built, which holds up the loop
+    for as long as it takes.
+
+    No more than a number of strings or parts of files are handed to
+    the executor at once. Any more wait for their turn, so that a burst
+    of large strings does not fill the executor's queue, and cancelling
+    a task which is waiting takes nothing from the executor. A string which
+    the executor has already started on is parsed to the end, but its
+    tree is let go of.
+    """
+
+    def __init__(self, lexer=None, parser=None, executor=None, max_in_flight=None, batch_size=64):
+        """Arguments:
+            executor -- Executor: Pool of threads or processes to parse in,
+                                  the default one of the loop if None
+            max_in_flight -- int: Number of strings or parts of files
+                                  handed to the executor at once,
+                                  any number if None
+            batch_size -- int: Number of top-level elements parsed
+                               at a time when iterating over a file
+        """
+
+        from . import default_lexer, default_parser
+
+        if lexer is None:
+            lexer = default_lexer()
+
+        if parser is None:
+            parser = default_parser()
+
+        self.lexer = lexer
+        self.parser = parser
+        self.executor = executor
+        self.batch_size = batch_size
+
+        self.processes = isinstance(executor, ProcessPoolExecutor)
+
+        if self.processes and lexer.has_own_rules():
+            raise ValueError('Lexers with rules of their own can not be sent to other processes')
+
+        self.max_in_flight = max_in_flight
+        self.semaphore = None if max_in_flight is None else asyncio.Semaphore(max_in_flight)
+
+    async def run(self, function, *arguments):
+        """Call a function in the executor once there is room for it"""
+
+        loop = asyncio.get_running_loop()
+
+        if self.semaphore is None:
+            return await loop.run_in_executor(self.executor, function, *arguments)
+
+        async with self.semaphore:
+            return await loop.run_in_executor(self.executor, function, *arguments)
+
+    async def loads(self, string):
+        """Parse a string like clouscript.loads"""
+
+        if self.processes:
+            try:
+                data = await self.run(_loads, string, *self.grammars())
+            except ClouScriptException as exception:
+                # As from loads, errors can then tell the line and column
+                if exception.source is None:
+                    exception.source = string
+                raise
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, binary.loads, data)
+
+        from . import loads
+        return await self.run(loads, string, self.lexer, self.parser)
+
+    async def iterload(self, fp, chunk_size=65536):
+        """Parse a file like clouscript.iterload, yielding each top-level
+        element as soon as it is finished
+
+        The elements are parsed a batch at a time, and the loop gets
+        to run other tasks in between. If the iteration is stopped
+        or cancelled, nothing more of the file is read.
+
+        With a pool of processes, the file is split into parts at line
+        breaks outside of any parentheses as it is read, like
+        ParallelParser.split_chunks does, and the parts are parsed in
+        as many processes at once as there is room for. The top level
+        is put together in a thread of the loop's default executor.
+        """
+
+        loop = asyncio.get_running_loop()
+
+        if self.processes:
+            parts = Parts(self, fp, chunk_size, loop)
+            elements = self.parser.iterparse(parts, nested=True)
+
+            # The batches wait for the parts, which are handed to the
+            # executor by the loop, so they can not take any room there
+            run = partial(loop.run_in_executor, None)
+
+        else:
+            from . import iterload
+
+            parts = None
+            elements = iterload(fp, self.lexer, self.parser, chunk_size)
+            run = self.run
+
+        try:
+            while True:
+                batch = await run(_batch, elements, self.batch_size)
+
+                for element in batch:
+                    yield element
+
+                if len(batch) < self.batch_size:
+                    break
+
+        finally:
+            if parts is not None:
+                parts.close()
+
+            try:
+                elements.close()
+            except ValueError:
+                # A batch is still being parsed after being cancelled,
+                # and the generator is closed once it is let go of
+                pass
+
+    def grammars(self):
+        """Get what is sent to other processes to build the lexer and parser"""
+        return self.lexer.grammar, self.parser.grammar, self.parser.pipeline
+
+
+class Parts:
+    """The top-level elements of the parts of a file, parsed in other processes
+
+    The file is read and split as the elements are asked for, in a thread
+    other than the loop's. Every part is handed to the executor through
+    the loop, so that it waits for room like the strings of aloads, and
+    up to as many parts as may be in flight are handed over ahead of
+    the one whose elements are given next.
+    """
+
+    def __init__(self, async_parser, fp, chunk_size, loop):
+        self.async_parser = async_parser
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.loop = loop
+
+        # The offset and future of each part handed over,
+        # in the order they are in the file
+        self.pending = deque()
+        self.closed = False
+
+    def __iter__(self):
+        from .parallel import ParallelParser, _nest
+
+        async_parser = self.async_parser
+        lazy = async_parser.parser.lazy
+        grammars = async_parser.grammars()
+
+        splitter = ParallelParser(async_parser.lexer, async_parser.parser,
+                                  chunk_size=self.chunk_size)
+        chunks = iter(lambda: self.fp.read(self.chunk_size), '')
+
+        window = async_parser.max_in_flight or os.cpu_count() or 1
+        pending = self.pending
+        offset = 0
+
+        try:
+            for part in splitter.split_chunks(chunks):
+                if self.closed:
+                    return
+
+                future = asyncio.run_coroutine_threadsafe(
+                    async_parser.run(_nest, part, *grammars), self.loop)
+                pending.append((offset, future))
+                offset += len(part)
+
+                # Closed while it was being handed over
+                if self.closed:
+                    future.cancel()
+
+                if len(pending) >= window:
+                    yield from binary.loads(self.result(*pending.popleft()), lazy).value
+
+            while pending:
+                yield from binary.loads(self.result(*pending.popleft()), lazy).value
+
+        finally:
+            self.close()
+
+    def result(self, offset, future):
+        """Wait for the elements of a part"""
+
+        try:
+            return future.result()
+        except ClouScriptException as exception:
+            # Positions in errors are those in the whole file, as from iterload
+            if exception.span is not None:
+                start, end = exception.span
+                exception.span = start + offset, end + offset
+            raise
+
+    def close(self):
+        """Stop handing parts over, and let go of those which are not done"""
+
+        self.closed = True
+
+        for _, future in list(self.pending):
+            future.cancel()
+
+
+async def aloads(string, lexer=None, parser=None, executor=None, max_in_flight=None):
+    """Parse a string like clouscript.loads in an executor,
+    without blocking the event loop
+
+    max_in_flight -- int: Number of strings or parts of files handed to
+                          the executor at once by all calls of aloads and
+                          aiterload on the loop with the same executor and
+                          number, as many as there are processors if None
+
+    See AsyncParser to limit the strings of its own calls only
+    """
+    return await _shared(lexer, parser, executor, max_in_flight).loads(string)
+
+
+async def aiterload(fp, lexer=None, parser=None, executor=None, chunk_size=65536,
+                    batch_size=64, max_in_flight=None):
+    """Parse a file like clouscript.iterload in an executor,
+    yielding each top-level element as soon as it is finished
+
+    max_in_flight -- int: The same as for aloads, with which it is shared
+    """
+
+    iterator = _shared(lexer, parser, executor, max_in_flight, batch_size).iterload(fp, chunk_size)
+
+    async for element in iterator:
+        yield element
+
+
+# Semaphores shared by the calls of aloads and aiterload,
+# by event loop and then by executor and number of strings
+_limiters = weakref.WeakKeyDictionary()
+_limiters_lock = allocate_lock()
+
+
+def _shared(lexer, parser, executor, max_in_flight, batch_size=64):
+    """Get an AsyncParser which shares its limit with
+    the other calls on the running loop"""
+
+    if max_in_flight is None:
+        max_in_flight = os.cpu_count() or 1
+
+    loop = asyncio.get_running_loop()
+    key = (executor, max_in_flight)
+
+    with _limiters_lock:
+        limiters = _limiters.get(loop)
+        if limiters is None:
+            limiters = _limiters[loop] = {}
+
+        semaphore = limiters.get(key)
+        if semaphore is None:
+            semaphore = limiters[key] = asyncio.Semaphore(max_in_flight)
+
+    async_parser = AsyncParser(lexer, parser, executor, max_in_flight, batch_size)
+    async_parser.semaphore = semaphore
+
+    return async_parser
+
+
+def _batch(elements, size):
+    """Get the next elements of an iterator, up to a number of them"""
+
+    batch = []
+
+    for element in elements:
+        batch.append(element)
+        if len(batch) == size:
+            break
+
+    return batch
+
+
+def _loads(string, lexer_grammar, parser_grammar, pipeline):
+    from .parallel import _parsers_of
+
+    lexer, parser = _parsers_of(lexer_grammar, parser_grammar, pipeline)
+    return binary.dumps(parser.parse(list(lexer.lex(string))))
@@ -0,0 +1,439 @@
+import gc
+import mmap
+import struct
+import sys
+from array import array
+from functools import partial
+
+from .delimiters import Sequence
+from .element import Element, Deferred
+
+
+# Written at the start of every tree
+MAGIC = b'CLOUTREE'
+VERSION = 2
+
+# Magic, version, and the numbers of nodes, children, strings and floats,
+# followed by the size of the string pool
+HEADER = struct.Struct('<8sB3xIIIIQ')
+
+# What the value of a node is
+TUPLE, SEQUENCE, STRING, INTEGER, BIG, FLOAT, BOOLEAN, NONE, INTEGERS, FLOATS = range(10)
+
+
+def align(size):
+    """Round a size up to a multiple of 8"""
+    return -(-size // 8) * 8
+
+
+class Writer:
+    """Write trees in the binary format
+
+    The format is a table of nodes in columns, and pools of the strings
+    and floats in them. Every node has a type, which is an index into the
+    strings, a tag telling what its value is, a payload and a count.
+    The payload of a node with elements is where they start among the
+    children, which are indices of nodes, and the count is how many there
+    are. For other values it is the integer, boolean, or index into
+    the strings or floats. Integers too large for the payload
+    are kept as strings. The numbers of arrays from the ARRAY rule
+    are kept among the floats, as they are in memory, where the payload
+    is where they start and the count is how many there are.
+
+    Nodes come after the nodes in them, so the root is the last one,
+    and an element found in more than one place is only written once.
+    Every column starts at a multiple of 8 bytes, and all numbers
+    are little-endian.
+    """
+
+    def __init__(self):
+        self.types = array('I')
+        self.tags = array('B')
+        self.payloads = array('q')
+        self.counts = array('I')
+        self.children = array('I')
+        self.floats = array('d')
+
+        self.strings = {}
+
+        # Nodes written so far by the identity of their elements
+        self.written = {}
+
+    def string(self, string):
+        """Get the index of a string in the pool"""
+
+        index = self.strings.get(string)
+
+        if index is None:
+            index = self.strings[string] = len(self.strings)
+
+        return index
+
+    def write(self, tree):
+        """Add the nodes of a tree, giving back the index of its root"""
+
+        written = self.written
+        node = self.node
+        string = self.string
+
+        types = self.types
+        tags = self.tags
+        payloads = self.payloads
+        counts = self.counts
+        children = self.children
+
+        # Go through the elements after those in them, keeping a stack
+        # instead of recursing, since trees may be deeper than Python allows.
+        # Each element is put on it once to go through the elements in it,
+        # and once more beneath them to be written after them
+        stack = [(tree, False)]
+        pop = stack.pop
+        push = stack.append
+        extend = stack.extend
+
+        while stack:
+            element, done = pop()
+
+            if id(element) in written:
+                continue
+
+            value = element.value
+            kind = type(value)
+
+            if kind is not tuple and kind is not list:
+                written[id(element)] = node(element, value)
+
+            elif not done:
+                push((element, True))
+                extend([(child, False) for child in reversed(value)])
+
+            else:
+                # Sections are written here instead of in node,
+                # since there are as many of them as of everything else
+                written[id(element)] = len(types)
+
+                types.append(string(element.type))
+                tags.append(SEQUENCE if type(element) is Sequence else TUPLE)
+                payloads.append(len(children))
+                counts.append(len(value))
+                children.extend([written[id(child)] for child in value])
+
+        return written[id(tree)]
+
+    def node(self, element, value):
+        """Add a node which does not hold other nodes, giving back its index"""
+
+        kind = type(value)
+        payload = 0
+        count = 0
+
+        if kind is str:
+            tag = STRING
+            payload = self.string(value)
+
+        elif kind is bool:
+            tag = BOOLEAN
+            payload = value
+
+        elif kind is int:
+            if -1 << 63 <= value < 1 << 63:
+                tag = INTEGER
+                payload = value
+            else:
+                tag = BIG
+                payload = self.string(str(value))
+
+        elif kind is float:
+            tag = FLOAT
+            payload = len(self.floats)
+            self.floats.append(value)
+
+        elif value is None:
+            tag = NONE
+
+        elif kind is array and value.typecode in ('q', 'd'):
+            tag = INTEGERS if value.typecode == 'q' else FLOATS
+            payload = len(self.floats)
+            count = len(value)
+            self.floats.frombytes(memoryview(value).cast('B'))
+
+        else:
+            raise ValueError(f'{element} can not be written')
+
+        self.types.append(self.string(element.type))
+        self.tags.append(tag)
+        self.payloads.append(payload)
+        self.counts.append(count)
+
+        return len(self.types) - 1
+
+    def getvalue(self):
+        """Get the bytes of the nodes written so far"""
+
+        encoded = [string.encode('utf-8', 'surrogatepass') for string in self.strings]
+
+        offsets = array('Q', [0])
+        total = 0
+        for data in encoded:
+            total += len(data)
+            offsets.append(total)
+
+        columns = [self.types, self.tags, self.payloads, self.counts,
+                   self.children, self.floats, offsets]
+
+        if sys.byteorder == 'big':
+            columns = [array(column.typecode, column) for column in columns]
+            for column in columns:
+                column.byteswap()
+
+        parts = [HEADER.pack(MAGIC, VERSION, len(self.types), len(self.children),
+                             len(self.strings), len(self.floats), total)]
+
+        for column in columns:
+            data = column.tobytes()
+            parts.append(data + bytes(align(len(data)) - len(data)))
+
+        parts.extend(encoded)
+
+        return b''.join(parts)
+
+
+class Reader:
+    """Read trees in the binary format from any buffer, such as a memory map
+
+    The columns are read in place, without copying them, and nodes
+    are only turned into elements once they are asked for. A reader
+    holds on to its buffer for as long as it or any of its elements
+    with values which have not been read yet are around.
+    """
+
+    def __init__(self, buffer, offset=0):
+        """Arguments:
+            buffer -- bytes, mmap: Holds a tree from Writer
+            offset -- int: Where the tree starts in the buffer
+        """
+
+        self.buffer = buffer
+        view = memoryview(buffer)
+
+        if len(view) - offset < HEADER.size:
+            raise ValueError('Buffer is too small for a tree')
+
+        magic, version, nodes, children, strings, floats, total = \
+            HEADER.unpack_from(view, offset)
+
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Buffer does not hold a tree of this version')
+
+        position = offset + HEADER.size
+
+        def column(typecode, count):
+            nonlocal position
+
+            size = array(typecode).itemsize * count
+            data = view[position:position + size]
+            position += align(size)
+
+            if len(data) != size:
+                raise ValueError('Buffer is too small for the tree in it')
+
+            # Columns are only copied on machines which are not little-endian
+            if sys.byteorder == 'big':
+                data = array(typecode, data.tobytes())
+                data.byteswap()
+                return data
+
+            return data.cast(typecode)
+
+        self.types = column('I', nodes)
+        self.tags = column('B', nodes)
+        self.payloads = column('q', nodes)
+        self.counts = column('I', nodes)
+        self.children = column('I', children)
+        self.floats = column('d', floats)
+        self.offsets = column('Q', strings + 1)
+
+        self.pool = view[position:position + total]
+        if len(self.pool) != total:
+            raise ValueError('Buffer is too small for the tree in it')
+
+        # Strings are decoded the first time they are needed
+        self.strings = [None] * strings
+
+    def __len__(self):
+        return len(self.types)
+
+    @property
+    def root(self):
+        return len(self.types) - 1
+
+    def string(self, index):
+        string = self.strings[index]
+
+        if string is None:
+            start, end = self.offsets[index], self.offsets[index + 1]
+            string = self.strings[index] = sys.intern(
+                str(self.pool[start:end], 'utf-8', 'surrogatepass'))
+
+        return string
+
+    def type(self, index):
+        """Get the type of a node"""
+        return self.string(self.types[index])
+
+    def nodes(self, index):
+        """Get the indices of the nodes in a node, or None if it has none"""
+
+        if self.tags[index] > SEQUENCE:
+            return None
+
+        start = self.payloads[index]
+        return self.children[start:start + self.counts[index]]
+
+    def value(self, index):
+        """Get the value of a node which does not hold other nodes"""
+
+        tag = self.tags[index]
+        payload = self.payloads[index]
+
+        if tag == STRING:
+            return self.string(payload)
+        if tag == INTEGER:
+            return payload
+        if tag == FLOAT:
+            return self.floats[payload]
+        if tag == BOOLEAN:
+            return bool(payload)
+        if tag == NONE:
+            return None
+        if tag == BIG:
+            return int(self.string(payload))
+
+        # Arrays are copied out of the buffer, so that they
+        # do not hold on to it or change along with it
+        if tag == INTEGERS or tag == FLOATS:
+            numbers = array('q' if tag == INTEGERS else 'd')
+            numbers.frombytes(memoryview(self.floats[payload:payload + self.counts[index]]).cast('B'))
+            return numbers
+
+        raise ValueError(f'Node {index} holds other nodes')
+
+    def element(self, index=None):
+        """Turn a node into an element, along with all the nodes in it
+
+        Nodes found in more than one place give the same element
+        """
+
+        if index is None:
+            index = self.root
+
+        # Nodes come after the nodes in them, so going through them
+        # in order builds the elements in a node before the node
+        built = [None] * (index + 1)
+
+        # Elements can not hold themselves, so there is nothing for the
+        # garbage collector to find, and it would keep going through
+        # all of them as they are made
+        enabled = gc.isenabled()
+        gc.disable()
+
+        try:
+            self.build(built, index)
+        finally:
+            if enabled:
+                gc.enable()
+
+        return built[index]
+
+    def build(self, built, index):
+        """Build the elements of the nodes up to an index into a list"""
+
+        types = self.types
+        tags = self.tags
+        payloads = self.payloads
+        counts = self.counts
+        children = self.children
+        string = self.string
+        scalar = self.value
+
+        for i in range(index + 1):
+            tag = tags[i]
+
+            if tag <= SEQUENCE:
+                start = payloads[i]
+                value = tuple([built[k] for k in children[start:start + counts[i]]])
+
+                if tag == SEQUENCE:
+                    built[i] = Sequence(value)
+                    continue
+                built[i] = Element(string(types[i]), value)
+            else:
+                built[i] = Element(string(types[i]), scalar(i))
+
+    def tree(self, index=None):
+        """Get the element of a node, turning the nodes in it into elements
+        only once its value is read, and so on for each of them"""
+
+        if index is None:
+            index = self.root
+
+        tag = self.tags[index]
+
+        # Sequences are told apart by their class, so the nodes
+        # directly in them are turned into elements right away
+        if tag == SEQUENCE:
+            return Sequence(self.elements(index))
+
+        if tag == TUPLE:
+            return Deferred(self.type(index), partial(self.elements, index))
+
+        return Element(self.type(index), self.value(index))
+
+    def elements(self, index):
+        return tuple([self.tree(k) for k in self.nodes(index)])
+
+
+def dumps(tree):
+    """Get the bytes of a tree in the binary format"""
+
+    writer = Writer()
+    writer.write(tree)
+    return writer.getvalue()
+
+
+def dump(tree, fp):
+    """Write a tree in the binary format to a binary file"""
+    fp.write(dumps(tree))
+
+
+def loads(data, lazy=False):
+    """Read a tree from bytes in the binary format
+
+    lazy -- bool: Only turn the nodes into elements once they are read
+    """
+
+    reader = Reader(data)
+    return reader.tree() if lazy else reader.element()
+
+
+def load(fp, lazy=False):
+    """Read a tree in the binary format from a binary file
+
+    lazy -- bool: Only turn the nodes into elements once they are read
+    """
+    return loads(fp.read(), lazy)
+
+
+def load_mapped(path, lazy=False):
+    """Read a tree from a file in the binary format by mapping it into memory
+
+    lazy -- bool: Only turn the nodes into elements once they are read,
+                  so that a large tree is loaded right away and only
+                  the pages of the file which are read are loaded
+    """
+
+    with open(path, 'rb') as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    reader = Reader(mapping)
+    return reader.tree() if lazy else reader.element()
@@ -0,0 +1,253 @@
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from . import binary
+
+
+# Written at the start of every file in the on-disk store.
+# The version has to be raised whenever the format of the trees changes
+MAGIC = b'CLOUSCRIPT'
+VERSION = 5
+
+
+class ParseCache:
+    """A cache of parsed trees, addressed by their contents
+
+    The key of an entry is a digest of the source string and of the
+    configuration of the lexer and parser: parentheses, delimiters,
+    infixes, types, capsules, any lexing rules of their own,
+    and whether the lexer gives spans. Rules of their own are told apart
+    by the code of their processes and everything it refers to, such as
+    closures and globals. A key has to be given in its place for rules
+    which depend on values which can not be told apart that way.
+
+    Entries are kept in memory up to a number of them, evicting the least
+    recently used first, and optionally in a directory on disk as well.
+    Files on disk start with the format version and the fingerprint
+    of the configuration, and are ignored and removed if either
+    does not match or the file can not be read.
+
+    Trees are stored in the binary format, and files are mapped into
+    memory when they are read, so that the elements of a tree from disk
+    are only made as they are read. The file stays mapped until all
+    of them have been, or the tree is let go of. The binary format
+    has no spans, so trees with spans are only kept in memory.
+
+    The same tree is returned for every hit, so it must not be changed.
+    Only use a directory which nobody else can write to,
+    since a tree is read from a file long after it is checked.
+    """
+
+    def __init__(self, maxsize=128, directory=None):
+        """Arguments:
+            maxsize -- int: Number of trees to keep in memory
+            directory -- str: Where to store trees on disk, if anywhere
+        """
+
+        self.maxsize = maxsize
+        self.directory = directory
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+
+    def loads(self, string, lexer, parser, parse=None, key=None):
+        """Parse a string, or get the tree from the last time it was parsed
+
+        parse -- callable: Parses the string in place of the lexer and parser
+        key -- str: Tells the rules of the lexer apart in place of
+                    their fingerprint. It has to be given for lexers whose
+                    processes depend on anything which can not be
+                    fingerprinted, and must differ whenever they do
+        """
+
+        fingerprint = fingerprint_of(lexer, parser, key)
+        key = self.key(string, fingerprint)
+
+        # Spans would be lost on disk
+        disk = not lexer.spans
+
+        tree = self.get(key, fingerprint, disk)
+        if tree is None:
+            if parse is None:
+                span = (0, len(string)) if lexer.spans else None
+                tree = parser.parse(list(lexer.lex(string)), span)
+            else:
+                tree = parse(string)
+            self.put(key, fingerprint, tree, disk)
+
+        return tree
+
+    def key(self, string, fingerprint):
+        """Get the key for a string parsed with a configuration"""
+
+        digest = hashlib.blake2b(fingerprint.encode(), digest_size=20)
+        digest.update(string.encode('utf-8', 'surrogatepass'))
+
+        return digest.hexdigest()
+
+    def get(self, key, fingerprint, disk=True):
+        """Get a tree from memory or from disk, or None if there is none"""
+
+        with self.lock:
+            tree = self.entries.get(key)
+
+            if tree is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return tree
+
+        tree = self.read(key, fingerprint) if disk else None
+
+        with self.lock:
+            if tree is None:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+                self.remember(key, tree)
+
+        return tree
+
+    def put(self, key, fingerprint, tree, disk=True):
+        """Store a tree in memory and on disk"""
+
+        with self.lock:
+            self.remember(key, tree)
+
+        if disk:
+            self.write(key, fingerprint, tree)
+
+    def remember(self, key, tree):
+        """Keep a tree in memory, evicting the least recently used ones"""
+
+        self.entries[key] = tree
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.cst')
+
+    def header(self, fingerprint):
+        header = MAGIC + bytes([VERSION]) + bytes.fromhex(fingerprint)
+
+        # Pad the header so that the columns of the tree are aligned
+        return header + bytes(binary.align(len(header)) - len(header))
+
+    def read(self, key, fingerprint):
+        """Read a tree from disk, or None if there is no valid one"""
+
+        if self.directory is None:
+            return None
+
+        path = self.path(key)
+        header = self.header(fingerprint)
+
+        try:
+            file = open(path, 'rb')
+        except OSError:
+            return None
+
+        try:
+            with file:
+                if file.read(len(header)) != header:
+                    raise ValueError('Stale or foreign cache file')
+
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            return binary.Reader(data, len(header)).tree()
+
+        except Exception:
+            # Remove anything that can not be used
+            # so that it gets written again
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+            return None
+
+    def write(self, key, fingerprint, tree):
+        """Write a tree to disk, replacing the file in a single step"""
+
+        if self.directory is None:
+            return
+
+        data = self.header(fingerprint) + binary.dumps(tree)
+
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+            os.replace(temporary, self.path(key))
+        except OSError:
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return
+
+        with self.lock:
+            self.disk_writes += 1
+
+    def clear(self):
+        """Forget all trees in memory"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Get the number of hits, misses, and evictions so far"""
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_hits': self.disk_hits,
+                'disk_writes': self.disk_writes,
+            }
+
+
+def fingerprint_of(lexer, parser, key=None):
+    """Get the fingerprint of a lexer and a parser together
+
+    key -- str: Stands for the rules of the lexer, if given
+    """
+
+    if key is None:
+        lexer_fingerprint = lexer.fingerprint()
+
+        if lexer_fingerprint is None:
+            raise ValueError('The rules of the lexer can not be fingerprinted, '
+                             'so a key has to be given to cache its trees')
+    else:
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(repr((key, lexer.grammar.fingerprint(), lexer.spans)).encode())
+        lexer_fingerprint = digest.hexdigest()
+
+    parser_fingerprint = parser.fingerprint()
+
+    if lexer_fingerprint == parser_fingerprint:
+        return lexer_fingerprint
+
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(lexer_fingerprint.encode())
+    digest.update(parser_fingerprint.encode())
+
+    return digest.hexdigest()
@@ -0,0 +1,316 @@
+import threading
+from collections import OrderedDict
+
+from .exceptions import CompilingError
+from .lexer import unescape
+
+
+# How tightly the Python expressions bind, from the loosest
+OR, AND, COMPARISON, SUM, PRODUCT, SIGN, POWER, ATOM = range(1, 9)
+
+
+def assign(target, key, value):
+    """Set an item of a mapping and give back the value"""
+    target[key] = value
+    return value
+
+
+class Compiler:
+    """Compile trees into Python functions which evaluate them
+
+    A tree is turned into the source of a single Python expression,
+    which is compiled into a function of the variables. Calling it
+    evaluates the tree as fast as the same expression written in Python.
+
+    Labels are the items of the variables, and calls of labels are
+    calls of the items of the functions. Setting a label or an index
+    sets the item in the variables or in what is indexed. An index with
+    a label gives the item of that name. Round parentheses with a single
+    element group it and make a tuple otherwise, square parentheses and
+    sequences make lists, and curly parentheses and the whole tree are
+    blocks, which evaluate every element in turn and give the last.
+
+    The function of a tree is kept, so compiling the same tree again
+    gives it back right away. Trees must not be changed once compiled.
+    A compiler may be shared by many threads, which may each compile
+    a tree which is not kept yet before one of them keeps it.
+    """
+
+    # Python operators for the types of infix elements, and how tightly
+    # they bind. Comparisons can not be chained like they are in Python
+    OPERATORS = {
+        'or': ('or', OR),
+        'and': ('and', AND),
+
+        'in': ('in', COMPARISON),
+        'not in': ('not in', COMPARISON),
+        'is': ('is', COMPARISON),
+        'is not': ('is not', COMPARISON),
+
+        'EQ': ('==', COMPARISON),
+        'NE': ('!=', COMPARISON),
+        'LT': ('<', COMPARISON),
+        'LE': ('<=', COMPARISON),
+        'GT': ('>', COMPARISON),
+        'GE': ('>=', COMPARISON),
+
+        'ADD': ('+', SUM),
+        'SUB': ('-', SUM),
+
+        'MUL': ('*', PRODUCT),
+        'DIV': ('/', PRODUCT),
+        'FDIV': ('//', PRODUCT),
+        'MOD': ('%', PRODUCT),
+
+        'POW': ('**', POWER),
+    }
+
+    # Infixes whose operands are the other way around in Python
+    REVERSED = {
+        'has': 'in',
+        'has not': 'not in',
+    }
+
+    LITERALS = ('INTEGER', 'FLOAT', 'HEXADECIMAL', 'BOOLEAN', 'NULL')
+
+    def __init__(self, functions=None, maxsize=256):
+        """Arguments:
+            functions -- dict: Functions called by name, which may be
+                               changed after compiling
+            maxsize -- int: Number of compiled trees to keep
+        """
+
+        if functions is None:
+            functions = {}
+
+        self.functions = functions
+        self.maxsize = maxsize
+
+        # Compiled functions by the identity of their trees,
+        # along with the trees to keep them from being reused
+        self.compiled = OrderedDict()
+        self.lock = threading.Lock()
+
+    def compile(self, tree):
+        """Get a function which evaluates a tree with a mapping of variables"""
+
+        with self.lock:
+            entry = self.compiled.get(id(tree))
+
+            if entry is not None and entry[0] is tree:
+                self.compiled.move_to_end(id(tree))
+                return entry[1]
+
+        function = self.build(self.source(tree))
+
+        with self.lock:
+            self.compiled[id(tree)] = (tree, function)
+            if len(self.compiled) > self.maxsize:
+                self.compiled.popitem(last=False)
+
+        return function
+
+    def evaluate(self, tree, variables=None):
+        """Evaluate a tree with a mapping of variables"""
+
+        if variables is None:
+            variables = {}
+
+        return self.compile(tree)(variables)
+
+    def source(self, tree):
+        """Get the source of the Python expression of a tree"""
+
+        try:
+            return self.expression(tree)[0]
+        except RecursionError:
+            raise CompilingError('Tree is nested too deeply to compile') from None
+
+    def build(self, expression):
+        """Compile the source of an expression into a function"""
+
+        names = self.names()
+
+        # The names are bound in a closure, which is faster than globals
+        source = (
+            f'def build({", ".join(names)}):\n'
+            '    def evaluate(V):\n'
+            f'        return {expression}\n'
+            '    return evaluate\n'
+        )
+
+        namespace = {}
+
+        try:
+            exec(compile(source, '<clouscript>', 'exec'), namespace)
+        except (RecursionError, SyntaxError, MemoryError):
+            raise CompilingError('Tree is nested too deeply to compile') from None
+
+        function = namespace['build'](**names)
+        function.source = expression
+
+        return function
+
+    def names(self):
+        """Get the names used in the source of the expressions, and what they are"""
+        return {'F': self.functions, '_assign': assign}
+
+    def expression(self, element):
+        """Get the source of an element as a Python expression,
+        along with how tightly it binds"""
+
+        type_ = element.type
+        value = element.value
+
+        if type_ in self.OPERATORS:
+            return self.chain(element)
+
+        if type_ in self.REVERSED:
+            right, left = value
+            return self.operator(self.REVERSED[type_], COMPARISON, left, right)
+
+        if type_ == 'LABEL':
+            return f'V[{value!r}]', ATOM
+
+        if type_ in self.LITERALS:
+            return self.literal(value)
+
+        if type_ == 'STRING':
+            return repr(unescape(value)), ATOM
+
+        if type_ == 'SET':
+            return self.set(*value), ATOM
+
+        if type_ == 'INDEX':
+            left, right = value
+            return f'{self.operand(left, ATOM)}[{self.key(right)}]', ATOM
+
+        if type_ == 'CALL':
+            return self.call(value[0], value[1:]), ATOM
+
+        if type_ == 'ROUND':
+            if len(value) == 1:
+                return f'({self.expression(value[0])[0]})', ATOM
+            return f'({"".join(f"{source}, " for source in self.sources(value))})', ATOM
+
+        if type_ in ('SQUARE', 'SEQUENCE'):
+            return f'[{", ".join(self.sources(value))}]', ATOM
+
+        # A list, like the square section the array was lexed from
+        if type_ == 'ARRAY':
+            return repr(value.tolist()), ATOM
+
+        if type_ in ('CURLY', ''):
+            return self.block(value)
+
+        raise CompilingError(f'{element} can not be compiled', element.span)
+
+    def chain(self, element):
+        """Get the source of an infix element
+
+        The left operands of infixes which read from left to right are
+        gone through one after another instead of recursively, so that
+        long chains of them can be compiled
+        """
+
+        chain = []
+
+        while element.type in self.OPERATORS:
+            operator, precedence = self.OPERATORS[element.type]
+            if precedence in (COMPARISON, POWER):
+                break
+
+            left, right = element.value
+            chain.append((operator, precedence, right))
+            element = left
+
+        if not chain:
+            return self.operator(*self.OPERATORS[element.type], *element.value)
+
+        source, binds = self.expression(element)
+
+        for operator, precedence, right in reversed(chain):
+            if binds < precedence:
+                source = f'({source})'
+
+            source = f'{source} {operator} {self.operand(right, precedence + 1)}'
+            binds = precedence
+
+        return source, binds
+
+    def operator(self, operator, precedence, left, right):
+        """Get the source of an infix operator applied to two elements"""
+
+        # Both operands have to bind more tightly than the operator,
+        # other than the left operand of one which reads from left to right
+        # or the right operand of powers, which read from right to left
+        if precedence in (COMPARISON, POWER):
+            left = self.operand(left, precedence + 1)
+        else:
+            left = self.operand(left, precedence)
+
+        if precedence == POWER:
+            right = self.operand(right, precedence)
+        else:
+            right = self.operand(right, precedence + 1)
+
+        return f'{left} {operator} {right}', precedence
+
+    def operand(self, element, precedence):
+        """Get the source of an element, in parentheses
+        if it does not bind as tightly as needed"""
+
+        source, binds = self.expression(element)
+
+        if binds < precedence:
+            return f'({source})'
+        return source
+
+    def sources(self, elements):
+        return [self.expression(element)[0] for element in elements]
+
+    def literal(self, value):
+        source = repr(value)
+
+        if source.startswith('-'):
+            return source, SIGN
+        return source, ATOM
+
+    def key(self, element):
+        """Get the source of what is indexed with, where a label is its name"""
+
+        if element.type == 'LABEL':
+            return repr(element.value)
+        return self.expression(element)[0]
+
+    def set(self, target, value):
+        value = self.expression(value)[0]
+
+        if target.type == 'LABEL':
+            return f'_assign(V, {target.value!r}, {value})'
+
+        if target.type == 'INDEX':
+            left, right = target.value
+            return f'_assign({self.expression(left)[0]}, {self.key(right)}, {value})'
+
+        raise CompilingError(f'{target} can not be set', target.span)
+
+    def call(self, function, arguments):
+        arguments = ', '.join(self.sources(arguments))
+
+        if function.type == 'LABEL':
+            return f'F[{function.value!r}]({arguments})'
+
+        return f'{self.operand(function, ATOM)}({arguments})'
+
+    def block(self, elements):
+        """Get the source of elements which are evaluated
+        in turn, giving the value of the last"""
+
+        if not elements:
+            return 'None', ATOM
+
+        if len(elements) == 1:
+            return self.expression(elements[0])
+
+        return f'({", ".join(self.sources(elements))})[-1]', ATOM
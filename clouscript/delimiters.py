@@ -25,6 +25,11 @@ class Delimiters:
                             If allowed, empty sections will result in empty lists
         """
         self.delimiters = [Element('DELIMITER', d) for d in delimiters]
+
+        # Level of each delimiter character, from the highest priority
+        self.levels = {}
+        for level, d in enumerate(delimiters):
+            self.levels.setdefault(d, level)
         self.regex = f'[{re.escape(delimiters)}]'
 
         self.flatten_mode = flatten_mode
@@ -121,18 +126,241 @@ class Delimiters:
 
     def segment(self, elements):
         """Segment an array by delimiters"""
-        if not self.contains(elements):
-            return elements
-        return self.segment_many(elements, self.delimiters)
+        segmenter = Segmenter(self)
+        segmenter.extend(elements)
+        return segmenter.close()
+
+    def assemble(self, sections, level):
+        """Turn a section tree from segment into sequences"""
+
+        depth = len(self.delimiters)
+
+        # Skip the levels whose delimiter is not found in this section
+        while level < depth and len(sections) == 1:
+            sections = sections[0]
+            level += 1
+
+        if level == depth:
+            return sections
+
+        # The sections of the deepest level hold nothing but elements
+        leaves = level + 1 == depth
+
+        if leaves:
+            lengths = list(map(len, sections))
+        else:
+            lengths = [self.length(section, level + 1) for section in sections]
+
+        # Raise error if there are empty sections and it is not allowed
+        if not self.allow_empty_sections:
+            if not all(lengths):
+                raise EmptySection('Empty sections are not allowed')
+
+        # Flatten sections which contain only one element,
+        # either in any case or only if no section is any longer
+        flatten = self.flatten_mode == 'local' \
+            or self.flatten_mode == 'global' and max(lengths) <= 1
+
+        assembled = []
+        for section, length in zip(sections, lengths):
+            if flatten and length == 1:
+                assembled.append(self.single(section, level + 1))
+            elif leaves:
+                assembled.append(Sequence(section))
+            else:
+                # Convert all other sections into sequence elements
+                assembled.append(Sequence(self.assemble(section, level + 1)))
+
+        return assembled
+
+    def part(self, elements, flatten):
+        """Get what the elements between two delimiters of the highest level
+        found become, the same as when segmented along with the others
+
+        Arguments:
+            elements -- list: The elements, with only lower level delimiters
+            flatten -- bool: Whether the sections of that level are flattened
+
+        Returns None for a section which segment leaves to segment_many
+        """
+
+        if flatten and len(elements) == 1:
+            element = elements[0]
+            if element.type == 'DELIMITER' and element.value in self.levels:
+                return None
+            return element
+
+        segmenter = Segmenter(self)
+        segmenter.extend(elements)
+
+        if segmenter.path is None:
+            return Sequence(segmenter.elements)
+
+        try:
+            return Sequence(self.assemble(segmenter.root, 0))
+        except _LoneDelimiter:
+            return None
+
+    def length(self, section, level):
+        """Count the elements and delimiters in a section tree"""
+
+        depth = len(self.delimiters)
+
+        if level == depth:
+            return len(section)
+
+        if level + 1 == depth:
+            return sum(map(len, section)) + len(section) - 1
+
+        return sum(self.length(s, level + 1) for s in section) + len(section) - 1
+
+    def single(self, section, level):
+        """Get the only element in a section tree"""
+
+        depth = len(self.delimiters)
+
+        while level < depth and len(section) == 1:
+            section = section[0]
+            level += 1
+
+        if level < depth:
+            raise _LoneDelimiter()
+
+        return section[0]
+
+
+class Segmenter:
+    """Segment elements by every delimiter level as they are added
+
+    All delimiter levels are split in a single walk over the elements,
+    which builds a tree of sections with one level per delimiter.
+    The tree is then turned into sequences the same way
+    as by segmenting each level in turn with segment_many.
+    """
+
+    def __init__(self, delimiters):
+        self.delimiters = delimiters
+        self.levels = delimiters.levels
+        self.depth = len(delimiters.delimiters)
+
+        # Elements added since the last delimiter
+        self.elements = []
+
+        # Every section holds the sections of the next level,
+        # and the ones at the deepest level hold the elements.
+        # Keep track of the last opened section of each level.
+        # The tree is only built once a delimiter is found
+        self.root = None
+        self.path = None
+
+    def add(self, element):
+        """Add the next element"""
+
+        level = self.levels.get(element.value) if element.type == 'DELIMITER' else None
+
+        if level is None:
+            self.elements.append(element)
+        else:
+            self.split(level)
+
+    def extend(self, elements):
+        """Add the next elements"""
+
+        levels = self.levels
+        add = self.elements.append
+
+        for element in elements:
+            level = levels.get(element.value) if element.type == 'DELIMITER' else None
+
+            if level is None:
+                add(element)
+            else:
+                self.split(level)
+                add = self.elements.append
+
+    def split(self, level):
+        """Open a new section for a level,
+        and new sections for every level below it"""
+
+        path = self.path
+
+        if path is None:
+            # Put the elements so far in the first section of every level
+            self.root = []
+            path = self.path = [self.root]
+            for level_ in range(self.depth - 1):
+                path.append([])
+                path[level_].append(path[-1])
+            path.append(self.elements)
+            path[-2].append(self.elements)
+
+        for level in range(level, self.depth):
+            path[level + 1] = []
+            path[level].append(path[level + 1])
+
+        self.elements = path[-1]
+
+    def close(self):
+        """Get the segmented elements"""
+
+        if self.path is None:
+            return self.elements
+
+        try:
+            return self.delimiters.assemble(self.root, 0)
+        except _LoneDelimiter:
+            # A section consisting only of a lower level delimiter
+            # gets flattened into that delimiter, which segment_many
+            # goes on to segment by. Leave such arrays to it instead
+            elements = self.join(self.root, 0)
+            return self.delimiters.segment_many(elements, self.delimiters.delimiters)
+
+    def join(self, sections, level):
+        """Get the elements of a section tree back with delimiters in between"""
+
+        if level == self.depth:
+            return list(sections)
+
+        delimiter = self.delimiters.delimiters[level]
+
+        elements = []
+        for i, section in enumerate(sections):
+            if i:
+                elements.append(delimiter)
+            elements.extend(self.join(section, level + 1))
+
+        return elements
+
+
+class _LoneDelimiter(Exception):
+    """A section consists of nothing but a single delimiter"""
 
 
 class Sequence(Element):
     """A sequence generated from delimiter segmentation"""
-    
+
+    __slots__ = ()
+
     def __init__(self, array):
-        if type(array) is not list:
-            raise ValueError('Value must be a list')
-        super().__init__('SEQUENCE', array)
+        if type(array) not in (list, tuple):
+            raise ValueError('Value must be a list or a tuple')
+        super().__init__('SEQUENCE', tuple(array))
+
+    def __reduce__(self):
+        return Sequence, (self.value,)
+
+    @property
+    def span(self):
+        # From the first element to the last, if they have spans
+        if not self.value:
+            return None
+
+        first, last = self.value[0].span, self.value[-1].span
+
+        if first is None or last is None:
+            return None
+
+        return first[0], last[1]
 
     def __len__(self):
         return len(self.value)
\ No newline at end of file
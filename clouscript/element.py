@@ -5,12 +5,24 @@ class Element:
     It represents anything from a function call
     to an integer or a collection.
     All types of elements inherit from this class.
+
+    Elements have no instance dictionary to keep them small,
+    and the elements of a section are held in a tuple.
+    Type names are interned where they are defined,
+    so that all elements of a type share the same string.
     """
-    
+
+    __slots__ = ('type', 'value')
+
     def __init__(self, type_, value):
         self.type = type_
         self.value = value
 
+    def __reduce__(self):
+        # Pickle as a call instead of by the slots,
+        # which is both smaller and faster
+        return type(self), (self.type, self.value)
+
     def __repr__(self):
         return f'<{self.type}: {repr(self.value)}>'
 
@@ -25,10 +37,18 @@ class Element:
         if type(other) is str:
             return self.type == other
 
-        if type(other) is Element:
+        if isinstance(other, Element):
             return self.type == other.type \
               and self.value == other.value
 
+        return NotImplemented
+
+    @property
+    def span(self):
+        """Offsets of the start and end of the element in its source,
+        or None if it was not lexed with spans"""
+        return None
+
     def asstring(self, indent=1):
         if type(self.value) in (list, tuple):
             subelements = '\n'.join(
@@ -38,4 +58,171 @@ class Element:
 
             return f'<{self.type}>\n{subelements}'
             
-        return f'<{self.type}: {self.value}>'
\ No newline at end of file
+        return f'<{self.type}: {self.value}>'
+
+
+class Spanned(Element):
+    """An element along with where it is in its source
+
+    start -- int: Offset of its first character
+    end -- int: Offset after its last character
+
+    Spanned elements are equal to elements of the same type and value,
+    so trees with and without spans compare the same.
+    """
+
+    __slots__ = ('start', 'end')
+
+    def __init__(self, type_, value, start, end):
+        self.type = type_
+        self.value = value
+        self.start = start
+        self.end = end
+
+    def __reduce__(self):
+        return Spanned, (self.type, self.value, self.start, self.end)
+
+    @property
+    def span(self):
+        return self.start, self.end
+
+    @staticmethod
+    def between(type_, value, first, last):
+        """Get an element spanning from the start of one element
+        to the end of another, without a span if either has none"""
+
+        # The offsets of located elements are only looked up once asked for.
+        # An infix finds its span through its value, and other elements
+        # formed out of located ones, such as sections, through those
+        if value is not None and (type(first) in LOCATED or type(last) in LOCATED):
+            if value and value[0] is first and value[-1] is last:
+                return Joined(type_, value)
+
+            first, last = leftmost(first), rightmost(last)
+
+            if type(first) is Located and type(last) is Located \
+                    and first.offsets is last.offsets:
+                return first.offsets.join(type_, value, first, last)
+
+        first, last = first.span, last.span
+
+        if first is None or last is None:
+            return Element(type_, value)
+
+        return Spanned(type_, value, first[0], last[1])
+
+
+class Located(Element):
+    """An element lexed with spans, or formed out of such elements,
+    whose offsets are kept apart by an Offsets object
+
+    offsets -- Offsets: The offsets of every element lexed from its string
+
+    Its span is only looked up when asked for, so an element with spans
+    takes a single slot more than one without.
+    """
+
+    __slots__ = ('offsets',)
+
+    def __init__(self, type_, value, offsets):
+        self.type = type_
+        self.value = value
+        self.offsets = offsets
+
+    def __reduce__(self):
+        return Spanned, (self.type, self.value, *self.span)
+
+    @property
+    def span(self):
+        return self.offsets.span(self)
+
+
+class Joined(Element):
+    """An element formed by an infix out of elements with spans,
+    spanning from the start of the first to the end of the last
+
+    Like a Sequence, it takes no more room than an element without
+    a span, and finds its span through its value when asked for.
+    """
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return Spanned, (self.type, self.value, *self.span)
+
+    @property
+    def span(self):
+        first, last = leftmost(self).span, rightmost(self).span
+
+        if first is None or last is None:
+            return None
+
+        return first[0], last[1]
+
+
+def leftmost(element):
+    """Get the element an infix starts with"""
+
+    # Long chains of infixes are gone through one after another
+    while type(element) is Joined:
+        element = element.value[0]
+
+    return element
+
+
+def rightmost(element):
+    """Get the element an infix ends with"""
+
+    while type(element) is Joined:
+        element = element.value[-1]
+
+    return element
+
+
+# Elements whose spans are only looked up once asked for
+LOCATED = (Located, Joined)
+
+
+class Deferred(Element):
+    """An element whose value is only worked out the first time it is read
+
+    compute -- callable: Gives the value, and is let go of afterward
+    start, end -- int: Offsets of the section in its source, if known
+
+    The value is kept in the slot of Element, so a deferred element
+    can be used anywhere an element can, and is pickled as one.
+    """
+
+    __slots__ = ('compute', 'start', 'end')
+
+    def __init__(self, type_, compute, start=None, end=None):
+        self.type = type_
+        self.compute = compute
+        self.start = start
+        self.end = end
+
+    @property
+    def span(self):
+        if self.start is None:
+            return None
+        return self.start, self.end
+
+    @property
+    def value(self):
+        # Threads reading the value at once may each work it out,
+        # but only ever call the function which is still there
+        compute = self.compute
+
+        if compute is not None:
+            Element.value.__set__(self, compute())
+            self.compute = None
+
+        return Element.value.__get__(self)
+
+    @value.setter
+    def value(self, value):
+        Element.value.__set__(self, value)
+        self.compute = None
+
+    def __reduce__(self):
+        return Element, (self.type, self.value)
@@ -1,6 +1,38 @@
+class ClouScriptException(Exception):
+    """Base of all errors in lexing, parsing and compiling
 
+    span -- tuple: Offsets of the start and end in the source of what
+                   the error is about, or None if they are not known
+    source -- str: The source, which the line and column are found in
+                   once they are asked for, or None if it is not known
+    """
 
-class ClouScriptException(Exception): pass
+    def __init__(self, message='', span=None, source=None):
+        super().__init__(message)
+        self.span = span
+        self.source = source
+
+    def __reduce__(self):
+        return type(self), (*self.args[:1], self.span, self.source)
+
+    def location(self):
+        """Get the line and column of the start of the span,
+        or None if the span or the source is not known"""
+
+        if self.span is None or self.source is None:
+            return None
+
+        from .spans import Lines
+        return Lines(self.source).location(self.span[0])
+
+    def __str__(self):
+        message = super().__str__()
+        location = self.location()
+
+        if location is None:
+            return message
+
+        return f'{message} (line {location[0]}, column {location[1]})'
 
 
 class LexingError(ClouScriptException):
@@ -15,6 +47,9 @@ class EmptySection(LexingError):
 class NoMatch(LexingError):
     """No lexing rule could be matched"""
 
+class InvalidRule(LexingError):
+    """A lexing rule can not be compiled"""
+
 
 
 class ParsingError(ClouScriptException):
@@ -28,6 +63,11 @@ class UnmatchedInfix(InfixError):
     """Missing righthand or lefthand side element for infix"""
 
 
+class PipelineMismatch(ParsingError):
+    """Reducing a section in one pass and in three stages
+    gave different results"""
+
+
 class ParenthesisError(ParsingError):
     """Attempting to close a section
     with an incorrect right-hand parenthesis"""
@@ -38,4 +78,8 @@ class MismatchedParentheses(ParenthesisError):
 
 class InvalidParenthesis(ParenthesisError):
     """Element type is a valid parenthesis group
-    but the value is not a valid parenthesis"""
\ No newline at end of file
+    but the value is not a valid parenthesis"""
+
+
+class CompilingError(ClouScriptException):
+    """Elements can not be compiled into Python"""
@@ -0,0 +1,323 @@
+import re
+import sys
+from array import array
+from _thread import allocate_lock
+from functools import cached_property
+
+from .lexer import Scanner
+
+
+# A string ends at the first quote which is not escaped by a backslash,
+# or at the last escaped one if there are no others. Runs of anything
+# but quotes are matched in one go, and the only backtracking is
+# from the end of the string to the last escaped quote
+STRING = r'\"([^"]*(?:(?<=\\)\"[^"]*)*)\"'
+
+# A line comment, along with the spaces after it
+LINE_COMMENT = r'//.*[\s\n]*'
+
+# A block comment, which ends at the first closing and may span lines.
+# The stars and other characters in it are matched in runs which can not
+# overlap, so one which is never closed fails after going over it once
+BLOCK_COMMENT = r'\/\*[^*]*\*+(?:[^/*][^*]*\*+)*\/'
+
+# Numbers in arrays, as the spacious rules match them. Integers have
+# few enough digits to always fit in 64 bits, and larger ones are lexed
+# one at a time like in any other section. A point with no digit or minus
+# before it is matched as an infix by the solid rules before any float
+ARRAY_INTEGER = r'-?\d{1,18}'
+ARRAY_FLOAT = r'(?:-?\d+|-)\.\d+'
+
+# The numbers of an array are matched possessively where Python can,
+# since otherwise every one of them is kept track of to backtrack to,
+# which takes several times the memory of the array itself
+POSSESSIVE = '+' if sys.version_info >= (3, 11) else ''
+
+
+class Grammar:
+    """The configuration shared by a lexer and a parser
+
+    Parentheses, delimiters, infixes and capsules are built once,
+    together with the default lexing rules and their compiled scanners,
+    so that any number of lexers and parsers can be created from it
+    without rebuilding any of them.
+
+    A grammar can be pickled. Only the configuration is sent along,
+    and the rules and scanners are compiled again when it is loaded.
+
+    Nothing is changed while lexing or parsing, so a grammar, and the lexers
+    and parsers built from it, may be shared by any number of threads.
+    Lexers and parsers should not be configured, such as by adding rules,
+    while other threads use them. What is made for a single use, like
+    the stats of a ProfilingParser or an incremental Document,
+    belongs to one thread at a time.
+    """
+
+    def __init__(self, parentheses=None, delimiters=None, infixes=None, capsules=None, arrays=None):
+        """Arguments:
+            parentheses -- Parentheses: Parenthesis groups
+            delimiters -- Delimiters: Delimiters used for segmentation
+            infixes -- Infixes: Infixes and their priorities
+            capsules -- dict: Parenthesis groups which form function calls
+                              or the likes with the preceding element,
+                              and the names of the elements they form
+            arrays -- int: Lex square sections of at least this many numbers
+                           into single ARRAY elements, or never if None
+
+        A square section holding only integers, or only floats, separated
+        by the lowest delimiter, is lexed in one go into an ARRAY element. Its value is an array.array of the numbers,
+        with the typecode 'q' for integers and 'd' for floats, in place of
+        an element for every number. numpy.frombuffer(element.value,
+        element.value.typecode) gives a NumPy array of it without copying.
+        Arrays are never lexed if SQUARE is a capsule, since the section
+        would form an element with the one before it.
+
+        Anything not specified is shared with the default grammar
+        """
+
+        if None in (parentheses, delimiters, infixes, capsules):
+            default = default_grammar()
+
+            if parentheses is None:
+                parentheses = default.parentheses
+
+            if delimiters is None:
+                delimiters = default.delimiters
+
+            if infixes is None:
+                infixes = default.infixes
+
+            if capsules is None:
+                capsules = default.capsules
+
+        self.parentheses = parentheses
+        self.delimiters = delimiters
+        self.infixes = infixes
+        self.capsules = capsules
+        self.arrays = arrays
+
+        self.compile()
+
+    def compile(self):
+        """Build the default lexing rules and their scanners"""
+
+        # The lexer raises an error as soon as this rule matches
+        self.unclosed = (r'\/\*', lambda g: (None, None))
+
+        self.solids = [
+            # Parentheses
+            (self.parentheses.regex, lambda g: (
+                self.parentheses.find_group(g[0]),
+                g[0]
+            )),
+
+            # Delimiters
+            (self.delimiters.regex, lambda g: (
+                'DELIMITER',
+                g[0]
+            )),
+
+            # Indexing period
+            (r'\.', lambda g: ('INFIX', '.')),
+
+            # Comments and spaces
+            ('|'.join([LINE_COMMENT, r'[\s\n]+', BLOCK_COMMENT]),
+                lambda g: (None, None)),
+
+            # A block comment which is never closed
+            self.unclosed,
+        ]
+
+        self.spacious = [
+            # Hexadecimal
+            (r'0x([0-9a-fA-F]+)', lambda g: (
+                'HEXADECIMAL',
+                int(g[1], 16)
+            )),
+
+            # Float
+            (r'\-?\d*\.\d+', lambda g: (
+                'FLOAT',
+                float(g[0])
+            )),
+
+            # Integer
+            (r'\-?\d+', lambda g: (
+                'INTEGER',
+                int(g[0])
+            )),
+
+            # String
+            (STRING, lambda g: (
+                'STRING',
+                g[0]
+            )),
+
+            # Boolean
+            (r'true|false', lambda g: (
+                'BOOLEAN',
+                g[0] == 'true'
+            )),
+
+            # Null
+            (r'null', lambda g: ('NULL', None)),
+
+            # Infix
+            (self.infixes.regex, lambda g: (
+                'INFIX',
+                sys.intern(g[0])
+            )),
+
+            # Label
+            (r'[\w\_][\w\d\_]*', lambda g: ('LABEL', sys.intern(g[0]))),
+        ]
+
+        array_rule = self.array_rule()
+        if array_rule is not None:
+            # Before the parentheses, which would otherwise match first
+            self.solids.insert(0, array_rule)
+
+        self.solid_scanner = Scanner(self.solids)
+        self.spacious_scanner = Scanner(self.spacious)
+
+        # The prescanner is only compiled once it is needed
+        self.__dict__.pop('prescanner', None)
+        self.__dict__.pop('array_prefix', None)
+
+    def array_rule(self):
+        """Get the rule which lexes numeric square sections into arrays,
+        or None if there is none"""
+
+        groups = self.parentheses.groups
+
+        if self.arrays is None or 'SQUARE' not in groups \
+                or 'SQUARE' in self.capsules or not self.delimiters.delimiters:
+            return None
+
+        left, right = map(re.escape, self.parentheses.pairs[groups.index('SQUARE')])
+        delimiter = re.escape(self.delimiters.delimiters[-1].value)
+
+        # Numbers between the delimiters, with spaces and line breaks
+        def numbers(number):
+            return rf'\s*{number}(?:\s*{delimiter}\s*{number})' \
+                   rf'{{{max(self.arrays - 1, 0)},}}{POSSESSIVE}\s*'
+
+        regex = f'{left}(?:({numbers(ARRAY_INTEGER)})|({numbers(ARRAY_FLOAT)})){right}'
+        separator = self.delimiters.delimiters[-1].value
+
+        def process(g):
+            if g[1] is not None:
+                return 'ARRAY', array('q', map(int, g[1].split(separator)))
+            return 'ARRAY', array('d', map(float, g[2].split(separator)))
+
+        return regex, process
+
+    @cached_property
+    def array_prefix(self):
+        """Pattern which matches the start of a square section of numbers
+        up to where scanning ends, or None if there are no arrays
+
+        Strings given in chunks are only scanned up to a line break
+        or a delimiter, so an array which goes on past it is left until
+        more has been read. Scanning may end in the middle of a number,
+        so the last one may be any part of one.
+        """
+
+        if self.array_rule() is None:
+            return None
+
+        groups = self.parentheses.groups
+        left = re.escape(self.parentheses.pairs[groups.index('SQUARE')][0])
+        delimiter = re.escape(self.delimiters.delimiters[-1].value)
+
+        # The start of an integer or a float, or nothing
+        part = r'-?(?:\d+(?:\.\d*)?|\.\d*)?'
+
+        return re.compile(
+            rf'{left}\s*(?:{part}\s*{delimiter}\s*)*{POSSESSIVE}{part}\s*\Z'
+        )
+
+    @cached_property
+    def prescanner(self):
+        """Pattern which splits strings into chunks"""
+
+        # Finds parentheses and line breaks, skipping strings and comments
+        # the same way as the rules above, to split a string into chunks.
+        # A quote or the start of a block comment is only found
+        # on its own if the string or comment is never closed
+        return re.compile('|'.join([
+            f'(?P<string>{STRING})',
+            r'(?P<quote>\")',
+            LINE_COMMENT,
+            BLOCK_COMMENT,
+            r'(?P<comment>\/\*)',
+
+            f'(?P<left>[{re.escape(self.parentheses.left)}])',
+            f'(?P<right>[{re.escape(self.parentheses.right)}])',
+            r'(?P<newline>\n)',
+        ]))
+
+    def fingerprint(self):
+        """Get a digest of everything in the configuration
+        which affects how a string is lexed and parsed"""
+
+        parentheses = self.parentheses
+        delimiters = self.delimiters
+        infixes = self.infixes
+
+        configuration = (
+            parentheses.groups,
+            parentheses.pairs,
+            [delimiter.value for delimiter in delimiters.delimiters],
+            delimiters.flatten_mode,
+            delimiters.allow_empty_sections,
+            sorted(infixes.infixes.items()),
+            sorted(infixes.types.items()),
+            sorted(self.capsules.items()),
+            self.arrays,
+        )
+
+        import hashlib
+
+        return hashlib.blake2b(repr(configuration).encode(), digest_size=16).hexdigest()
+
+    def __getstate__(self):
+        # The rules hold lambdas, so only the configuration is pickled
+        return {
+            'parentheses': self.parentheses,
+            'delimiters': self.delimiters,
+            'infixes': self.infixes,
+            'capsules': self.capsules,
+            'arrays': self.arrays,
+        }
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compile()
+
+
+_default = None
+_default_lock = allocate_lock()
+
+def default_grammar():
+    """Get the grammar with the default configuration,
+    which is only built the first time it is needed"""
+
+    global _default
+
+    if _default is None:
+        from .parentheses import Parentheses
+        from .delimiters import Delimiters
+        from .infixes import Infixes
+
+        # Threads asking for it at once all get the same one
+        with _default_lock:
+            if _default is None:
+                _default = Grammar(
+                    Parentheses(),
+                    Delimiters(),
+                    Infixes(),
+                    {'ROUND': 'CALL'}
+                )
+
+    return _default
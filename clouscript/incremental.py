@@ -0,0 +1,1213 @@
+from bisect import bisect_right
+from functools import partial
+from itertools import chain, repeat
+from operator import add, itemgetter, sub
+
+from .element import Element, Deferred
+from .exceptions import ClouScriptException, NoMatch, UnmatchedInfix
+from .reducer import Reducer
+
+
+class Document:
+    """A string which is parsed again as it is edited
+
+    The string is split into chunks at line breaks outside of any
+    parentheses, strings or comments. Every chunk keeps its own text and
+    its top-level elements, with the parenthesized sections in them
+    already parsed, along with what the infixes of the top level make of them.
+
+    Parenthesized sections which take up at least the section size are
+    split into chunks of their own in the same way, and so on for the large
+    sections in them. An edit is made in the innermost section it is in,
+    and only lexes and parses the chunks of that section it is made in,
+    and any after them which a string or a comment opened by the edit
+    reaches into. The sections around the edited one then only reduce
+    the chunk which holds it again.
+
+    A parenthesis which closes more than was opened, or is left open,
+    is kept in one chunk with the rest of the edited text, and with any
+    other such chunk of the section, since they may match each other.
+    The chunks after it are kept as they are, and it gives the error
+    Parser.nest gives for it, where loads would make something of the
+    whole string instead. Only if the parenthesis may match the one
+    closing the section is the edit made in the section around it instead.
+
+    Chunks whose top-level elements reach into each other through infixes
+    or capsules are kept together. The tree is then put together from the
+    elements of all chunks, reusing those of every chunk which was not
+    touched, and is the same as the one from loads. The values of sections
+    are only put together once the tree is read. A section with
+    delimiters keeps the segments between them the same way, and only
+    puts all of them together again if the highest level of delimiter in
+    it changes, or whether its segments are flattened does.
+
+    Lexers with rules of their own are not split into chunks,
+    so every edit parses the whole string again. Elements of a document
+    have no spans, since their offsets move with every edit before them.
+    """
+
+    def __init__(self, string='', lexer=None, parser=None, chunk_size=64, section_size=4096):
+        """Arguments:
+            chunk_size -- int: Number of characters to put in a chunk at least
+            section_size -- int: Number of characters a parenthesized section
+                                 takes up at least to be split into chunks
+                                 of its own
+
+        An error in the string is kept in error, as for any later edit,
+        so that a document can be opened with one and fixed by editing it
+        """
+
+        from . import default_lexer, default_parser
+
+        if lexer is None:
+            lexer = default_lexer()
+
+        if parser is None:
+            parser = default_parser()
+
+        self.lexer = lexer
+        self.parser = parser
+        self.chunk_size = chunk_size
+        self.section_size = section_size
+
+        self.splits = not lexer.has_own_rules()
+        self.prescanner = lexer.grammar.prescanner
+        self.parentheses = lexer.grammar.parentheses
+
+        # The group and right-hand parenthesis of every left-hand one
+        # which may open a section of its own. Square sections may be lexed
+        # whole into arrays, so they are only parsed along with what is
+        # around them if the grammar has arrays
+        grammar = lexer.grammar
+        self.pairs = {
+            pair[0]: (group, pair[1])
+            for group, pair in zip(grammar.parentheses.groups, grammar.parentheses.pairs)
+            if group != 'SQUARE' or grammar.arrays is None
+        }
+
+        # The elements of the sections edited since the tree was last read,
+        # whose values have not been put together yet
+        self.pending = {}
+
+        self.top = Section(self)
+
+        # The tree, whose value is only put together once it is read,
+        # or the error found in the string instead
+        self.root = None
+        self.error = None
+
+        try:
+            self.edit(0, 0, string)
+        except ClouScriptException:
+            pass
+
+    @property
+    def text(self):
+        return self.top.text
+
+    @property
+    def length(self):
+        return self.top.length
+
+    @property
+    def tree(self):
+        """The tree of the string, the same as from loads"""
+
+        if self.error is not None:
+            raise self.located(self.error)
+
+        # The values are put together from the elements of the sections
+        # as they are now, before any later edit changes them
+        for element in self.pending.values():
+            element.value
+
+        self.pending.clear()
+        return self.root
+
+    def edit(self, offset, removed, inserted):
+        """Replace part of the string and parse it again
+
+        Arguments:
+            offset -- int: Where the edit starts
+            removed -- int: Number of characters removed from the offset
+            inserted -- str: Text put in place of them
+
+        Raises the same error as loads would, but keeps the edit
+        either way, so that later edits can fix it. The values of the
+        edited sections are only put together once the tree is read,
+        since that takes as long as all the rest for small edits
+        of large strings
+        """
+
+        if not 0 <= offset <= offset + removed <= self.top.length:
+            raise ValueError(f'Edit of {removed} at {offset} is outside of the string')
+
+        # The sections the edit is in, from the top level inward,
+        # with where their text starts and the chunk the next one is in
+        path = self.top.path(offset, removed)
+
+        # Make the edit in the innermost section it leaves balanced
+        depth = len(path) - 1
+        while not path[depth][0].edit(offset - path[depth][1], removed, inserted, path[depth][1]):
+            depth -= 1
+
+        # Give the sections around it the element it now gives
+        delta = len(inserted) - removed
+        for k in range(depth, 0, -1):
+            section, _, index = path[k - 1]
+            section.refresh(index, path[k][0], delta)
+
+        self.error = None
+
+        try:
+            self.root = self.assemble()
+        except ClouScriptException as exception:
+            self.error = exception
+            raise self.located(exception)
+
+    def assemble(self):
+        """Check the string for errors, and get the tree if it has none"""
+
+        top = self.top
+
+        # Lexing errors are found first by loads,
+        # and the others in the order they are raised in
+        if top.errors or top.failing or top.unbalanced:
+            error = top.first(True, 0) or top.first(False, 0)
+            if error is not None:
+                raise error
+
+        value = top.close()
+        return top.defer(top.structured if value is None else value)
+
+    def located(self, exception):
+        """Give an error the string, so that it can tell its line and column
+
+        Only errors with a span need it, and putting the string together
+        takes longer than the edit itself for large documents
+        """
+
+        if exception.source is None and exception.span is not None:
+            exception.source = self.text
+
+        return exception
+
+
+class Section:
+    """The text between a pair of parentheses, or all of a document,
+    split into chunks which are lexed and parsed on their own
+
+    The element of a section which is not the top level is put together
+    again whenever it is edited, along with the error it gives instead
+    if it can not be parsed.
+    """
+
+    def __init__(self, document, group=None, left='', right=''):
+        """Arguments:
+            group -- str: Group of the parentheses, None for the top level
+            left, right -- str: The parentheses around the text
+        """
+
+        self.document = document
+        self.group = group
+        self.left = left
+        self.right = right
+
+        # The parenthesis the text is in, which those among it
+        # closing more than was opened are matched with
+        self.opening = None if group is None else Element(group, left)
+
+        self.length = 0
+
+        # The structured top-level elements of all chunks after each other
+        self.structured = []
+
+        # Chunks, with where their text starts and where their elements
+        # start among the structured elements. For the chunks from the gap
+        # and on, both are stored without the shift of the edits before them,
+        # which is only applied once an edit is made further on
+        self.chunks = []
+        self.starts = []
+        self.offsets = []
+        self.gap = 0
+        self.shift = 0
+        self.displacement = 0
+
+        # Totals over all chunks
+        self.count = 0
+        self.broken = 0
+        self.errors = 0
+        self.unbalanced = 0
+
+        # Number of delimiters of each level in the structured elements
+        self.levels = [0] * len(document.parser.delimiters.delimiters)
+
+        # The segments of all chunks after each other, and where those
+        # of each chunk start among them, stored the same way as the offsets
+        self.segmented = []
+        self.seats = []
+        self.moved = 0
+
+        # The level and flattening the chunks were last cut into segments
+        # with, the range of chunks which have to be cut again since,
+        # and the totals of the segments they were cut into
+        self.cut = None
+        self.stale = None
+        self.long = 0
+        self.empty = 0
+        self.odd = 0
+
+        # Sections in the chunks which can not be parsed, and the chunks
+        # which can not be, or hold any of them, by where they start
+        self.failing = set()
+        self.bad = {}
+
+        # The chunk with parentheses which do not match, if there is one
+        self.region = None
+
+        # The element of the section, empty if it can not be parsed,
+        # and the error closing it gives if that is why
+        self.element = Element(group, ())
+        self.failure = None
+
+    @property
+    def text(self):
+        return self.left + ''.join(chunk.text for chunk in self.chunks) + self.right
+
+    @property
+    def size(self):
+        """Number of characters along with the parentheses"""
+        return len(self.left) + self.length + len(self.right)
+
+    def fails(self):
+        """Check whether the section can not be parsed"""
+        return bool(self.errors or self.failing or self.unbalanced) \
+            or self.failure is not None
+
+    def defer(self, elements):
+        """Get the element of the section, whose value is only
+        put together from its elements once the tree is read"""
+
+        element = Deferred(self.group or '', partial(tuple, elements))
+        self.document.pending[self] = element
+        return element
+
+    def path(self, offset, removed):
+        """Find the sections an edit is in, from this one inward,
+        along with where their text starts and the index of the chunk
+        the next one is in"""
+
+        path = []
+        section = self
+        start = 0
+
+        while True:
+            if not section.chunks:
+                path.append((section, start, None))
+                return path
+
+            index = section.find(offset - start)
+            path.append((section, start, index))
+
+            position = start + section.start(index)
+            inner = None
+
+            for part in section.chunks[index].parts:
+                if type(part) is str:
+                    position += len(part)
+                    continue
+
+                # The edit has to be in between the parentheses
+                begin = position + len(part.left)
+                if begin <= offset and offset + removed <= begin + part.length:
+                    inner = part
+                    break
+
+                position += part.size
+
+            if inner is None:
+                return path
+
+            section = inner
+            start = begin
+
+    def edit(self, offset, removed, inserted, start):
+        """Replace part of the text of the section and parse it again
+
+        Arguments:
+            start -- int: Where the text of the section starts in the document
+
+        Returns False without making the edit if it would leave
+        a parenthesis in a section other than the top level which
+        may match one around the section, or a string or comment open
+        """
+
+        chunks = self.chunks
+        delta = len(inserted) - removed
+
+        # Everything before the chunk the edit starts in is the same as before
+        first = self.find(offset)
+        last = self.find(offset + removed) + 1 if chunks else 0
+
+        while True:
+            self.move(first)
+
+            begin = self.start(first) if chunks else 0
+            local = offset - begin
+
+            # Make the edit in the text of the chunks it is in,
+            # keeping the sections in them which it does not reach into
+            window, known = self.window(chunks[first:last], 0)
+            window = window[:local] + inserted + window[local + removed:]
+
+            known = {
+                position if position < local else position + delta: section
+                for position, section in known.items()
+                if position + section.size <= local or position >= local + removed
+            }
+
+            pieces, end = self.split(window, begin, last, known)
+
+            # Parentheses which do not match are split along with those
+            # of any other chunk of the section, which they may match
+            if not pieces or pieces[-1][2] or self.region is None:
+                break
+
+            index = self.find(self.bad[self.region])
+            if first <= index < end:
+                break
+
+            first, last = min(first, index), max(end, index + 1)
+
+        last = end
+
+        if self.group is not None and pieces and not pieces[-1][2] \
+                and not self.contains(pieces[-1]):
+            return False
+
+        # Parse the new chunks, and put them together with the ones
+        # before and after them if their elements reach into them
+        touched = []
+        for piece in pieces:
+            chunk = self.nest(piece, start)
+            if touched and self.joins(touched[-1][1], chunk):
+                touched[-1][1] = self.merge(touched[-1][1], chunk)
+            else:
+                touched.append([piece[1], chunk])
+
+        # If the edit removed whole chunks, the ones on either side of it
+        # may have to be put together instead
+        if not touched and first > 0:
+            first -= 1
+            touched.append([self.start(first), chunks[first]])
+
+        while touched and first > 0 and self.joins(chunks[first - 1], touched[0][1]):
+            first -= 1
+            touched[0] = [self.start(first), self.merge(chunks[first], touched[0][1])]
+
+        while touched and last < len(chunks) and self.joins(touched[-1][1], chunks[last]):
+            touched[-1][1] = self.merge(touched[-1][1], chunks[last])
+            last += 1
+
+        for _, chunk in touched:
+            self.reduce(chunk)
+
+        self.replace(first, last, touched, delta)
+        self.length += delta
+
+        if self.group is not None:
+            self.update()
+
+        return True
+
+    def contains(self, piece):
+        """Check whether the parentheses of a piece which do not match
+        can not match the one closing the section either, so that
+        the section can be left failing on its own"""
+
+        _, _, _, _, stray, lefts = piece
+        find_group = self.document.parentheses.find_group
+
+        if stray is not None:
+            return find_group(stray) != self.group
+
+        if lefts:
+            return find_group(lefts[-1]) != self.group
+
+        # A string or comment left open may be closed after the section
+        return False
+
+    def refresh(self, index, section, delta):
+        """Reduce the chunk a section is in again, once it has been edited"""
+
+        chunk = self.chunks[index]
+        self.move(index)
+        start = self.start(index)
+
+        fresh = chunk.copy()
+        fresh.elements = list(chunk.elements)
+
+        for k, inner in chunk.sections:
+            if inner is section and k is not None:
+                fresh.elements[k] = section.element
+
+        self.reduce(fresh)
+        self.replace(index, index + 1, [[start, fresh]], delta)
+        self.length += delta
+
+        if self.group is not None:
+            self.update()
+
+    def update(self):
+        """Put the element of the section together again,
+        or keep the error closing it gives instead"""
+
+        self.document.pending.pop(self, None)
+        self.element = Element(self.group, ())
+        self.failure = None
+
+        if self.errors or self.failing or self.unbalanced:
+            return
+
+        try:
+            value = self.close()
+        except ClouScriptException as exception:
+            self.failure = exception
+            return
+
+        self.element = self.defer(self.structured if value is None else value)
+
+    def find(self, offset):
+        """Find the index of the chunk a position is in"""
+
+        starts = self.starts
+        gap = self.gap
+
+        if gap < len(starts) and offset >= starts[gap] + self.shift:
+            index = bisect_right(starts, offset - self.shift, gap) - 1
+        else:
+            index = bisect_right(starts, offset, 0, gap) - 1
+
+        return max(index, 0)
+
+    def start(self, index):
+        """Get where the text of a chunk starts"""
+        if index < self.gap:
+            return self.starts[index]
+        return self.starts[index] + self.shift
+
+    def offset(self, index):
+        """Get where the elements of a chunk start"""
+        if index == len(self.chunks):
+            return len(self.structured)
+        if index < self.gap:
+            return self.offsets[index]
+        return self.offsets[index] + self.displacement
+
+    def seat(self, index):
+        """Get where the segments of a chunk start"""
+        if index == len(self.chunks):
+            return len(self.segmented)
+        if index < self.gap:
+            return self.seats[index]
+        return self.seats[index] + self.moved
+
+    def move(self, index):
+        """Move the gap in the starts of the chunks to an index"""
+
+        gap = self.gap
+
+        for values, by in ((self.starts, self.shift),
+                           (self.offsets, self.displacement),
+                           (self.seats, self.moved)):
+            if not by:
+                continue
+
+            if gap < index:
+                values[gap:index] = map(add, values[gap:index], repeat(by))
+            else:
+                values[index:gap] = map(sub, values[index:gap], repeat(by))
+
+        self.gap = index
+        self.settle()
+
+    def settle(self):
+        """Drop the shifts once no chunk is after the gap, so that
+        they are not added to the chunks the gap is later moved past"""
+
+        if self.gap == len(self.chunks):
+            self.shift = self.displacement = self.moved = 0
+
+    def window(self, chunks, position):
+        """Get the text of some chunks, along with the sections
+        in them by where they start in it, from a position on"""
+
+        texts = []
+        known = {}
+
+        for chunk in chunks:
+            for part in chunk.parts:
+                if type(part) is str:
+                    texts.append(part)
+                    position += len(part)
+                else:
+                    texts.append(part.text)
+                    known[position] = part
+                    position += part.size
+
+        return ''.join(texts), known
+
+    def split(self, window, start, last, known):
+        """Split the edited text of some chunks into pieces
+
+        The pieces end at line breaks outside of any parentheses,
+        strings or comments. As long as a string or a parenthesis is left
+        open at the end of the text, the text of the next chunk is added.
+        Known sections are skipped over, and any other section which
+        takes up at least the section size is found to be parsed on its own.
+
+        A right-hand parenthesis closing more than was opened, or
+        a left-hand one which is not closed in the text, is left in the
+        last piece along with all of the text after it, since no text
+        after it which was balanced before can make it match.
+
+        Returns the pieces, with where they start, whether they are
+        balanced, the sections in them, the first right-hand parenthesis
+        closing more than was opened and the left-hand ones left open,
+        along with the index of the first chunk after them
+        """
+
+        document = self.document
+        chunks = self.chunks
+
+        if not document.splits:
+            return [(window, start, True, [], None, '')] if window else [], last
+
+        search = document.prescanner.search
+        pairs = document.pairs
+        chunk_size = document.chunk_size
+        section_size = document.section_size
+
+        pieces = []
+        position = 0
+
+        # Number of chunks to add next, which doubles every time
+        # so that the text is not scanned over and over
+        adding = 1
+
+        while True:
+            closed = True
+
+            # Parentheses left open, the first one closing more
+            # than was opened, the sections in the piece,
+            # and where the last one was opened
+            lefts = []
+            stray = None
+            sections = []
+            opened = None
+
+            match = search(window, position)
+            while match is not None:
+                kind = match.lastgroup
+                end = match.end()
+
+                if kind == 'left':
+                    if not lefts:
+                        opened = match.start()
+
+                        # A known section is skipped over
+                        section = known.get(opened)
+                        if section is not None:
+                            end = opened + section.size
+                            sections.append((opened - position, end - position, section))
+                            match = search(window, end)
+                            continue
+
+                    lefts.append(match[0])
+
+                elif kind == 'right':
+                    if not lefts:
+                        if stray is None:
+                            stray = match[0]
+
+                    else:
+                        lefts.pop()
+
+                        # A large enough section is parsed on its own,
+                        # if its parentheses match
+                        if not lefts and end - opened >= section_size \
+                                and pairs.get(window[opened], (None, None))[1] == match[0]:
+                            sections.append((opened - position, end - position, None))
+
+                # A string or comment which is never closed might be closed
+                # later on. Neither might a string ending in an escaped quote,
+                # since it only ends there if no quote is found further on
+                elif kind == 'quote' or kind == 'comment' or kind == 'string' \
+                        and window[end - 2] == '\\':
+                    closed = False
+                    break
+
+                elif kind == 'newline' and not lefts and stray is None:
+                    if end - position >= chunk_size:
+                        pieces.append((window[position:end], start + position,
+                                       True, sections, None, ''))
+                        position = end
+                        sections = []
+
+                # A line comment at the very end would take in
+                # the parenthesis closing the section
+                elif kind is None and end == len(window) and self.group is not None \
+                        and match[0].startswith('//') and '\n' not in match[0]:
+                    closed = False
+                    break
+
+                match = search(window, end)
+
+            if closed or last == len(chunks):
+                break
+
+            text, more = self.window(chunks[last:last + adding], len(window))
+            window += text
+            known.update(more)
+
+            last = min(last + adding, len(chunks))
+            adding *= 2
+
+        if position < len(window):
+            if not closed:
+                # Its parentheses are of no use once a string is left open
+                pieces.append((window[position:], start + position, False, sections, None, ''))
+            elif lefts or stray is not None:
+                pieces.append((window[position:], start + position, False, sections,
+                               stray, ''.join(lefts)))
+            else:
+                pieces.append((window[position:], start + position, True, sections, None, ''))
+
+        return pieces, last
+
+    def nest(self, piece, start):
+        """Lex and parse the sections of a piece of the text
+
+        Arguments:
+            piece -- tuple: The piece, as split gives it, with where
+                            the sections to parse on their own start
+                            and end in it, and the sections if they are known
+            start -- int: Where the text of the section starts in the document
+        """
+
+        document = self.document
+        text, position, balanced, sections, stray, lefts = piece
+        start += position
+
+        chunk = Chunk()
+        chunk.balanced = balanced
+        chunk.stray = stray
+        chunk.lefts = lefts
+
+        # The text around the sections, with where each starts
+        gaps = []
+        parts = chunk.parts
+        begin = 0
+
+        for opened, end, section in sections:
+            gaps.append((text[begin:opened], start + begin))
+            parts.append(text[begin:opened])
+
+            if section is None:
+                group, right = document.pairs[text[opened]]
+                section = Section(document, group, text[opened], right)
+                section.edit(0, 0, text[opened + 1:end - 1], start + opened + 1)
+
+            parts.append(section)
+            begin = end
+
+        gaps.append((text[begin:], start + begin))
+        parts.append(text[begin:])
+
+        # The sections are kept even if the chunk can not be parsed,
+        # without the index of their elements, since their errors
+        # may come before that of the chunk
+        chunk.sections = [(None, section) for section in parts[1::2]]
+
+        # Lex the whole piece before parsing any of it,
+        # since loads finds lexing errors before any others
+        lexed = []
+
+        for k, (gap, at) in enumerate(gaps):
+            try:
+                lexed.append(self.lex(gap, at))
+            except NoMatch as exception:
+                chunk.error = exception
+                chunk.at = 2 * k
+                return chunk
+
+        elements = chunk.elements
+        indexed = []
+
+        # A parenthesis left open is only an error once the rest
+        # of the section is known not to have any other before it
+        for k, gap in enumerate(lexed):
+            try:
+                elements.extend(document.parser.nest(gap, self.opening, balanced))
+            except ClouScriptException as exception:
+                chunk.error = exception
+                chunk.at = 2 * k
+                return chunk
+
+            if k < len(sections):
+                section = parts[2 * k + 1]
+                indexed.append((len(elements), section))
+                elements.append(section.element)
+
+        chunk.sections = indexed
+        return chunk
+
+    def lex(self, text, start):
+        """Lex the text of a piece around its sections"""
+        lexer = self.document.lexer
+        return list(lexer.elements(lexer.scan(text, offset=start)))
+
+    def joins(self, left, right):
+        """Check whether the top-level elements of two chunks
+        have to be reduced together"""
+
+        if left.error is not None or right.error is not None \
+                or not left.balanced or not right.balanced:
+            return False
+
+        # Nothing is lost by keeping chunks without elements with another
+        if not left.elements or not right.elements:
+            return True
+
+        return left.elements[-1].type == 'INFIX' \
+            or right.elements[0].type == 'INFIX' \
+            or right.elements[0].type in self.document.parser.capsules
+
+    def merge(self, left, right):
+        chunk = Chunk()
+
+        # The text at the end of one and the start of the other are one
+        chunk.parts = left.parts[:-1] + [left.parts[-1] + right.parts[0]] + right.parts[1:]
+        chunk.elements = left.elements + right.elements
+        chunk.sections = left.sections + [
+            (k + len(left.elements), section) for k, section in right.sections
+        ]
+
+        return chunk
+
+    def reduce(self, chunk):
+        """Form the capsules and infixes of the top-level elements of a chunk"""
+
+        if chunk.error is not None or not chunk.balanced \
+                or any(section.fails() for _, section in chunk.sections):
+            chunk.structured = []
+            chunk.head = []
+            chunk.last = None
+            chunk.count = 0
+            chunk.broken = None
+            chunk.marks = []
+            return
+
+        structured = []
+
+        reducer = Reducer(self.document.parser, emit=structured.append)
+        for element in chunk.elements:
+            reducer.append(element)
+        reducer.flush()
+
+        levels = self.document.parser.delimiters.levels
+
+        chunk.structured = structured
+        chunk.head = reducer.head
+        chunk.last = reducer.last
+        chunk.count = reducer.count
+        chunk.broken = reducer.structurer.broken
+        chunk.marks = [
+            (k, levels[element.value])
+            for k, element in enumerate(structured)
+            if element.type == 'DELIMITER' and element.value in levels
+        ]
+
+    def replace(self, first, last, touched, delta):
+        """Put new chunks in place of the ones from an index to another"""
+
+        chunks = self.chunks
+        failing = self.failing
+        bad = self.bad
+
+        # The chunks which can not be parsed after the new ones move along
+        boundary = self.start(last) if last < len(chunks) else self.length
+
+        for chunk in chunks[first:last]:
+            self.total(chunk, -1)
+            for _, section in chunk.sections:
+                failing.discard(section)
+
+            bad.pop(chunk, None)
+            if chunk is self.region:
+                self.region = None
+
+        if delta:
+            for chunk, start in bad.items():
+                if start >= boundary:
+                    bad[chunk] = start + delta
+
+        for start, chunk in touched:
+            self.total(chunk, 1)
+            for _, section in chunk.sections:
+                if section.fails():
+                    failing.add(section)
+
+            if chunk.error is not None or not chunk.balanced \
+                    or any(section.fails() for _, section in chunk.sections):
+                bad[chunk] = start
+            if not chunk.balanced:
+                self.region = chunk
+
+        # Put the elements of the new chunks in place of the old ones
+        offset = self.offset(first)
+        end = self.offset(last)
+
+        structured = []
+        offsets = []
+        for _, chunk in touched:
+            offsets.append(offset + len(structured))
+            structured.extend(chunk.structured)
+
+        self.structured[offset:end] = structured
+
+        # Along with their segments, if they have been cut into any
+        seat = self.seat(first)
+        until = self.seat(last)
+
+        segmented = []
+        seats = []
+        for _, chunk in touched:
+            seats.append(seat + len(segmented))
+            segmented.extend(chunk.segments)
+
+        self.segmented[seat:until] = segmented
+
+        chunks[first:last] = [chunk for _, chunk in touched]
+        self.starts[first:last] = [start for start, _ in touched]
+        self.offsets[first:last] = offsets
+        self.seats[first:last] = seats
+
+        # The chunks after the new ones are shifted by the edit
+        self.gap = first + len(touched)
+        self.shift += delta
+        self.displacement += len(structured) - (end - offset)
+        self.moved += len(segmented) - (until - seat)
+        self.settle()
+
+        # The new chunks have to be cut into segments, along with
+        # any which had to be before, wherever they are now
+        lo, hi = first, self.gap
+        if self.stale is not None:
+            if self.stale[1] > last:
+                hi = max(hi, self.stale[1] + self.gap - last)
+            lo = min(lo, self.stale[0])
+        self.stale = lo, hi
+
+    def total(self, chunk, sign):
+        """Add a chunk to the totals, or take it away from them"""
+
+        self.count += sign * chunk.count
+        self.broken += sign * (chunk.broken is not None)
+        self.errors += sign * (chunk.error is not None)
+        self.unbalanced += sign * (not chunk.balanced)
+
+        levels = self.levels
+        for _, level in chunk.marks:
+            levels[level] += sign
+
+        self.tally(chunk, sign)
+
+    def tally(self, chunk, sign):
+        """Add the segments a chunk was cut into to the totals,
+        or take them away from them"""
+
+        self.long += sign * chunk.long
+        self.empty += sign * chunk.empty
+        self.odd += sign * chunk.odd
+
+    def first(self, lexing, start):
+        """Find the first error of the section in the order loads raises them,
+        or None if there is none
+
+        Arguments:
+            lexing -- bool: Whether to find the first lexing error,
+                            which loads raises before any others
+            start -- int: Where the text of the section starts in the document
+        """
+
+        parser = self.document.parser
+        find_group = self.document.parentheses.find_group
+
+        # The error of a parenthesis left open, which only comes
+        # at the end of the section, after any other in it
+        deferred = None
+
+        for chunk, begin in sorted(self.bad.items(), key=itemgetter(1)):
+            position = start + begin
+
+            for k, part in enumerate(chunk.parts):
+                if type(part) is not str:
+                    if part in self.failing:
+                        error = part.first(lexing, position + len(part.left))
+                        if error is not None:
+                            return error
+
+                    position += part.size
+                    continue
+
+                # The chunk may have moved since the error was found,
+                # so find it again for its position in the document
+                if k == chunk.at and isinstance(chunk.error, NoMatch) == lexing:
+                    try:
+                        parser.nest(self.lex(part, position), self.opening, chunk.balanced)
+                    except ClouScriptException as exception:
+                        return exception
+
+                position += len(part)
+
+            if chunk.error is None and chunk.lefts:
+                # The section is closed by a parenthesis of another group,
+                # or the top level by none at all
+                closed = None if self.group is None else Element(self.group, self.right)
+                deferred = parser.mismatch(Element(find_group(chunk.lefts[-1]), chunk.lefts[-1]),
+                                           closed)
+
+        if not lexing:
+            return deferred or self.failure
+
+        return None
+
+    def close(self):
+        """The same as Reducer.close, with the chunks in place of the elements
+
+        Returns the value of the section, or None if it is
+        simply made of the structured elements of the chunks
+        """
+
+        chunks = self.chunks
+        parser = self.document.parser
+
+        if self.count < 3:
+            elements = [element for chunk in chunks for element in chunk.head]
+            return parser.delimiters.segment(elements)
+
+        head = next(chunk for chunk in chunks if chunk.count).head[0]
+        last = next(chunk for chunk in reversed(chunks) if chunk.count).last
+
+        if head.type == 'INFIX':
+            raise UnmatchedInfix(f'{head} is missing a left-hand element', head.span)
+        if last.type == 'INFIX':
+            raise UnmatchedInfix(f'{last} is missing a right-hand element', last.span)
+
+        if self.broken:
+            broken = next(chunk.broken for chunk in chunks if chunk.broken is not None)
+            raise UnmatchedInfix(f'Infixes found beside each other', broken.span)
+
+        if any(self.levels):
+            return self.segment()
+
+        return None
+
+    def segment(self):
+        """The same as segmenting the structured elements by delimiters,
+        with the segments of the chunks which were not touched kept
+
+        The elements between two delimiters of the highest level found
+        are put together in the chunk the second one is in. Only if
+        that level or whether they are flattened changes, or something
+        is left to segment_many, are all of them put together again.
+        """
+
+        delimiters = self.document.parser.delimiters
+        chunks = self.chunks
+        structured = self.structured
+
+        level = next(level for level, count in enumerate(self.levels) if count)
+
+        # The last section, after the last delimiter of the level
+        tail = structured[self.after(len(chunks), level):]
+
+        if self.cut is None or self.cut[0] != level:
+            # Find whether to flatten from where the delimiters are
+            # before cutting every chunk into segments
+            lengths = [len(tail)]
+            previous = -1
+
+            for index, chunk in enumerate(chunks):
+                offset = self.offset(index)
+                for k, level_ in chunk.marks:
+                    if level_ == level:
+                        lengths.append(offset + k - previous - 1)
+                        previous = offset + k
+
+            self.cut = level, self.flattens(max(lengths))
+            self.stale = 0, len(chunks)
+
+        if self.stale is not None:
+            self.recut(*self.stale)
+            self.stale = None
+
+        flatten = self.flattens(len(tail) if self.long == 0 else 2)
+
+        if flatten != self.cut[1]:
+            self.cut = level, flatten
+            self.recut(0, len(chunks))
+
+        if self.odd or self.empty or not tail:
+            return delimiters.segment(structured)
+
+        try:
+            last = delimiters.part(tail, flatten)
+        except ClouScriptException:
+            last = None
+
+        if last is None:
+            return delimiters.segment(structured)
+
+        return chain(self.segmented, [last])
+
+    def flattens(self, longest):
+        """Check whether sections are flattened, given the longest one"""
+        mode = self.document.parser.delimiters.flatten_mode
+        return mode == 'local' or mode == 'global' and longest <= 1
+
+    def after(self, index, level):
+        """Find where the elements after the last delimiter
+        of a level before a chunk start"""
+
+        chunks = self.chunks
+
+        for index in range(index - 1, -1, -1):
+            for k, level_ in reversed(chunks[index].marks):
+                if level_ == level:
+                    return self.offset(index) + k + 1
+
+        return 0
+
+    def recut(self, first, last):
+        """Cut the chunks from an index to another into segments again,
+        along with the next one with a delimiter of the level,
+        whose first segment starts in them"""
+
+        chunks = self.chunks
+
+        for index in range(first, last):
+            self.segments(index)
+
+        for index in range(last, len(chunks)):
+            if self.segments(index):
+                break
+
+    def segments(self, index):
+        """Cut a chunk into the segments which end in it
+
+        Returns whether there are any
+        """
+
+        delimiters = self.document.parser.delimiters
+        level, flatten = self.cut
+
+        chunk = self.chunks[index]
+        self.tally(chunk, -1)
+
+        # The segments of the chunks after it move along with its own
+        self.move(index + 1)
+        seat = self.seat(index)
+        before = len(chunk.segments)
+
+        chunk.segments = []
+        chunk.long = chunk.empty = chunk.odd = 0
+
+        marks = [k for k, level_ in chunk.marks if level_ == level]
+
+        if marks:
+            structured = self.structured
+            start = self.after(index, level)
+            offset = self.offset(index)
+
+            for k in marks:
+                elements = structured[start:offset + k]
+                start = offset + k + 1
+
+                chunk.long += len(elements) > 1
+                chunk.empty += not elements
+
+                # Errors and sections left to segment_many
+                # are found by segmenting all of it instead
+                try:
+                    segment = delimiters.part(elements, flatten)
+                except ClouScriptException:
+                    segment = None
+
+                chunk.odd += segment is None
+                chunk.segments.append(segment)
+
+        self.segmented[seat:seat + before] = chunk.segments
+        self.moved += len(chunk.segments) - before
+        self.settle()
+
+        self.tally(chunk, 1)
+        return bool(marks)
+
+
+class Chunk:
+    """The text and top-level elements of a piece of a section
+
+    The text is kept in parts, between which are the sections
+    in the piece which are parsed on their own.
+    """
+
+    __slots__ = ('parts', 'elements', 'sections', 'error', 'at', 'balanced',
+                 'stray', 'lefts', 'structured', 'head', 'last', 'count',
+                 'broken', 'marks', 'segments', 'long', 'empty', 'odd')
+
+    def __init__(self):
+        self.parts = []
+        self.elements = []
+
+        # The sections in the chunk, by the index of their elements
+        self.sections = []
+
+        # The error found in the text, and in which part
+        self.error = None
+        self.at = None
+        self.balanced = True
+
+        # The parentheses which do not match, if it is not balanced:
+        # the first one closing more than was opened, and those left open
+        self.stray = None
+        self.lefts = ''
+
+        self.structured = []
+        self.head = []
+        self.last = None
+        self.count = 0
+        self.broken = None
+
+        # Where the delimiters are among the structured elements,
+        # with their levels
+        self.marks = []
+
+        # The segments which end in the chunk, once it is cut into them,
+        # and how many of them are longer than one element, empty,
+        # or left to segmenting the whole section
+        self.segments = []
+        self.long = 0
+        self.empty = 0
+        self.odd = 0
+
+    @property
+    def text(self):
+        return ''.join(part if type(part) is str else part.text for part in self.parts)
+
+    def copy(self):
+        chunk = Chunk()
+        for name in Chunk.__slots__:
+            setattr(chunk, name, getattr(self, name))
+        return chunk
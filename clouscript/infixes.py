@@ -1,6 +1,7 @@
 import re
+import sys
 
-from .element import Element
+from .element import Element, Spanned
 from .exceptions import UnmatchedInfix
 
 
@@ -81,72 +82,137 @@ class Infixes:
 
     def structure(self, array):
         """Fit arguments of infix functions into new elements"""
-        
+
         # An infix function requires both
         # a right-hand and a left-hand side
         if len(array) < 3:
             return array
 
-        # Generate priority map
-        # This is a 1D array of integers
-        # representing the infix priority of each element 
-        priorities = [
-            self.infixes[element.value]
-            if element == 'INFIX' else 0
-            for element in array
-        ]
-        
         # If an infix is found at any edge of the array,
         # it can obviously not have non-infix elements on both sides
-        if priorities[0]:
-            raise UnmatchedInfix(f'{array[0]} is missing a left-hand element')
-        if priorities[-1]:
-            raise UnmatchedInfix(f'{array[-1]} is missing a right-hand element')
+        if array[0].type == 'INFIX':
+            raise UnmatchedInfix(f'{array[0]} is missing a left-hand element', array[0].span)
+        if array[-1].type == 'INFIX':
+            raise UnmatchedInfix(f'{array[-1]} is missing a right-hand element', array[-1].span)
+
+        structured = []
+        structurer = Structurer(self, structured.append)
+
+        for element in array:
+            structurer.add(element)
 
         # If any infixes are found beside each other,
         # they can obviously not have non-infix elements on both sides
-        if any(a and b for a, b in zip(priorities[:-1], priorities[1:])):
-            raise UnmatchedInfix(f'Infixes found beside each other')
-
-        # Start with the highest priority in the list and work your way down
-        # Get the upper limit of all the priorities in the list for every iteration
-        while highest_priority := max(priorities):
-            # Locate at which indices the top priority infixes are
-            priority_indices = [i for i, p in enumerate(priorities)
-                                    if p == highest_priority]
-
-            # Swap order depending on handedness
-            if highest_priority % 2 == 0:
-                priority_indices = priority_indices[::-1]
-
-            while priority_indices:
-                # left-hand (i), infix (j), and right-hand (k) indices
-                j = priority_indices[0]
-                i, k = j-1, j+1
-
-                # left-hand, infix, and right-hand elements
-                left, infix, right = array[i:k+1]
-
-                # Find type name for infix if provided
-                type_ = self.types.get(infix.value, infix.value)
-                function = Element(type_, (left, right))
-
-                # Remove the original elements
-                # and insert the new function element
-                del array[i:k]
-                array[i] = function
-
-                # Clear their entries in the priority list
-                # and nullify the priority of the new element
-                del priorities[i:k]
-                priorities[i] = 0
-                
-                # Move on to the next priority index
-                priority_indices.pop(0)
+        if structurer.broken is not None:
+            raise UnmatchedInfix(f'Infixes found beside each other', structurer.broken.span)
+
+        structurer.close()
+        return structured
+
+
+class Structurer:
+    """Structure infixes of elements as they are added
+
+    The elements are structured in a single pass with a stack of operands
+    and a stack of pending infixes. An infix is only applied once
+    an infix of lower priority follows it, or one of equal priority
+    if it is left-handed, which gives the same result as applying
+    all infixes from the highest priority and down.
+    """
+
+    def __init__(self, infixes, emit):
+        """Arguments:
+            infixes -- Infixes: Priorities and type names of the infixes
+            emit -- callable: Called with every finished element in order
+        """
+
+        self.priorities = infixes.infixes
+        self.types = infixes.types
+        self.emit = emit
+
+        # Operands and pending infixes of the expression being structured,
+        # along with the priorities of the infixes
+        self.operands = []
+        self.infixes = []
+        self.pending = []
+
+        self.after_infix = False
+
+        # Number of finished elements emitted so far
+        self.finished = 0
+
+        # The first infix found without a left-hand element, if any.
+        # Nothing more is structured after that
+        self.broken = None
+
+    def add(self, element):
+        """Add the next element"""
+
+        if self.broken is not None:
+            return
+
+        if element.type == 'INFIX':
+            if self.after_infix or not self.operands:
+                self.broken = element
+                return
+
+            priority = self.priorities[element.value]
+            pending = self.pending
+
+            # Apply the pending infixes which bind tighter than this one.
+            # Left-handed infixes of the same priority are applied
+            # from left to right, and right-handed ones from right to left
+            while pending and (pending[-1] > priority
+                    or pending[-1] == priority and priority % 2 == 1):
+                self.apply()
+
+            self.infixes.append(element)
+            pending.append(priority)
+            self.after_infix = True
+
+        else:
+            # Two elements beside each other can not be joined
+            # by any infix, so the expression before is finished
+            if self.operands and not self.after_infix:
+                self.finish()
+
+            self.operands.append(element)
+            self.after_infix = False
+
+    def apply(self):
+        """Apply the last pending infix to the last two operands"""
+
+        operands = self.operands
+
+        right = operands.pop()
+        left = operands.pop()
+        infix = self.infixes.pop()
+        self.pending.pop()
+
+        # Find type name for infix if provided
+        type_ = sys.intern(self.types.get(infix.value, infix.value))
+
+        # The element spans from its left-hand element to its right-hand one
+        if type(infix) is Element:
+            operands.append(Element(type_, (left, right)))
+        else:
+            operands.append(Spanned.between(type_, (left, right), left, right))
+
+    def finish(self):
+        """Apply all pending infixes and emit the finished element"""
+
+        while self.pending:
+            self.apply()
+
+        self.finished += 1
+        self.emit(self.operands.pop())
+
+    def close(self):
+        """Finish the last element"""
 
-                # If the current highest priority is left-handed,
-                # after an element has been removed, move the rest 2 steps to the left
-                if highest_priority % 2 == 1:
-                    priority_indices = [i - 2 for i in priority_indices]
+        # An infix at the end is missing its right-hand element
+        if self.after_infix and self.broken is None:
+            self.broken = self.infixes[-1]
 
-        return array
\ No newline at end of file
+        if self.operands and self.broken is None:
+            self.finish()
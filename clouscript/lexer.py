@@ -1,193 +1,720 @@
+import functools
 import re
+import sys
+import types
 
-from .element import Element
-from .exceptions import NoMatch
+from .element import Element, Located
+from .exceptions import NoMatch, InvalidRule
+from .tokens import Offsets
 
 
-class REMatcher:
-    """Test multiple regular expressions on a string
-    and store the match in object for easy access"""
-    
-    def __init__(self, string):
-        self.string = string
+# Separation required between two spacious elements
+SPACES = re.compile(r'[\s\n]+')
 
-    def match(self, regex):
-        self.result = re.match(f"^{regex}", self.string)
-        return bool(self.result)
-    
-    def group(self, *i):
-        return self.result.group(*i)
+# Escapes in string literals, and what they stand for
+ESCAPE = re.compile(r'\\(.)', re.DOTALL)
+ESCAPES = {'"': '"', '\\': '\\', 'n': '\n', 't': '\t', 'r': '\r', '0': '\0'}
 
-    def groups(self):
-        return (self.result.group(0), *self.result.groups())
+# Parts of a regex which keep it from being joined with other rules,
+# since they depend on the numbers and names of its groups, or on being
+# at the start of the whole pattern: backreferences, named groups,
+# conditional groups and global flags. Other escapes are only matched
+# so that an escaped backslash is not mistaken for a backreference
+APART = re.compile(r'\\[1-9]|(\\.)|\(\?P[<=]|\(\?\(|\(\?[aiLmsux]+\)', re.DOTALL)
+
+
+def unescape(literal):
+    """Get the text of a string literal, as in the value
+    of a STRING element, without its quotes and with its escapes decoded
+
+    Backslashes before any other character are kept as they are
+    """
+    return ESCAPE.sub(lambda m: ESCAPES.get(m[1], m[0]), literal[1:-1])
+
+
+def describe(value, seen):
+    """Describe a value which the process of a rule depends on, so that
+    the descriptions of two values are only equal if they are the same
+
+    Functions are described by their code, and by the values of their
+    closures, defaults, and the globals their code refers to.
+    Raises TypeError for values which can not be described
+
+    seen -- set: Functions being described, to stop at recursion
+    """
+
+    from .grammar import Grammar
+
+    if value is None or type(value) in (bool, int, float, complex, str, bytes):
+        return type(value).__name__, repr(value)
+
+    if type(value) in (tuple, list):
+        return type(value).__name__, tuple(describe(v, seen) for v in value)
+
+    if type(value) in (set, frozenset):
+        return type(value).__name__, tuple(sorted(repr(describe(v, seen)) for v in value))
+
+    if type(value) is dict:
+        return 'dict', tuple((describe(k, seen), describe(v, seen)) for k, v in value.items())
+
+    if isinstance(value, Grammar):
+        return 'grammar', value.fingerprint()
+
+    if isinstance(value, re.Pattern):
+        return 'pattern', value.pattern, value.flags
+
+    if isinstance(value, types.ModuleType):
+        return 'module', value.__name__
+
+    if isinstance(value, (type, types.BuiltinFunctionType)):
+        return 'named', value.__module__, value.__qualname__
+
+    if isinstance(value, functools.partial):
+        return 'partial', describe(value.func, seen), \
+            describe(value.args, seen), describe(value.keywords, seen)
+
+    if isinstance(value, types.FunctionType):
+        if id(value) in seen:
+            return 'recursion', value.__qualname__
+
+        seen.add(id(value))
+
+        cells = []
+        for cell in value.__closure__ or ():
+            try:
+                cells.append(describe(cell.cell_contents, seen))
+            except ValueError:
+                # The variable of the cell is not set yet
+                cells.append(None)
+
+        return ('function', value.__module__, value.__qualname__,
+                describe_code(value.__code__, value.__globals__, seen),
+                describe(value.__defaults__, seen),
+                describe(value.__kwdefaults__, seen),
+                tuple(cells))
+
+    raise TypeError(f'{type(value).__name__} can not be described')
+
+
+def describe_code(code, globals_, seen):
+    """Describe compiled code, with the globals it refers to"""
+
+    constants = tuple(
+        describe_code(c, globals_, seen) if isinstance(c, types.CodeType) else describe(c, seen)
+        for c in code.co_consts
+    )
+
+    # Names of attributes are among them too, and are left out
+    # if there is no global of the same name
+    referenced = tuple(
+        (name, describe(globals_[name], seen))
+        for name in code.co_names if name in globals_
+    )
+
+    return code.co_code, constants, code.co_names, referenced
+
+
+class Scanner:
+    """Match a list of (regex, process) rules with one combined regular expression
+
+    Every rule is wrapped in a named group and joined into a single alternation,
+    so the first rule that matches at a position wins, just as if the rules
+    were tried one at a time in order.
+
+    Rules with backreferences, named groups or global flags are compiled
+    on their own instead, since joining them would renumber or clash with
+    their groups. They are tried before the combined expression wherever
+    they come before the rule it matched with.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+
+        # Rules which are matched on their own, by their index
+        self.apart = {
+            k: self.compile_rule(k, regex) for k, (regex, _) in enumerate(rules)
+            if any(m[1] is None for m in APART.finditer(regex))
+        }
+
+        joined = [k for k in range(len(rules)) if k not in self.apart]
+
+        try:
+            self.pattern = re.compile('|'.join(
+                f'(?P<rule{k}>{rules[k][0]})' for k in joined
+            ))
+        except re.error as error:
+            # Find the rule which can not be compiled, to tell which it is
+            for k in joined:
+                self.compile_rule(k, rules[k][0])
+            raise InvalidRule(f'Lexing rules can not be combined: {error}') from error
+
+        # Map the index of each wrapping group to the process of its rule
+        # and the indices of the groups to hand over to it. The groups
+        # of a rule are those between its wrapping group and the next one,
+        # so they are counted without compiling every rule on its own
+        self.lookup = {}
+
+        starts = [self.pattern.groupindex[f'rule{k}'] for k in joined]
+        starts.append(self.pattern.groups + 1)
+
+        for n, k in enumerate(joined):
+            index = starts[n]
+            self.lookup[index] = (k, rules[k][1], tuple(range(index, starts[n + 1])))
+
+        # Matches of rules on their own are told apart by indices
+        # after those of all groups of the combined expression
+        self.indices = {}
+
+        for n, (k, pattern) in enumerate(self.apart.items()):
+            index = self.pattern.groups + 1 + n
+            self.lookup[index] = (k, rules[k][1], tuple(range(pattern.groups + 1)))
+            self.indices[k] = index
+
+        # The rule of each group of the combined expression
+        self.kinds = {index: k for index, (k, _, _) in self.lookup.items()}
+
+        if self.apart:
+            self.find = self.find_apart
+        else:
+            self.find = self.pattern.match
+
+    @staticmethod
+    def compile_rule(k, regex):
+        """Compile a single rule, telling which it is if it is invalid"""
+        try:
+            return re.compile(regex)
+        except re.error as error:
+            raise InvalidRule(f'Lexing rule {k} {regex!r} is invalid: {error}') from error
+
+    def find_apart(self, string, pos=0, endpos=sys.maxsize):
+        """Match the rules at a position, trying the rules which are
+        compiled on their own before the combined expression where
+        they come first
+
+        The match of a rule on its own is wrapped in a RuleMatch,
+        whose lastindex tells the rule apart as for the combined expression
+        """
+
+        match = self.pattern.match(string, pos, endpos)
+        first = len(self.rules) if match is None else self.kinds[match.lastindex]
+
+        for k, pattern in self.apart.items():
+            if k > first:
+                break
+
+            own = pattern.match(string, pos, endpos)
+            if own is not None:
+                return RuleMatch(own, self.indices[k])
+
+        return match
+
+    def match(self, string, pos=0):
+        """Match the rules at a position in a string
+
+        Returns the match object, the index of the rule that matched
+        and the groups for the rule's process, or None if no rule matched
+        """
+        match = self.find(string, pos)
+        if match is None:
+            return None
+
+        k, _, indices = self.lookup[match.lastindex]
+        return match, k, self.groups(match, indices)
+
+    @staticmethod
+    def groups(match, indices):
+        """Get the whole match and the subgroups of a single rule"""
+        if len(indices) == 1:
+            return (match.group(indices[0]),)
+        return match.group(*indices)
+
+
+class RuleMatch:
+    """The match of a rule compiled on its own,
+    with the index it has among the rules of its scanner"""
+
+    __slots__ = ('match', 'lastindex')
+
+    def __init__(self, match, lastindex):
+        self.match = match
+        self.lastindex = lastindex
+
+    def group(self, *indices):
+        return self.match.group(*indices)
+
+    def start(self):
+        return self.match.start()
+
+    def end(self):
+        return self.match.end()
+
+    def span(self):
+        return self.match.span()
 
 
 class Lexer:
     """A lexer that """
 
     def __init__(self, parentheses=None, delimiters=None, infixes=None, \
-                                        solids=None, spacious=None):
+                                        solids=None, spacious=None, grammar=None, spans=False):
         """Arguments:
             solids -- list: Elements which may be close to other elements
             spacious -- list: Elements which may only be beside
                 another spacious element if there is a space separating them
+            grammar -- Grammar: Shared configuration and default rules
+                Built from parentheses, delimiters, and infixes if not provided
+            spans -- bool: Whether to give elements which know their
+                           offsets in the string, looked up when asked for.
+                           Parsers give spans to the elements they form
+                           out of ones with spans
         """
 
-        # If default solids or spacious are to be used,
-        # parentheses, delimiters, and infixes must be defined
-        
-        if solids is None or spacious is None:
-            if parentheses is None:
-                from .parentheses import Parentheses
-                parentheses = Parentheses()
-
-            if delimiters is None:
-                from .delimiters import Delimiters
-                delimiters = Delimiters()
-
-            if infixes is None:
-                from .infixes import Infixes
-                infixes = Infixes()
-
-        self.parentheses = parentheses
-        self.delimiters = delimiters
-        self.infixes = infixes
-
-
-        if solids is None:                
-            solids = [
-                # Parentheses
-                (self.parentheses.regex, lambda g: (
-                    parentheses.find_group(g[0]),
-                    g[0]
-                )),
-                
-                # Delimiters
-                (self.delimiters.regex, lambda g: (
-                    'DELIMITER',
-                    g[0]
-                )),
-                
-                # Indexing period
-                (r'\.', lambda g: ('INFIX', '.')),
-                
-                # Comments
-                (r'(?://.*)?[\s\n]+|\/\*.*\*\/',
-                    lambda g: (None, None)),
-            ]
+        if grammar is None:
+            from .grammar import Grammar, default_grammar
 
-        if spacious is None:
-            spacious = [
-                # Hexadecimal
-                (r'0x([0-9a-fA-F]+)', lambda g: (
-                    'HEXADECIMAL',
-                    int(g[1], 16)
-                )),
-
-                # Float
-                (r'\-?\d*\.\d+', lambda g: (
-                    'FLOAT',
-                    float(g[0])
-                )),
-
-                # Integer
-                (r'\-?\d+', lambda g: (
-                    'INTEGER',
-                    int(g[0])
-                )),
-
-                # String
-                (r'\"((?:\\"|.|\n)*?)\"', lambda g: (
-                    'STRING',
-                    g[0]
-                )),
-
-                # Boolean
-                (r'true|false', lambda g: (
-                    'BOOLEAN',
-                    g[0] == 'true'
-                )),
-
-                # Null
-                (r'null', lambda g: ('NULL', None)),
-
-                # Infix
-                (self.infixes.regex, lambda g: (
-                    'INFIX',
-                    g[0]
-                )),
-
-                # Label
-                (r'[\w\_][\w\d\_]*', lambda g: ('LABEL', g[0])),
-            ]
+            if parentheses is None and delimiters is None and infixes is None:
+                grammar = default_grammar()
+            else:
+                grammar = Grammar(parentheses, delimiters, infixes)
+
+        self.grammar = grammar
 
+        self.parentheses = grammar.parentheses
+        self.delimiters = grammar.delimiters
+        self.infixes = grammar.infixes
+
+        if solids is None:
+            solids = grammar.solids
+
+        if spacious is None:
+            spacious = grammar.spacious
 
         self.solids = solids
         self.spacious = spacious
+        self.spans = spans
+
+        self.compile()
+
+    def compile(self):
+        """Combine the solid and spacious rules into scanners
+        This has to be called again if the rules are changed afterward"""
+
+        # Reuse the precompiled scanners of the grammar for its own rules
+        if self.solids is self.grammar.solids:
+            solid_scanner = self.grammar.solid_scanner
+        else:
+            solid_scanner = Scanner(self.solids)
+
+        if self.spacious is self.grammar.spacious:
+            spacious_scanner = self.grammar.spacious_scanner
+        else:
+            spacious_scanner = Scanner(self.spacious)
+
+        # Every kind of token is numbered, with the solid rules first,
+        # then the spacious rules, and last the spaces between two spacious
+        # elements. Keep the process and groups of each kind of token.
+        # Rules compiled on their own are numbered after the others
+        # of their group, so also keep the rule of each kind, counting
+        # the solid rules first and then the spacious rules
+        table = []
+        rule_indices = []
+        solid_kinds = {}
+        spacious_kinds = {}
+
+        for scanner, kinds, first in ((solid_scanner, solid_kinds, 0),
+                                      (spacious_scanner, spacious_kinds, len(self.solids))):
+            for index, (k, process, indices) in sorted(scanner.lookup.items()):
+                kinds[index] = len(table)
+                table.append((process, indices))
+                rule_indices.append(first + k)
+
+        spaces = len(table)
+        table.append((lambda g: (None, None), (0,)))
+        rule_indices.append(None)
+
+        # The kind of the rule for block comments which are never closed,
+        # if the solid rules have it
+        unclosed = next((
+            solid_kinds[index] for index, (k, _, _) in solid_scanner.lookup.items()
+            if self.solids[k] is self.grammar.unclosed
+        ), None)
+
+        # Kinds of delimiters, which no other token goes on past, so that
+        # scanning in chunks may stop after one, and a pattern to find them
+        delimiter_kinds = frozenset(
+            solid_kinds[index] for index, (k, _, _) in solid_scanner.lookup.items()
+            if self.solids[k][0] == self.delimiters.regex
+        )
+        delimiter_pattern = re.compile(self.delimiters.regex) if delimiter_kinds else None
+
+        # The left-hand square parenthesis and the start of an array,
+        # to find arrays which are cut off when lexing in chunks
+        grammar = self.grammar
+        cutoff = None
+
+        if grammar.array_prefix is not None:
+            square = grammar.parentheses.pairs[grammar.parentheses.groups.index('SQUARE')][0]
+            cutoff = square, grammar.array_prefix
+
+        # Everything is built before any of it is replaced, so that threads
+        # lexing in the meantime do not see tables which are half built
+        self.__dict__.update(
+            solid_scanner=solid_scanner,
+            spacious_scanner=spacious_scanner,
+            table=table,
+            rule_indices=rule_indices,
+            solid_kinds=solid_kinds,
+            spacious_kinds=spacious_kinds,
+            spaces=spaces,
+            unclosed=unclosed,
+            delimiter_kinds=delimiter_kinds,
+            delimiter_pattern=delimiter_pattern,
+            cutoff=cutoff,
+        )
+
+    def has_own_rules(self):
+        """Check whether the rules are any other than those of the grammar"""
+        return self.solids is not self.grammar.solids \
+            or self.spacious is not self.grammar.spacious
+
+    def fingerprint(self):
+        """Get a digest of the grammar, of any rules of this lexer's own,
+        and of whether it gives spans
+
+        Returns None if the processes of its own rules depend on anything
+        which can not be described, and so can not be told apart
+        """
+
+        own = self.has_own_rules()
+
+        if not own and not self.spans:
+            return self.grammar.fingerprint()
+
+        import hashlib
+
+        digest = hashlib.blake2b(self.grammar.fingerprint().encode(), digest_size=16)
+
+        # Trees with spans are told apart from those without
+        if self.spans:
+            digest.update(b'spans\0')
+
+        grammar = self.grammar
+        default = {id(rule): k for k, rule in enumerate(grammar.solids + grammar.spacious)}
+
+        # Processes are told apart by their code, and by the values
+        # of everything their code refers to, such as their closures
+        for rules in (self.solids, self.spacious) if own else ():
+            for rule in rules:
+                regex, process = rule
+
+                if id(rule) in default:
+                    # The rules of the grammar are in its fingerprint
+                    digest.update(repr(('grammar', default[id(rule)])).encode())
+                    continue
+
+                try:
+                    description = describe(process, set())
+                except TypeError:
+                    return None
+
+                digest.update(repr((regex, description)).encode())
+
+            digest.update(b'\0')
+
+        return digest.hexdigest()
 
     def lex(self, string):
         """Segment string into elements
         Spaces are required between spacious elements"""
 
-        # Track whether the latest match
-        # allows for a spacious element
-        allow_spacious = True
+        if self.spans:
+            return self.spanned(self.scan(string))
+        return self.elements(self.scan(string))
 
-        i = 0
-        while i < len(string):
-            # Set up the rest of the string for matching
-            m = REMatcher(string[i:])
-            
-            # Set up type and value, plus match status
-            matched = False
-            type_, value = None, None
+    def lex_chunks(self, chunks):
+        """Segment a string given in chunks into elements,
+        without holding more of it than needed at once"""
 
-            # 1. Match with solids
-            for regex, process in self.solids:
-                if m.match(regex):
-                    type_, value = process(m.groups())
-                    
-                    # Allow spacious after solid match
-                    allow_spacious = True
-                    # Move cursor along
-                    i += len(m.group(0))
+        if self.spans:
+            return self.spanned(self.scan_chunks(chunks))
+        return self.elements(self.scan_chunks(chunks))
+
+    def elements(self, scanned):
+        """Convert scanned tokens into elements"""
+
+        table = self.table
+        groups = Scanner.groups
 
-                    matched = True
-                    break
+        for kind, match in scanned:
+            process, indices = table[kind]
+            type_, value = process(groups(match, indices))
 
-            # If a match has been found already, yield it
+            # Tokens without a type, such as comments, are left out
             if type_ is not None:
                 yield Element(type_, value)
 
-            # Regardless of whether there is a type or not,
-            # continue to the next element if matched successfully
-            if matched:
+    def spanned(self, scanned):
+        """Convert scanned tokens of a whole string into Located elements,
+        whose offsets are kept apart in the arrays of an Offsets object"""
+
+        table = self.table
+        groups = Scanner.groups
+
+        offsets = Offsets()
+        ids = offsets.ids.append
+        starts = offsets.starts.append
+        ends = offsets.ends.append
+
+        # Every character is in a token, spaces and comments included,
+        # so each token starts where the one before it ended, even when
+        # the string is scanned in chunks
+        end = 0
+
+        for kind, match in scanned:
+            first, last = match.span()
+
+            start = end
+            end += last - first
+
+            process, indices = table[kind]
+            type_, value = process(groups(match, indices))
+
+            if type_ is not None:
+                element = Located(type_, value, offsets)
+
+                ids(id(element))
+                starts(start)
+                ends(end)
+
+                yield element
+
+    def tokens(self, string):
+        """Segment string into a stream of token kinds and offsets,
+        without converting any of them into elements"""
+
+        from .tokens import TokenStream
+
+        stream = TokenStream(self, string)
+
+        kinds = stream.kinds.append
+        starts = stream.starts.append
+        ends = stream.ends.append
+
+        for kind, match in self.scan(string):
+            kinds(kind)
+            starts(match.start())
+            ends(match.end())
+
+        return stream
+
+    def scan(self, string, start=0, end=None, offset=0, allow_spacious=True):
+        """Find the kind of every token in a string
+        and yield it together with the match of the token
+
+        Arguments:
+            start -- int: Where to start scanning
+            end -- int: Where to stop scanning, the end of the string if None
+            offset -- int: Added to the positions given in errors
+            allow_spacious -- bool: Whether the first element may be spacious
+        """
+
+        solid_match = self.solid_scanner.find
+        solid_kinds = self.solid_kinds
+
+        spacious_match = self.spacious_scanner.find
+        spacious_kinds = self.spacious_kinds
+
+        unclosed = self.unclosed
+
+        # allow_spacious tracks whether the latest match
+        # allows for a spacious element
+
+        i = start
+        length = len(string) if end is None else end
+        while i < length:
+            # 1. Match with solids
+            match = solid_match(string, i, length)
+            if match:
+                kind = solid_kinds[match.lastindex]
+                if kind == unclosed:
+                    raise NoMatch(f'Block comment at {i + offset} is never closed',
+                                  (i + offset, length + offset))
+
+                # Allow spacious after solid match
+                allow_spacious = True
+                # Move cursor along
+                i = match.end()
+
+                yield kind, match
                 continue
 
             # 2. Match with spacious
             if allow_spacious:
-                for regex, process in self.spacious:
-                    if m.match(regex):
-                        type_, value = process(m.groups())
-                        yield Element(type_, value)
-                        
-                        # Disllow another spacious
-                        allow_spacious = False
-                        # Move cursor along
-                        i += len(m.group(0))
-                        
-                        break
-                else:
-                    raise NoMatch(f'No element could be matched at {i}')
-            
+                match = spacious_match(string, i, length)
+                if not match:
+                    raise self.error(string, i, length, offset,
+                        f'No element could be matched at {i + offset}')
+
+                # Disallow another spacious
+                allow_spacious = False
+                # Move cursor along
+                i = match.end()
+
+                yield spacious_kinds[match.lastindex], match
+
             # 3. Must match with line breaks or spaces
             else:
-                if m.match(r'[\s\n]+'):
+                match = SPACES.match(string, i, length)
+                if match:
                     # Allow spacious elements
                     allow_spacious = True
                     # Move cursor along
-                    i += len(m.group(0))
+                    i = match.end()
+
+                    yield self.spaces, match
+                    continue
+
+                raise self.error(string, i, length, offset,
+                    'Spaces are required between spacious elements')
 
+    def error(self, string, i, length, offset, message):
+        """Get the error for a position where no element could be matched,
+        telling of a string there which is never closed if there is one"""
+
+        # Any quote after the first one closes a string of the grammar
+        if self.spacious is self.grammar.spacious and string.startswith('"', i) \
+                and string.find('"', i + 1, length) < 0:
+            return NoMatch(f'String at {i + offset} is never closed',
+                           (i + offset, length + offset))
+
+        return NoMatch(message, (i + offset, i + offset + 1))
+
+    def scan_chunks(self, chunks):
+        """Find the kind of every token in a string given in chunks
+
+        The chunks are scanned up to their last line break, since no element
+        other than strings, arrays and spaces can span one, or up to their
+        last delimiter after it, which no element goes on past either.
+        Anything after that is kept for the next time, so that a long line
+        of delimited elements is not held whole. If a string or an array
+        is cut off, scanning waits until twice as much has been read,
+        so that a long one is not scanned over and over. Positions in errors
+        are those in the whole string.
+        """
+
+        spacious = len(self.solid_kinds)
+        spaces = self.spaces
+        cutoff = self.cutoff
+
+        delimiter_kinds = self.delimiter_kinds
+        delimiter_search = self.delimiter_pattern.search if delimiter_kinds else lambda *_: None
+
+        # Chunks which have not been scanned yet,
+        # starting with what was left over the last time
+        pending = []
+        size = 0
+
+        # How much has to be read before scanning again
+        threshold = 0
+
+        # Position of the pending chunks in the whole string
+        offset = 0
+        allow_spacious = True
+
+        chunks = iter(chunks)
+        final = False
+
+        while not final:
+            chunk = next(chunks, None)
+
+            if chunk is None:
+                final = True
+            else:
+                pending.append(chunk)
+                size += len(chunk)
+
+                if size < threshold or '\n' not in chunk and not delimiter_search(chunk):
                     continue
 
-                raise NoMatch('Spaces are required between spacious elements')
\ No newline at end of file
+            text = ''.join(pending)
+            lines = len(text) if final else text.rfind('\n') + 1
+
+            # Scan on past the last line break if there is a delimiter
+            end = len(text) if final or delimiter_search(text, lines) else lines
+
+            # Tokens after the last line break, held back until a delimiter
+            held = []
+
+            # End of the last token scanned
+            position = 0
+
+            # Whether something is cut off, most likely a string
+            cut = False
+
+            # Where a square section starts which may be an array
+            # going on past the end, which no other can contain
+            start = -1
+            if cutoff is not None and not final:
+                square, prefix = cutoff
+                start = text.rfind(square, 0, end)
+                if start >= 0 and not prefix.match(text, start, end):
+                    start = -1
+
+            try:
+                for kind, match in self.scan(text, 0, end, offset, allow_spacious):
+                    # A string ending in an escaped quote only ends there
+                    # if there is no other quote further on
+                    if not final and text.endswith('\\"', 0, match.end()):
+                        cut = True
+                        break
+
+                    if start >= 0 and match.start() == start:
+                        cut = True
+                        break
+
+                    if match.end() > lines:
+                        # Any of them may be part of an element
+                        # which goes on in the next chunk
+                        held.append((kind, match))
+                        if kind not in delimiter_kinds:
+                            continue
+
+                        yield from held
+                        held.clear()
+
+                    else:
+                        yield kind, match
+
+                    position = match.end()
+                    allow_spacious = kind < spacious or kind == spaces
+
+            except NoMatch:
+                if final:
+                    raise
+                cut = True
+
+            # Wait for more of what was cut off before trying again,
+            # so that a long string is not scanned over and over
+            threshold = 2 * len(text) if cut else 0
+
+            text = text[position:]
+            offset += position
+
+            pending = [text] if text else []
+            size = len(text)
+
+    def rematch(self, string, kind, start):
+        """Match a token of a known kind again at its offset"""
+
+        if kind == self.spaces:
+            return SPACES.match(string, start)
+
+        if kind < len(self.solid_kinds):
+            return self.solid_scanner.find(string, start)
+
+        return self.spacious_scanner.find(string, start)
+
+    def convert(self, kind, match):
+        """Get the type and value of a matched token"""
+        process, indices = self.table[kind]
+        return process(Scanner.groups(match, indices))
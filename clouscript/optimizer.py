@@ -0,0 +1,237 @@
+import math
+import operator
+from collections import Counter
+
+from .delimiters import Sequence
+from .element import Element, Spanned
+
+
+# How the infixes which may be folded are applied,
+# the same way as in the functions of the compiler
+FOLDS = {
+    'ADD': operator.add,
+    'SUB': operator.sub,
+    'MUL': operator.mul,
+    'DIV': operator.truediv,
+    'FDIV': operator.floordiv,
+    'MOD': operator.mod,
+    'POW': operator.pow,
+
+    'EQ': operator.eq,
+    'NE': operator.ne,
+    'LT': operator.lt,
+    'LE': operator.le,
+    'GT': operator.gt,
+    'GE': operator.ge,
+
+    'and': lambda left, right: left and right,
+    'or': lambda left, right: left or right,
+}
+
+# Literals which may be folded
+CONSTANTS = ('INTEGER', 'FLOAT', 'HEXADECIMAL', 'BOOLEAN')
+
+# Largest number of bits in the result of folding a power
+MAX_BITS = 1 << 16
+
+
+class Report:
+    """What an optimizer did to a tree
+
+    nodes -- int: Number of elements in the tree before
+    unique -- int: Number of distinct elements in the tree after
+    folded -- Counter: Number of infixes folded into constants, by type
+    shared -- Counter: Number of elements replaced by an identical one, by type
+    """
+
+    def __init__(self):
+        self.nodes = 0
+        self.unique = 0
+        self.folded = Counter()
+        self.shared = Counter()
+
+    def __str__(self):
+        lines = [f'{self.nodes} elements, {self.unique} of them distinct']
+
+        for type_, count in self.folded.most_common():
+            lines.append(f'  folded {count} {type_}')
+
+        for type_, count in self.shared.most_common():
+            lines.append(f'  shared {count} {type_}')
+
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'<Report: {sum(self.folded.values())} folded, {sum(self.shared.values())} shared>'
+
+
+class Optimizer:
+    """Fold constants and share identical elements in trees from loads
+
+    An infix whose operands are both numbers or booleans is replaced
+    by a literal of its result, from the bottom of the tree and up,
+    so 60 * 60 * 24 becomes 86400. Infixes are not reordered, so
+    in x * 60 * 60 nothing is folded. Infixes which would fail, or give
+    results which are not finite or take too many bits, are left as they are.
+
+    Every element which is the same as one before it in type and value,
+    all the way down, is replaced by that one, so that the tree
+    holds a single element for each distinct subtree. Elements with
+    spans are only the same if their spans are too, so that none of them
+    tells the wrong place in the source, and neither are 0.0 and -0.0.
+    Elements which are made again keep the span of the one they replace.
+
+    Trees from the optimizer hold the same element in more than one place,
+    so their elements must not be changed. Nothing is kept between trees,
+    so an optimizer may be shared by many threads.
+    """
+
+    def __init__(self, fold=True, share=True):
+        """Arguments:
+            fold -- bool: Whether to fold constants
+            share -- bool: Whether to share identical elements
+        """
+
+        self.fold = fold
+        self.share = share
+
+    def optimize(self, tree):
+        """Optimize a tree, giving back a new one along with a Report"""
+
+        report = Report()
+
+        # Distinct elements by their type and value, where elements
+        # in the value are told apart by identity, since they are distinct
+        distinct = {}
+
+        # Go through the elements after those in them, keeping a stack
+        # instead of recursing, since trees may be deeper than Python allows
+        stack = [(tree, [])]
+
+        while True:
+            element, done = stack[-1]
+            value = element.value
+
+            if type(value) is tuple and len(done) < len(value):
+                stack.append((value[len(done)], []))
+                continue
+
+            stack.pop()
+            element = self.node(element, done, distinct, report)
+
+            if not stack:
+                break
+
+            stack[-1][1].append(element)
+
+        report.unique = self.count(element)
+
+        return element, report
+
+    def count(self, tree):
+        """Count the distinct elements in a tree,
+        going through each shared one only once"""
+
+        seen = set()
+        stack = [tree]
+
+        while stack:
+            element = stack.pop()
+            if id(element) in seen:
+                continue
+
+            seen.add(id(element))
+            if type(element.value) is tuple:
+                stack.extend(element.value)
+
+        return len(seen)
+
+    def node(self, element, elements, distinct, report):
+        """Optimize an element, given its optimized elements"""
+
+        report.nodes += 1
+
+        type_ = element.type
+        value = element.value
+        span = element.span
+
+        if type(value) is tuple:
+            if any(new is not old for new, old in zip(elements, value)):
+                value = tuple(elements)
+                if type(element) is Sequence:
+                    element = Sequence(value)
+                else:
+                    element = self.element(type_, value, span)
+
+            if self.fold and type_ in FOLDS:
+                folded = self.constant(type_, value)
+                if folded is not None:
+                    report.folded[type_] += 1
+                    type_, value = folded.type, folded.value
+                    element = self.element(type_, value, span)
+
+        if not self.share:
+            return element
+
+        if type(value) is tuple:
+            key = (type_, type(element), tuple(map(id, value)), span)
+        elif type(value) is float:
+            # 0.0 and -0.0 are equal, but not the same literal
+            key = (type_, float, value, math.copysign(1.0, value), span)
+        else:
+            # Tell apart values which are equal but of different types, like 1 and true
+            key = (type_, type(value), value, span)
+
+        try:
+            shared = distinct.setdefault(key, element)
+        except TypeError:
+            return element
+
+        if shared is not element:
+            report.shared[type_] += 1
+
+        return shared
+
+    def element(self, type_, value, span):
+        """Make an element, with a span if it has one"""
+        if span is None:
+            return Element(type_, value)
+        return Spanned(type_, value, *span)
+
+    def constant(self, type_, operands):
+        """Get a literal of the result of an infix with constant operands,
+        or None if it can not be folded"""
+
+        if len(operands) != 2 or any(e.type not in CONSTANTS for e in operands):
+            return None
+
+        left, right = (e.value for e in operands)
+
+        # Powers of integers grow quickly
+        if type_ == 'POW' and type(left) is int and type(right) is int \
+                and abs(left) > 1 and left.bit_length() * right > MAX_BITS:
+            return None
+
+        try:
+            result = FOLDS[type_](left, right)
+        except (ArithmeticError, ValueError):
+            return None
+
+        if type(result) is bool:
+            return Element('BOOLEAN', result)
+
+        if type(result) is int:
+            return Element('INTEGER', result)
+
+        if type(result) is float and math.isfinite(result):
+            return Element('FLOAT', result)
+
+        return None
+
+
+def optimize(tree, fold=True, share=True):
+    """Fold constants and share identical elements in a tree
+
+    Returns the new tree along with a Report of what was done
+    """
+    return Optimizer(fold, share).optimize(tree)
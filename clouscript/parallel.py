@@ -0,0 +1,209 @@
+from _thread import allocate_lock
+from concurrent.futures import ProcessPoolExecutor
+
+from . import binary
+from .element import Element
+from .exceptions import ClouScriptException
+
+
+class ParallelParser:
+    """Parse large strings with a pool of processes
+
+    A string is split into chunks at line breaks outside of any parentheses,
+    strings or comments, so that no element spans two chunks. Every chunk is
+    lexed and has its parenthesized sections parsed in a process of its own.
+    The top level, where infixes and delimiters may reach from one chunk
+    into the next, is then reduced here, so the tree is the same as from loads.
+
+    The elements of each chunk come back in the binary format, which is
+    read far faster than pickles, and are read and reduced here in order
+    while the chunks after them are still being parsed. With a lazy parser,
+    the sections in them are only read once their values are.
+
+    If anything in a chunk can not be parsed, the whole string is parsed
+    again here, so that the error raised is the same as from loads.
+    Lexers with rules of their own can not be sent to other processes,
+    and the binary format the elements come back in has no spans,
+    so strings lexed with either are always parsed here.
+
+    The pool of processes is started the first time a string is split into
+    more than one chunk, and is reused for every string after that until
+    the parser is closed.
+    """
+
+    def __init__(self, lexer=None, parser=None, workers=None, chunk_size=1 << 16):
+        """Arguments:
+            workers -- int: Number of processes, the number of processors if None
+            chunk_size -- int: Number of characters to put in a chunk at least
+        """
+
+        from . import default_lexer, default_parser
+
+        if lexer is None:
+            lexer = default_lexer()
+
+        if parser is None:
+            parser = default_parser()
+
+        self.lexer = lexer
+        self.parser = parser
+        self.workers = workers
+        self.chunk_size = chunk_size
+
+        # Only the default rules of a grammar can be compiled again elsewhere,
+        # and only elements without spans come back from there
+        self.portable = not lexer.has_own_rules() and not lexer.spans
+
+        self.pattern = lexer.grammar.prescanner
+        self.executor = None
+        self.lock = allocate_lock()
+
+    def loads(self, string):
+        """Parse a string, in parallel if it is split into more than one chunk"""
+
+        chunks = self.split(string) if self.portable else [string]
+
+        if len(chunks) <= 1:
+            return self.parse(string)
+
+        lazy = self.parser.lazy
+
+        try:
+            # Reduce the top level of all chunks as one section,
+            # adding the elements of each chunk once it is finished
+            section = self.parser.section()
+
+            for data in self.pool().map(_nest, chunks):
+                for element in binary.loads(data, lazy).value:
+                    section.append(element)
+
+            return Element('', tuple(self.parser.close(section)))
+
+        # Errors are raised the way loads raises them,
+        # which may be in another chunk than this one
+        except ClouScriptException:
+            return self.parse(string)
+
+    def pool(self):
+        """Get the pool of processes, starting it if it is not yet"""
+
+        if self.executor is None:
+            with self.lock:
+                if self.executor is None:
+                    self.executor = ProcessPoolExecutor(
+                        self.workers,
+                        initializer=_initialize,
+                        initargs=(self.lexer.grammar, self.parser.grammar, self.parser.pipeline)
+                    )
+
+        return self.executor
+
+    def parse(self, string):
+        span = (0, len(string)) if self.lexer.spans else None
+        return self.parser.parse(list(self.lexer.lex(string)), span)
+
+    def split(self, string):
+        """Split a string at line breaks outside of any parentheses,
+        strings or comments, into chunks of at least the chunk size"""
+
+        chunks = []
+        start = 0
+        depth = 0
+
+        for match in self.pattern.finditer(string):
+            kind = match.lastgroup
+
+            if kind == 'left':
+                depth += 1
+            elif kind == 'right':
+                depth -= 1
+
+            # A string or comment which is never closed can not be lexed anyway
+            elif kind == 'quote' or kind == 'comment':
+                break
+
+            elif kind == 'newline' and depth == 0:
+                end = match.end()
+                if end - start >= self.chunk_size:
+                    chunks.append(string[start:end])
+                    start = end
+
+        if start < len(string):
+            chunks.append(string[start:])
+
+        return chunks
+
+    def split_chunks(self, chunks):
+        """Split a string given in chunks like split, yielding each part
+        as soon as what comes after it has been read
+
+        What comes after the last part found is kept for the next chunk.
+        If no part can be split off it, splitting waits until twice
+        as much has been read, so that a long section is not gone
+        through over and over.
+        """
+
+        rest = ''
+        wanted = 0
+
+        for chunk in chunks:
+            rest += chunk
+
+            if len(rest) < wanted:
+                continue
+
+            # The last part may go on in the next chunk
+            parts = self.split(rest)
+            rest = parts.pop()
+
+            yield from parts
+
+            wanted = 0 if parts else 2 * len(rest)
+
+        if rest:
+            yield rest
+
+    def close(self):
+        """Shut down the processes"""
+
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+# The lexer and parser of each process in the pool
+_lexer = None
+_parser = None
+
+# The lexers and parsers of a process, by their grammars,
+# for pools which were not started by a ParallelParser
+_parsers = {}
+
+def _initialize(lexer_grammar, parser_grammar, pipeline):
+    global _lexer, _parser
+    _lexer, _parser = _parsers_of(lexer_grammar, parser_grammar, pipeline)
+
+def _parsers_of(lexer_grammar, parser_grammar, pipeline):
+    from .lexer import Lexer
+    from .parser import Parser
+
+    key = (lexer_grammar.fingerprint(), parser_grammar.fingerprint(), pipeline)
+
+    if key not in _parsers:
+        _parsers[key] = (
+            Lexer(grammar=lexer_grammar),
+            Parser(grammar=parser_grammar, pipeline=pipeline)
+        )
+
+    return _parsers[key]
+
+def _nest(chunk, *grammars):
+    # Pools of others are sent the grammars along with every chunk
+    lexer, parser = _parsers_of(*grammars) if grammars else (_lexer, _parser)
+    return binary.dumps(Element('', tuple(parser.nest(lexer.lex(chunk)))))
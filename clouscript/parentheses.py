@@ -1,4 +1,5 @@
 import re
+import sys
 
 
 class Parentheses:
@@ -15,6 +16,7 @@ class Parentheses:
         entries = [entry.partition('=') for entry in string.split(' ')]
         # Store group names and paranthesis characters in two separate lists
         self.groups, _, self.pairs = zip(*entries)
+        self.groups = tuple(map(sys.intern, self.groups))
         
         # Divide pairs into left and right parentheses
         self.left, self.right = map(''.join, zip(*self.pairs))
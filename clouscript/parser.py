@@ -1,121 +1,464 @@
-from rich import print
+from functools import partial
+from itertools import chain
 
-from .element import Element
-from .exceptions import MismatchedParentheses, InvalidParenthesis
+from .element import Element, Spanned, Located, Deferred
+from .exceptions import ClouScriptException, EmptySection, \
+    MismatchedParentheses, InvalidParenthesis, PipelineMismatch
+from .pull import PullParser
+from .reducer import Reducer
 
 
 class Parser:
-    def __init__(self, capsules=None, parentheses=None, delimiters=None, infixes=None):
+    def __init__(self, capsules=None, parentheses=None, delimiters=None, infixes=None, \
+                                        grammar=None, pipeline='fused', lazy=False):
+        """Arguments:
+            pipeline -- str: How the elements of each section are reduced
+                           'fused' --> capsules, infixes, and delimiters in one pass
+                          'staged' --> encapsulate, structure, and segment in turn
+                         'compare' --> both, raising PipelineMismatch on any difference
+            lazy -- bool: Whether to parse the sections of a token stream
+                          only once their values are first read
+        """
+
         # Capsules are parenthesis groups which are allowed
         # to connect with other elements to form function calls or the likes
-        
-        if capsules is None:
-            capsules = {
-                'ROUND': 'CALL'
-            }
 
-        self.capsules = capsules
-        
-        
-        if parentheses is None:
-            from .parentheses import Parentheses
-            parentheses = Parentheses()
+        if grammar is None:
+            from .grammar import Grammar, default_grammar
+
+            if capsules is None and parentheses is None \
+                    and delimiters is None and infixes is None:
+                grammar = default_grammar()
+            else:
+                grammar = Grammar(parentheses, delimiters, infixes, capsules)
 
-        if delimiters is None:
-            from .delimiters import Delimiters
-            delimiters = Delimiters()
+        self.grammar = grammar
 
-        if infixes is None:
-            from .infixes import Infixes
-            infixes = Infixes()
+        self.capsules = grammar.capsules
+        self.parentheses = grammar.parentheses
+        self.delimiters = grammar.delimiters
+        self.infixes = grammar.infixes
 
-        self.parentheses = parentheses
-        self.delimiters = delimiters
-        self.infixes = infixes
-        
-    def parse(self, elements):
+        if pipeline not in ('fused', 'staged', 'compare'):
+            raise ValueError(f'Unknown pipeline {pipeline!r}')
+
+        self.pipeline = pipeline
+        self.lazy = lazy
+
+    def fingerprint(self):
+        """Get a digest of the grammar of this parser"""
+        return self.grammar.fingerprint()
+
+    def parse(self, elements, span=None):
         """Parse an array of elements
         and generate an abstract syntax tree
+
+        span -- tuple: Offsets of the start and end of the string
+                       the elements are from, if they have spans,
+                       which errors of the top level are given
         """
 
         # The top level does not get properly parsed,
         # so the elements given should always be surrounded
         # by parentheses and have them removed afterward
 
-        left_parenthesis = Element(
-            self.parentheses.groups[0],
-            self.parentheses.left[0]
-        )
-        
-        right_parenthesis = Element(
-            self.parentheses.groups[0],
-            self.parentheses.right[0]
-        )
-        
-        elements = [left_parenthesis] + elements + [right_parenthesis]
+        if span is None:
+            left_parenthesis = Element(
+                self.parentheses.groups[0],
+                self.parentheses.left[0]
+            )
+
+            right_parenthesis = Element(
+                self.parentheses.groups[0],
+                self.parentheses.right[0]
+            )
+
+        else:
+            # The parentheses take up no room at either end
+            left_parenthesis = Spanned(
+                self.parentheses.groups[0],
+                self.parentheses.left[0],
+                span[0], span[0]
+            )
+
+            right_parenthesis = Spanned(
+                self.parentheses.groups[0],
+                self.parentheses.right[0],
+                span[1], span[1]
+            )
+
+        given = elements
+        elements = chain([left_parenthesis], elements, [right_parenthesis])
 
         # Initialize stack to deal with navigating
         # up and down parenthesized sections
-        stack = [[]]
+        stack = [self.section()]
         
         # History of opened parenthese
         history = [None]
-        
 
-        i = 0
-        while i < len(elements):
-            e = elements[i]
-
-            if e.type in self.parentheses.groups:
-                # Open up a new section
-                # when a left-hand parenthesis is found
-                if e.value in self.parentheses.left:
-                    stack[-1].append([])
-                    stack.append(stack[-1][-1])
-                    history.append(e.type)
-
-                # Close down the last opened section
-                # when a right-hand parenthesis is found
-                elif e.value in self.parentheses.right:
-                    # If the closing parenthesis does not match
-                    # the type that was most recently opened,
-                    # there has been a mismatch
-                    if e.type != history[-1]:
-                        raise MismatchedParentheses(
-                                f'{e.type} does not match with {history[-1]}')
-
-                    stack.pop()
-                    history.pop()
-
-                    section = stack[-1][-1]
-
-                    # Form capsule functions
-                    section = self.encapsulate(section)
-
-                    # Form infix functions
-                    section = self.infixes.structure(section)
-
-                    # Segment section by delimiters
-                    section = self.delimiters.segment(section)
-                    
-                    # Replace section with a section element
-                    stack[-1][-1] = Element(e.type, section)
+        groups = self.parentheses.groups
 
+        try:
+            for e in elements:
+                if e.type in groups:
+                    self.parenthesis(stack, history, e)
                 else:
-                    raise InvalidParenthesis('Parenthesis element found with invalid parenthesis')
+                    # If the element is not a parenthesis,
+                    # add it to the currently opened section
+                    stack[-1].append(e)
+
+        except MismatchedParentheses as exception:
+            # If the top level was closed by a parenthesis of its own,
+            # the error is there rather than at the end of the string
+            if e is right_parenthesis and span is not None and type(given) is list:
+                exception.span = self.stray(given) or exception.span
+            raise
+
+        # Remove the section made from the dummy parentheses added at the start
+        # But put everything into an overarching code element
+        return Element('', self.first(stack[-1]).value)
+
+    def stray(self, elements):
+        """Get the span of the first right-hand parenthesis
+        which closes more than was opened, if any"""
+
+        parentheses = self.parentheses
+        depth = 0
+
+        for e in elements:
+            if e.type not in parentheses.groups:
+                continue
 
+            if e.value in parentheses.left:
+                depth += 1
+            elif depth:
+                depth -= 1
             else:
-                # If the element is not a parenthesis,
-                # add it to the currently opened section
-                stack[-1].append(e)
+                return e.span
+
+        return None
+
+    def parse_tokens(self, stream):
+        """Parse a token stream from Lexer.tokens
+
+        If the parser is lazy, only the tokens outside of any parentheses
+        are converted into elements to begin with. Every section is put
+        in a deferred element, which converts and parses its tokens the
+        first time its value is read, and so on for the sections in it.
+        The tree is the same as from parse, but any error in a section
+        is only raised once it is read. Strings whose parentheses are
+        left open are parsed right away, like parse does.
+        """
+
+        if self.lazy:
+            pairs = self.pair(stream)
+
+            if pairs is not None:
+                return Element('', self.span(stream, pairs, 0, len(stream)))
+
+        span = (0, len(stream.string)) if stream.lexer.spans else None
+        return self.parse(list(stream.elements()), span)
+
+    def pair(self, stream):
+        """Find the closing parenthesis token of every opening one,
+        or None if they do not all match"""
+
+        string = stream.string
+        starts = stream.starts
+        ends = stream.ends
+
+        parentheses = self.parentheses
+        characters = parentheses.parentheses
+        groups = parentheses.groups
+
+        pairs = {}
+        stack = []
+
+        for i in range(len(stream)):
+            # Only convert the tokens which look like parentheses
+            if ends[i] - starts[i] != 1 or string[starts[i]] not in characters:
+                continue
+
+            type_, value = stream.convert(i)
+            if type_ not in groups:
+                continue
+
+            if value in parentheses.left:
+                stack.append((i, type_))
+
+            elif stack and value in parentheses.right and stack[-1][1] == type_:
+                pairs[stack.pop()[0]] = i
+
+            else:
+                return None
+
+        if stack:
+            return None
+
+        return pairs
+
+    def span(self, stream, pairs, start, end):
+        """Parse the tokens between two indices,
+        deferring the sections among them"""
+
+        section = self.section()
+        i = start
+
+        while i < end:
+            element = stream.element(i)
+
+            if i in pairs:
+                # Skip the tokens of the section
+                # until its value is read
+                close = pairs[i]
+                compute = partial(self.span, stream, pairs, i + 1, close)
+
+                # The section spans from one parenthesis to the other
+                if stream.lexer.spans:
+                    element = Deferred(element.type, compute,
+                                       stream.starts[i], stream.ends[close])
+                else:
+                    element = Deferred(element.type, compute)
+
+                i = close
+
+            if element is not None:
+                section.append(element)
 
             i += 1
 
-        # Remove the section made from the dummy parentheses added at the start
-        stack[-1] = stack[-1][0].value
+        try:
+            return tuple(self.close(section))
+        except ClouScriptException as exception:
+            # Errors which are not about any one element are given
+            # the span of the whole section, or of the whole string
+            if exception.span is None and stream.lexer.spans:
+                if start == 0 and end == len(stream):
+                    exception.span = 0, len(stream.string)
+                else:
+                    exception.span = stream.starts[start - 1], stream.ends[end]
+            raise
+
+    def nest(self, elements, opened=None, closing=True):
+        """Parse the parenthesized sections among elements,
+        but leave the elements outside of them as they are
+
+        Arguments:
+            opened -- Element: Left-hand parenthesis the elements are in,
+                               which a right-hand one closing more than
+                               was opened among them is matched with
+            closing -- bool: Whether a parenthesis left open among them
+                             is an error, rather than left to the caller
+        """
 
-        # But put everything into an overarching code element
-        return Element('', stack[-1])
+        stack = [[]]
+        history = [opened]
+
+        groups = self.parentheses.groups
+
+        for e in elements:
+            if e.type in groups:
+                self.parenthesis(stack, history, e)
+            else:
+                stack[-1].append(e)
+
+        if closing and len(stack) > 1:
+            raise self.mismatch(history[-1], None)
+
+        return stack[0]
+
+    def iterparse(self, elements, nested=False):
+        """Parse elements into the top-level elements of a tree,
+        yielding each one as soon as it is finished
+
+        A top-level element is finished once the element after it shows
+        that no infix or capsule is going to be joined with it. Top-level
+        delimiters separate these elements and are left out. Where a
+        top-level section holds more than one element, parse would group
+        them into sequences, but here they are yielded one by one.
+        Otherwise the elements are the same as those of parse.
+
+        Arguments:
+            nested -- bool: Whether the parenthesized sections among
+                            the elements are parsed already, as from nest,
+                            so that only the top level is left
+        """
+
+        finished = []
+
+        # Finished top-level elements are passed on right away
+        # instead of being segmented once all of them are known
+        root = Reducer(self, emit=finished.append)
+
+        stack = [root]
+        history = [None]
+
+        groups = self.parentheses.groups
+        delimiters = self.delimiters
+
+        # Whether the last top-level element was a delimiter
+        separated = True
+
+        def separate(element):
+            nonlocal separated
+
+            if element.type == 'DELIMITER' and element.value in delimiters.levels:
+                if separated and not delimiters.allow_empty_sections:
+                    raise EmptySection('Empty sections are not allowed', element.span)
+                separated = True
+                return False
+
+            separated = False
+            return True
+
+        for e in elements:
+            if e.type in groups and not nested:
+                self.parenthesis(stack, history, e)
+            else:
+                stack[-1].append(e)
+
+            if finished:
+                yield from filter(separate, finished)
+                finished.clear()
+
+        if len(stack) > 1:
+            raise self.mismatch(history[-1], None)
+
+        # Closing may finish the last element, or give those
+        # which were held back for being too few for any infix
+        rest = root.close()
+        yield from filter(separate, chain(finished, rest))
+
+        if separated and root.count and not delimiters.allow_empty_sections:
+            raise EmptySection('Empty sections are not allowed')
+
+    def events(self, elements):
+        """Parse elements into a stream of events instead of a tree,
+        generating them as the elements are read
+
+        See PullParser for the events and the order they come in
+        """
+        return PullParser(self).events(elements)
+
+    def parenthesis(self, stack, history, e):
+        """Open or close a section"""
+
+        # Open up a new section
+        # when a left-hand parenthesis is found
+        if e.value in self.parentheses.left:
+            stack.append(self.section())
+            history.append(e)
+
+        # Close down the last opened section
+        # when a right-hand parenthesis is found
+        elif e.value in self.parentheses.right:
+            opened = history[-1]
+
+            # If the closing parenthesis does not match
+            # the type that was most recently opened,
+            # there has been a mismatch
+            if opened is None or e.type != opened.type:
+                raise self.mismatch(opened, e)
+
+            history.pop()
+
+            # Form capsule functions and infix functions,
+            # and segment section by delimiters
+            try:
+                section = self.close(stack.pop())
+            except ClouScriptException as exception:
+                # Errors which are not about any one element
+                # are given the span of the whole section
+                if exception.span is None:
+                    exception.span = Spanned.between(None, None, opened, e).span
+                raise
+
+            # Add a section element in place of the section,
+            # spanning from one parenthesis to the other
+            if type(e) is Element:
+                stack[-1].append(Element(e.type, tuple(section)))
+            elif type(e) is Located and type(opened) is Located and e.offsets is opened.offsets:
+                # Both parentheses were lexed from the same string
+                stack[-1].append(e.offsets.join(e.type, tuple(section), opened, e))
+            else:
+                stack[-1].append(Spanned.between(e.type, tuple(section), opened, e))
+
+        else:
+            raise InvalidParenthesis('Parenthesis element found with invalid parenthesis', e.span)
+
+    def mismatch(self, opened, closed):
+        """Get the error for a section closed by a parenthesis of another group,
+        or by one when none was opened, or never closed if closed is None"""
+
+        if closed is None:
+            return MismatchedParentheses(f'{opened.type} was never closed', opened.span)
+
+        return MismatchedParentheses(
+                f'{closed.type} does not match with {opened and opened.type}', closed.span)
+
+    def section(self):
+        """Start a new section for the elements between two parentheses"""
+        if self.pipeline == 'fused':
+            return Reducer(self)
+        return []
+
+    def first(self, section):
+        """Get the first element of a section before it is closed"""
+        if self.pipeline == 'fused':
+            return section.first
+        return section[0]
+
+    def close(self, section):
+        """Get the reduced elements of a section"""
+
+        if self.pipeline == 'fused':
+            return section.close()
+
+        if self.pipeline == 'staged':
+            return self.reduce(section)
+
+        return self.compare(section)
+
+    def reduce(self, elements):
+        """Reduce the elements of a section in three stages"""
+
+        # Form capsule functions
+        elements = self.encapsulate(elements)
+
+        # Form infix functions
+        elements = self.infixes.structure(elements)
+
+        # Segment section by delimiters
+        return self.delimiters.segment(elements)
+
+    def compare(self, elements):
+        """Reduce the elements of a section both in one pass and in three stages,
+        and make sure that the results are the same"""
+
+        results = []
+
+        reducer = Reducer(self)
+        for element in elements:
+            reducer.append(element)
+
+        for reduce in (reducer.close, lambda: self.reduce(list(elements))):
+            try:
+                results.append(reduce())
+            except ClouScriptException as exception:
+                results.append(exception)
+
+        fused, staged = results
+
+        # Compare the representations, which include
+        # the types and values of all the elements, or of the errors
+        if repr(fused) != repr(staged):
+            raise PipelineMismatch(f'Fused pipeline gave {fused!r} but staged gave {staged!r}')
+
+        if isinstance(staged, ClouScriptException):
+            raise staged
+
+        return staged
 
     def encapsulate(self, elements):
         """Group capsules with preceding elements to form function calls"""
@@ -125,39 +468,52 @@ class Parser:
         if len(elements) <= 1:
             return elements
 
-        i = 1
-        while i < len(elements):
+        encapsulated = elements[:1]
+
+        for element in elements[1:]:
             # If the type of the element is a capsule,
             # it is intended for a function call.
             # If the section is preceded by a label, encapsule the two
-            if elements[i].type in self.capsules:
-                # Use the value of the precedent as the function
-                function = elements[i - 1]
-                # Use the value of the section as arguments
-                value = elements[i]
-                
-                # Get the name for this type of encapsulation
-                name = self.capsules.get(value.type)
-
-                # If there is only one argument and it is a sequence,
-                # use the array of it instead                            
-                if type(value) in (list, tuple) and len(value) == 1 and value[0] == 'SEQUENCE':
-                    value = value[0].value
-
-                # If the value element is just a parenthesis group,
-                # extract and use the array instead
-                if value.type in self.parentheses.groups:
-                    value = value.value
-
-                if type(value) not in (list, tuple):
-                    value = [value]
-
-                # Add the new function call element
-                elements[i - 1] = Element(name, (function, *value))
-                # Remove the capsule element
-                elements.pop(i)
-
+            if element.type in self.capsules:
+                encapsulated[-1] = self.capsule(encapsulated[-1], element)
             else:
-                i += 1
+                encapsulated.append(element)
+
+        return encapsulated
+
+    def capsule(self, function, value):
+        """Form a function call or the likes from an element
+        and the capsule section following it"""
+
+        # Get the name for this type of encapsulation
+        name = self.capsules.get(value.type)
+        section = value
+
+        # If there is only one argument and it is a sequence,
+        # use the array of it instead
+        if type(value) in (list, tuple) and len(value) == 1 and value[0] == 'SEQUENCE':
+            value = value[0].value
+
+        # A deferred section is only extracted
+        # once the value of the function call is read
+        if type(value) is Deferred and value.type in self.parentheses.groups:
+            span = Spanned.between(None, None, function, value).span or (None, None)
+            return Deferred(name, partial(self.call, function, value), *span)
+
+        # If the value element is just a parenthesis group,
+        # extract and use the array instead
+        if value.type in self.parentheses.groups:
+            value = value.value
+
+        if type(value) not in (list, tuple):
+            value = [value]
+
+        # The call spans from the function to the end of the section
+        if type(section) is Element:
+            return Element(name, (function, *value))
+
+        return Spanned.between(name, (function, *value), function, section)
 
-        return elements
\ No newline at end of file
+    def call(self, function, section):
+        """Get the value of a function call with a deferred section"""
+        return (function, *section.value)
@@ -0,0 +1,431 @@
+import sys
+
+from .element import Element, Spanned
+from .exceptions import ClouScriptException, EmptySection, UnmatchedInfix, InvalidParenthesis
+
+
+# Kinds of events, each of which comes along with a value
+ENTER = 'enter_section'  # Name of the parenthesis group opened
+LEAVE = 'leave_section'  # Name of the parenthesis group closed
+TOKEN = 'token'          # Element which is not a section
+INFIX = 'infix'          # Type of the element formed by an infix
+DELIMITER = 'delimiter'  # Delimiter between two parts of a section
+CALL = 'call'            # Name of the element formed by a capsule
+
+
+class PullParser:
+    """Parse elements into a stream of events instead of a tree
+
+    Events are pairs of a kind and a value, and come in the order
+    in which the elements of the tree would be finished: the events
+    of the operands of an infix come before the infix, and those
+    of the function of a capsule and of its section before the call.
+    So an infix applies to the two last operands before it,
+    and a call to the element before the section which was just left,
+    like the operators in reverse Polish notation.
+
+        a + f(b)  -->  enter_section ''
+                       token a
+                       token f
+                       enter_section ROUND
+                       token b
+                       leave_section ROUND
+                       call CALL
+                       infix ADD
+                       leave_section ''
+
+    Elements are only kept for as long as it takes to tell what they are,
+    and pending infixes for as long as their right-hand elements are not
+    finished, so the memory taken depends on how deeply the sections
+    are nested and not on how many elements there are. Delimiters are
+    given as they are found, and sections are not segmented by them.
+
+    A delimiter beside an infix is one of its elements in the tree
+    from parse, so it is given as a token instead of as a delimiter.
+
+    The same errors are raised as by Parser.parse, but as soon as they
+    are found, so where there is more than one another may be raised.
+    Unlike parse, a right-hand parenthesis at the top level is always
+    an error, as is a left-hand one which is never closed, and a section of only a lower delimiter between two higher
+    ones, which parse would flatten into that delimiter, is empty.
+    """
+
+    def __init__(self, parser):
+        """Arguments:
+            parser -- Parser: Parentheses, capsules, infixes, and delimiters
+        """
+
+        self.parser = parser
+
+        self.capsules = parser.capsules
+        self.parentheses = parser.parentheses
+        self.priorities = parser.infixes.infixes
+        self.types = parser.infixes.types
+        self.levels = parser.delimiters.levels
+        self.allow_empty_sections = parser.delimiters.allow_empty_sections
+
+    def events(self, elements):
+        """Generate the events of parsing an iterable of elements"""
+
+        events = []
+
+        # The top level is a section without any parentheses,
+        # named like the overarching code element from parse
+        stack = [Section(self, events, '')]
+        history = [None]
+
+        left = self.parentheses.left
+        right = self.parentheses.right
+        groups = self.parentheses.groups
+
+        yield ENTER, ''
+
+        for e in elements:
+            if e.type in groups:
+                # Open up a new section
+                # when a left-hand parenthesis is found
+                if e.value in left:
+                    capsule = stack[-1].open(e.type)
+                    stack.append(Section(self, events, e.type, capsule))
+                    history.append(e)
+
+                # Close down the last opened section
+                # when a right-hand parenthesis is found
+                elif e.value in right:
+                    opened = history[-1]
+
+                    if opened is None or e.type != opened.type:
+                        raise self.parser.mismatch(opened, e)
+
+                    history.pop()
+
+                    try:
+                        stack.pop().close()
+                    except ClouScriptException as exception:
+                        # Like in Parser.parenthesis
+                        if exception.span is None:
+                            exception.span = Spanned.between(None, None, opened, e).span
+                        raise
+
+                else:
+                    raise InvalidParenthesis('Parenthesis element found with invalid parenthesis',
+                                             e.span)
+
+            else:
+                stack[-1].add(e)
+
+            if events:
+                yield from events
+                events.clear()
+
+        if len(stack) > 1:
+            raise self.parser.mismatch(history[-1], None)
+
+        stack[0].close()
+        yield from events
+
+
+class Section:
+    """The events of a section, given as its elements are added
+
+    Capsules and infixes are dealt with the same way as by Reducer
+    and Structurer, but instead of keeping the elements, only whether
+    there are any is kept, and events are given in place of them.
+    """
+
+    def __init__(self, puller, events, group, capsule=None):
+        """Arguments:
+            puller -- PullParser: Configuration of the parser
+            events -- list: Where the events are put
+            group -- str: Name of the parenthesis group
+            capsule -- str: Name of the element formed with the element
+                            before the section, if it is a capsule
+        """
+
+        self.puller = puller
+        self.events = events
+        self.group = group
+        self.capsule = capsule
+
+        # The last infix or delimiter, which becomes the function
+        # of a call instead if a capsule follows it
+        self.held = None
+
+        # Whether any element has been added, for a capsule to form a call with
+        self.started = False
+
+        # Number of elements after forming capsules, along with the first
+        # of them and the second if they are infixes, which are only
+        # applied once there are enough elements for any infix
+        self.count = 0
+        self.first = None
+        self.second = None
+        self.last = None
+
+        # Number of operands and pending infixes of the expression being
+        # structured, along with the priorities of the infixes
+        self.operands = 0
+        self.pending = []
+
+        self.after_infix = False
+        self.broken = None
+
+        # Whether the last event was a delimiter, or there were none,
+        # and whether there have been any delimiters
+        self.separated = True
+        self.delimited = False
+
+    def add(self, element):
+        """Add the next element, which is not a parenthesis"""
+
+        # A delimiter before an infix is its left-hand element
+        if self.held is not None and self.held.type == 'DELIMITER' \
+                and element.type == 'INFIX':
+            self.operand(self.held, TOKEN)
+            self.held = None
+
+        self.resolve()
+
+        if element.type == 'INFIX' or element.type == 'DELIMITER' \
+                and element.value in self.puller.levels:
+            self.held = element
+        else:
+            self.operand(element, TOKEN)
+
+        self.started = True
+
+    def open(self, group):
+        """Add a section which is being opened,
+        giving back the name of the call it forms if it is a capsule"""
+
+        capsule = self.puller.capsules.get(group) if self.started else None
+
+        if capsule is not None:
+            # An infix or a delimiter before a capsule
+            # is the function of the call
+            if self.held is not None:
+                self.operand(self.held, TOKEN)
+                self.held = None
+
+            # The last element is now the call
+            self.last = None
+        else:
+            self.resolve()
+            self.operand(None, ENTER)
+
+        self.started = True
+        self.events.append((ENTER, group))
+
+        return capsule
+
+    def resolve(self):
+        """Pass on the infix or delimiter held back, now that it
+        is known that it does not form a call with a capsule"""
+
+        held = self.held
+        if held is None:
+            return
+
+        self.held = None
+
+        if held.type == 'INFIX':
+            self.commit(held, True)
+        else:
+            self.operand(held, DELIMITER)
+
+    def operand(self, element, kind):
+        """Pass on an element which is not an infix"""
+
+        # A delimiter after an infix is its right-hand element
+        if self.commit(element, False) and kind == DELIMITER:
+            kind = TOKEN
+
+        if kind == ENTER:
+            self.separated = False
+        else:
+            self.event(element, kind)
+
+    def event(self, element, kind):
+        """Give the event of a token or delimiter"""
+
+        if kind == DELIMITER:
+            if self.separated and not self.puller.allow_empty_sections:
+                raise EmptySection('Empty sections are not allowed', element.span)
+
+            self.separated = True
+            self.delimited = True
+            self.events.append((DELIMITER, element.value))
+
+        else:
+            self.separated = False
+            self.events.append((TOKEN, element))
+
+    def commit(self, element, infix):
+        """Pass an element on to be structured,
+        giving back whether it is the right-hand element of an infix"""
+
+        self.count += 1
+        self.last = element
+
+        # Infixes among the first two elements are left as they are
+        # if there are no more elements, so they are held back
+        if self.count <= 2 and infix:
+            if self.count == 1:
+                self.first = element
+                self.broken = element
+                self.event(element, TOKEN)
+            else:
+                self.second = element
+            return False
+
+        if self.count == 3:
+            # If an infix is found at the edge of the section,
+            # it can obviously not have non-infix elements on both sides
+            if self.first is not None:
+                raise UnmatchedInfix(f'{self.first} is missing a left-hand element',
+                                     self.first.span)
+
+            if self.second is not None:
+                self.infix(self.second)
+
+        joined = False
+
+        if infix:
+            self.infix(element)
+        elif self.broken is None:
+            # Two elements beside each other can not be joined
+            # by any infix, so the expression before is finished
+            if self.operands and not self.after_infix:
+                self.finish()
+
+            joined = self.after_infix
+            self.operands += 1
+            self.after_infix = False
+
+        # If any infixes are found beside each other,
+        # they can obviously not have non-infix elements on both sides
+        if self.broken is not None and self.count >= 3:
+            raise UnmatchedInfix(f'Infixes found beside each other', self.broken.span)
+
+        return joined
+
+    def infix(self, element):
+        """Structure an infix like Structurer.add"""
+
+        if self.broken is not None:
+            return
+
+        if self.after_infix or not self.operands:
+            self.broken = element
+            return
+
+        priority = self.puller.priorities[element.value]
+        pending = self.pending
+
+        # Apply the pending infixes which bind tighter than this one.
+        # Left-handed infixes of the same priority are applied
+        # from left to right, and right-handed ones from right to left
+        while pending and (pending[-1][0] > priority
+                or pending[-1][0] == priority and priority % 2 == 1):
+            self.apply()
+
+        pending.append((priority, element.value))
+        self.after_infix = True
+
+    def apply(self):
+        """Apply the last pending infix to the last two operands"""
+
+        _, value = self.pending.pop()
+        self.operands -= 1
+
+        # Find type name for infix if provided
+        self.events.append((INFIX, sys.intern(self.puller.types.get(value, value))))
+
+    def finish(self):
+        """Apply all pending infixes"""
+
+        while self.pending:
+            self.apply()
+
+        self.operands -= 1
+
+    def close(self):
+        """Finish the section and give the events of closing it"""
+
+        self.resolve()
+
+        # An infix function requires both
+        # a right-hand and a left-hand side
+        if self.count < 3:
+            if self.second is not None:
+                self.event(self.second, TOKEN)
+
+        else:
+            if self.last is not None and self.last.type == 'INFIX':
+                raise UnmatchedInfix(f'{self.last} is missing a right-hand element',
+                                     self.last.span)
+
+            if self.broken is not None:
+                raise UnmatchedInfix(f'Infixes found beside each other', self.broken.span)
+
+            if self.operands:
+                self.finish()
+
+        # A delimiter at the end leaves an empty section after it
+        if self.delimited and self.separated and not self.puller.allow_empty_sections:
+            raise EmptySection('Empty sections are not allowed')
+
+        self.events.append((LEAVE, self.group))
+
+        if self.capsule is not None:
+            self.events.append((CALL, self.capsule))
+
+
+def build(events, parser=None):
+    """Build the tree of a stream of events, the same as from Parser.parse
+
+    Sections are held in memory as they are built,
+    so this is mostly of use to check a stream of events
+    or to build parts of one.
+    """
+
+    if parser is None:
+        from . import default_parser
+        parser = default_parser()
+
+    # Every open section along with the elements in it so far
+    stack = []
+
+    for kind, value in events:
+        if kind == ENTER:
+            stack.append((value, []))
+
+        elif kind == LEAVE:
+            group, elements = stack.pop()
+            element = Element(group, tuple(parser.delimiters.segment(elements)))
+
+            if not stack:
+                return element
+
+            stack[-1][1].append(element)
+
+        elif kind == TOKEN:
+            stack[-1][1].append(value)
+
+        elif kind == DELIMITER:
+            stack[-1][1].append(Element('DELIMITER', value))
+
+        elif kind == INFIX:
+            elements = stack[-1][1]
+            right = elements.pop()
+            elements[-1] = Spanned.between(value, (elements[-1], right), elements[-1], right)
+
+        elif kind == CALL:
+            elements = stack[-1][1]
+            section = elements.pop()
+            elements[-1] = parser.capsule(elements[-1], section)
+
+        else:
+            raise ValueError(f'Unknown event {kind!r}')
+
+    raise ValueError('Events end before the top level is left')
@@ -0,0 +1,121 @@
+from .delimiters import Segmenter
+from .exceptions import UnmatchedInfix
+from .infixes import Structurer
+
+
+class Reducer:
+    """Reduce the elements of a section in a single left-to-right pass
+
+    Capsules, infixes and delimiters are dealt with as the elements
+    are appended, instead of in three passes over the closed section.
+    The result is the same as from Parser.reduce.
+
+    If finished elements are emitted instead of segmented, closing
+    gives the elements which have not been emitted yet.
+    """
+
+    def __init__(self, parser, emit=None):
+        """Arguments:
+            parser -- Parser: Capsules, infixes, and delimiters to reduce with
+            emit -- callable: Called with every finished element instead
+                              of segmenting them by delimiters
+        """
+
+        self.parser = parser
+        self.capsules = parser.capsules
+
+        # Finished elements go from the infixes on to the delimiters
+        if emit is None:
+            self.segmenter = Segmenter(parser.delimiters)
+            emit = self.segmenter.add
+        else:
+            self.segmenter = None
+
+        self.structurer = Structurer(parser.infixes, emit)
+
+        # The first element appended, before anything is done to it
+        self.first = None
+
+        # The last element, which a following capsule may still form
+        # a function call with, before it is passed on to the infixes
+        self.pending = None
+
+        # Number of elements after forming capsules,
+        # along with the first two and the last of them
+        self.count = 0
+        self.head = []
+        self.last = None
+
+    def append(self, element):
+        """Append the next element of the section"""
+
+        pending = self.pending
+
+        if pending is None:
+            self.first = element
+            self.pending = element
+
+        # If the type of the element is a capsule,
+        # it is intended for a function call with the preceding element
+        elif element.type in self.capsules:
+            self.pending = self.parser.capsule(pending, element)
+
+        else:
+            self.commit(pending)
+            self.pending = element
+
+    def commit(self, element):
+        """Pass an element with any capsules formed on to the infixes"""
+
+        self.count += 1
+        if self.count <= 2:
+            self.head.append(element)
+        self.last = element
+
+        self.structurer.add(element)
+
+    def flush(self):
+        """Pass on the last element and finish structuring it,
+        without checking the edges of the section"""
+
+        if self.pending is not None:
+            self.commit(self.pending)
+            self.pending = None
+
+        self.structurer.close()
+
+    def close(self):
+        """Get the reduced elements of the section"""
+
+        if self.pending is not None:
+            self.commit(self.pending)
+            self.pending = None
+
+        # An infix function requires both
+        # a right-hand and a left-hand side
+        if self.count < 3:
+            if self.segmenter is None:
+                # Pass on the elements which have not been already
+                return self.head[self.structurer.finished:]
+            return self.parser.delimiters.segment(self.head)
+
+        # If an infix is found at any edge of the section,
+        # it can obviously not have non-infix elements on both sides
+        if self.head[0].type == 'INFIX':
+            raise UnmatchedInfix(f'{self.head[0]} is missing a left-hand element',
+                                 self.head[0].span)
+        if self.last.type == 'INFIX':
+            raise UnmatchedInfix(f'{self.last} is missing a right-hand element',
+                                 self.last.span)
+
+        # If any infixes are found beside each other,
+        # they can obviously not have non-infix elements on both sides
+        broken = self.structurer.broken
+        if broken is not None:
+            raise UnmatchedInfix(f'Infixes found beside each other', broken.span)
+
+        self.structurer.close()
+
+        if self.segmenter is None:
+            return []
+        return self.segmenter.close()
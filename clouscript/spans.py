@@ -0,0 +1,59 @@
+from array import array
+from bisect import bisect_right
+
+
+class Lines:
+    """Find the line and column of offsets in a string
+
+    The offsets of the line breaks are found the first time a line
+    is asked for, and each offset after that is bisected among them,
+    so spans can be kept as plain offsets and only turned into lines
+    and columns where they are shown. Lines and columns start at 1.
+    """
+
+    def __init__(self, string):
+        """Arguments:
+            string -- str: The source the offsets are in
+        """
+
+        self.string = string
+        self.breaks = None
+
+    def index(self):
+        """Find the offsets of all line breaks"""
+
+        string = self.string
+        find = string.find
+
+        breaks = array('q')
+        append = breaks.append
+
+        i = find('\n')
+        while i >= 0:
+            append(i)
+            i = find('\n', i + 1)
+
+        self.breaks = breaks
+
+    def location(self, offset):
+        """Get the line and column of an offset"""
+
+        if self.breaks is None:
+            self.index()
+
+        # Number of line breaks before the offset
+        line = bisect_right(self.breaks, offset - 1)
+        start = self.breaks[line - 1] + 1 if line else 0
+
+        return line + 1, offset - start + 1
+
+    def span(self, element):
+        """Get the lines and columns of the start and end of an element,
+        or None if it has no span"""
+
+        span = element.span
+
+        if span is None:
+            return None
+
+        return self.location(span[0]), self.location(span[1])
@@ -0,0 +1,261 @@
+import time
+from collections import Counter
+
+from .exceptions import ClouScriptException
+from .parser import Parser
+
+
+class Stats:
+    """Measurements taken while parsing a string
+
+    times -- dict: Seconds spent in each stage, summed over all sections
+          'lex' --> scanning the string and converting the tokens
+          'encapsulate', 'structure', 'segment' --> reducing the sections,
+                      if the pipeline of the parser reduces them in stages.
+                      The fused pipeline reduces them as it goes,
+                      which is only timed along with the rest of 'parse'
+          'parse' --> everything after lexing, the three stages included
+    tokens -- int: Number of tokens, spaces and comments included
+    elements -- int: Number of tokens which were converted into elements.
+                     A lazy parser does not convert the right-hand
+                     parentheses of the sections it defers
+    sections -- int: Number of parenthesized sections
+    depth -- int: Deepest nesting of parenthesized sections
+    kinds -- Counter: Number of tokens of each kind, as in Lexer.table
+    """
+
+    STAGES = ('lex', 'encapsulate', 'structure', 'segment', 'parse')
+
+    def __init__(self, callback=None):
+        """Arguments:
+            callback -- callable: Called with the name of a stage
+                                  and the seconds spent in it every time
+                                  a stage of a section has been timed
+        """
+
+        self.callback = callback
+
+        self.times = dict.fromkeys(self.STAGES, 0.0)
+        self.tokens = 0
+        self.elements = 0
+        self.sections = 0
+        self.depth = 0
+        self.kinds = Counter()
+
+        # The lexer the kinds of tokens are numbered by
+        self.lexer = None
+
+    def time(self, stage, elapsed):
+        """Add time spent in a stage"""
+
+        self.times[stage] += elapsed
+
+        if self.callback is not None:
+            self.callback(stage, elapsed)
+
+    def count(self, scanned):
+        """Count the kinds of scanned tokens as they pass through"""
+
+        kinds = self.kinds
+
+        for kind, match in scanned:
+            kinds[kind] += 1
+            yield kind, match
+
+    def rules(self):
+        """Get how many times each solid and spacious rule
+        of the lexer matched and how many times it missed
+
+        Returns a list of (group, index, regex, matches, misses),
+        where group is either 'solids' or 'spacious'
+
+        The rules of a group are tried in order at every position,
+        until one matches, so a rule has missed every time a rule after it
+        in the same group matched, or none of them did. The solid rules
+        are tried at every token, and the spacious rules at every token
+        which is not solid and not the spaces between spacious elements.
+        """
+
+        lexer = self.lexer
+        if lexer is None:
+            return []
+
+        # Count the tokens of each rule, which is not numbered
+        # the same as its kind if it is compiled on its own
+        counts = Counter()
+        for kind, count in self.kinds.items():
+            counts[lexer.rule_indices[kind]] += count
+
+        solids = len(lexer.solids)
+        spacious = len(lexer.spacious)
+
+        rows = []
+
+        for group, rules, first, after in (
+                ('solids', lexer.solids, 0, counts[None] + sum(
+                    counts[k] for k in range(solids, solids + spacious))),
+                ('spacious', lexer.spacious, solids, 0)):
+
+            # Go through the rules from the last one, adding up
+            # the matches of the rules after each one as its misses
+            misses = after
+            counted = []
+
+            for k in reversed(range(len(rules))):
+                matches = counts[first + k]
+                counted.append((group, k, rules[k][0], matches, misses))
+                misses += matches
+
+            rows.extend(reversed(counted))
+
+        return rows
+
+    def report(self):
+        """Get a table of the measurements as a string"""
+
+        lines = [f'{self.tokens} tokens, {self.elements} elements, '
+                 f'{self.sections} sections, {self.depth} deep']
+
+        for stage in self.STAGES:
+            lines.append(f'  {stage:>11}: {self.times[stage] * 1000:9.3f} ms')
+
+        for group, k, regex, matches, misses in self.rules():
+            lines.append(f'  {group:>8} {k:2}: {matches:8} matched {misses:8} missed  {regex}')
+
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'<Stats: {self.tokens} tokens, {self.sections} sections>'
+
+
+class ProfilingParser(Parser):
+    """A parser which measures itself into a Stats object
+
+    It parses the same way as the parser it is made from, with the same
+    grammar, pipeline and laziness. Parsers which are not profiling
+    are left as they are, so profiling costs nothing when it is not used.
+    """
+
+    def __init__(self, stats, parser):
+        """Arguments:
+            stats -- Stats: Where the measurements are added
+            parser -- Parser: The parser to parse the same way as
+        """
+
+        super().__init__(grammar=parser.grammar, pipeline=parser.pipeline, lazy=parser.lazy)
+        self.stats = stats
+
+    def parenthesis(self, stack, history, e):
+        super().parenthesis(stack, history, e)
+
+        # The stack holds the section outside of the top level,
+        # and the top level, before any parenthesized sections
+        depth = len(stack) - 2
+
+        if e.value in self.parentheses.left and depth > 0:
+            self.stats.sections += 1
+            self.stats.depth = max(self.stats.depth, depth)
+
+    def pair(self, stream):
+        pairs = super().pair(stream)
+
+        # The sections of a lazy parser are counted before they are parsed,
+        # since they are only parsed once they are read
+        if pairs is not None:
+            self.stats.sections += len(pairs)
+
+            # Where the sections around the one being counted end
+            ends = []
+
+            for start in sorted(pairs):
+                while ends and ends[-1] < start:
+                    ends.pop()
+
+                ends.append(pairs[start])
+                self.stats.depth = max(self.stats.depth, len(ends))
+
+        return pairs
+
+    def reduce(self, elements):
+        elements = self.stage('encapsulate', self.encapsulate, elements)
+        elements = self.stage('structure', self.infixes.structure, elements)
+        return self.stage('segment', self.delimiters.segment, elements)
+
+    def stage(self, name, function, elements):
+        """Run a stage on the elements of a section and time it"""
+
+        start = time.perf_counter()
+        elements = function(elements)
+        self.stats.time(name, time.perf_counter() - start)
+
+        return elements
+
+
+def profile(string, lexer, parser, callback=None):
+    """Parse a string like loads, and measure every stage of it
+
+    Returns the tree along with the Stats object
+
+    A lazy parser only parses the sections once they are read,
+    so the times of their stages and the elements converted for them
+    keep being added to the Stats object as they are read.
+    """
+
+    if type(parser) is not Parser:
+        raise ValueError(f'Can not profile a parser of type {type(parser).__name__}, '
+                         f'since it is parsed with a ProfilingParser in its place')
+
+    stats = Stats(callback)
+    stats.lexer = lexer
+
+    profiler = ProfilingParser(stats, parser)
+    clock = time.perf_counter
+
+    try:
+        if parser.lazy:
+            start = clock()
+            stream = lexer.tokens(string)
+            stats.time('lex', clock() - start)
+
+            stats.kinds.update(stream.kinds)
+            stats.tokens = len(stream)
+
+            # Count the elements as they are converted
+            element = stream.element
+
+            def counted(i):
+                converted = element(i)
+                if converted is not None:
+                    stats.elements += 1
+                return converted
+
+            stream.element = counted
+
+            start = clock()
+            tree = profiler.parse_tokens(stream)
+            stats.time('parse', clock() - start)
+
+            return tree, stats
+
+        start = clock()
+        scanned = stats.count(lexer.scan(string))
+        if lexer.spans:
+            elements = list(lexer.spanned(scanned))
+        else:
+            elements = list(lexer.elements(scanned))
+        stats.time('lex', clock() - start)
+
+        stats.tokens = sum(stats.kinds.values())
+        stats.elements = len(elements)
+
+        start = clock()
+        tree = profiler.parse(elements, (0, len(string)) if lexer.spans else None)
+        stats.time('parse', clock() - start)
+
+    except ClouScriptException as exception:
+        # Like in loads
+        if exception.source is None:
+            exception.source = string
+        raise
+
+    return tree, stats
@@ -0,0 +1,162 @@
+from array import array
+
+from .element import Element, Spanned, Located
+
+
+class TokenStream:
+    """The tokens of a string as parallel arrays of kinds and offsets
+
+    kinds -- array: Kind of each token, as numbered in Lexer.table,
+                    with the solid rules first and then the spacious rules.
+                    Lexer.rule_indices gives the rule of each kind, and
+                    the last kind, Lexer.spaces, is the spaces between
+                    two spacious elements
+    starts -- array: Offset in the string where each token starts
+    ends -- array: Offset in the string where each token ends
+
+    Nothing is taken out of the string or converted until asked for,
+    at which point the rule of the token is matched again at its offset.
+    """
+
+    def __init__(self, lexer, string):
+        self.lexer = lexer
+        self.string = string
+
+        self.kinds = array('H')
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def text(self, i):
+        """Get the text of a token"""
+        return self.string[self.starts[i]:self.ends[i]]
+
+    def rule(self, i):
+        """Get the (regex, process) rule which matched a token,
+        or None for spaces between spacious elements"""
+
+        lexer = self.lexer
+        k = lexer.rule_indices[self.kinds[i]]
+
+        if k is None:
+            return None
+
+        solids = len(lexer.solids)
+        return lexer.solids[k] if k < solids else lexer.spacious[k - solids]
+
+    def convert(self, i):
+        """Get the type and value of a token"""
+
+        kind = self.kinds[i]
+        match = self.lexer.rematch(self.string, kind, self.starts[i])
+
+        return self.lexer.convert(kind, match)
+
+    def type(self, i):
+        """Get the type of a token, which is None for comments and spaces"""
+        return self.convert(i)[0]
+
+    def value(self, i):
+        """Get the value of a token"""
+        return self.convert(i)[1]
+
+    def element(self, i):
+        """Get a token as an element, or None for comments and spaces"""
+
+        type_, value = self.convert(i)
+
+        if type_ is None:
+            return None
+
+        if self.lexer.spans:
+            return Spanned(type_, value, self.starts[i], self.ends[i])
+
+        return Element(type_, value)
+
+    def elements(self):
+        """Get the elements of all tokens, as from Lexer.lex"""
+
+        for i in range(len(self)):
+            element = self.element(i)
+
+            if element is not None:
+                yield element
+
+
+class Offsets:
+    """The offsets of the Located elements of a string, kept in arrays
+    in the order the elements were made, like those of a TokenStream
+
+    ids -- array: Identity of every element lexed, spaces and comments left out
+    starts -- array: Offset in the string where each of them starts
+    ends -- array: Offset in the string where each of them ends
+    joins -- array: For every element formed out of others, such as a section
+                    out of its parentheses, its identity, the identities of the
+                    elements it spans from and to, and the number of elements
+                    lexed before it was formed, four to an element
+
+    The elements are not kept alive by this, and only point at it,
+    so their spans cost a slot and the arrays while parsing. Their
+    offsets are only worked out the first time a span is asked for,
+    and then for every element made so far at once.
+    """
+
+    def __init__(self):
+        self.ids = array('Q')
+        self.starts = array('I')
+        self.ends = array('I')
+        self.joins = array('Q')
+
+        # The offsets of each element by its identity,
+        # and how many elements lexed and formed are in there yet
+        self.spans = {}
+        self.lexed = 0
+        self.formed = 0
+
+        self.extend = self.joins.extend
+
+    def join(self, type_, value, first, last):
+        """Make a Located element spanning from one Located element to another"""
+
+        element = Located(type_, value, self)
+        self.extend((id(element), id(first), id(last), len(self.ids)))
+
+        return element
+
+    def span(self, element):
+        """Get the start and end of a Located element"""
+
+        if self.lexed < len(self.ids) or self.formed < len(self.joins):
+            self.index()
+
+        return self.spans[id(element)]
+
+    def index(self):
+        """Work out the offsets of the elements made since the last time
+
+        An element which is let go of may leave its identity to one made
+        after it, so they are gone through in the order they were made,
+        and an element formed out of others takes the offsets of the latest
+        elements of their identities, which are the ones still alive.
+        """
+
+        spans = self.spans
+        ids, starts, ends, joins = self.ids, self.starts, self.ends, self.joins
+        i = self.lexed
+
+        for k in range(self.formed, len(joins), 4):
+            at = joins[k + 3]
+
+            for i in range(i, at):
+                spans[ids[i]] = starts[i], ends[i]
+            i = at
+
+            spans[joins[k]] = spans[joins[k + 1]][0], spans[joins[k + 2]][1]
+
+        for i in range(i, len(ids)):
+            spans[ids[i]] = starts[i], ends[i]
+
+        self.lexed = len(ids)
+        self.formed = len(joins)
@@ -0,0 +1,101 @@
+from .compiler import Compiler, ATOM
+
+
+class VectorCompiler(Compiler):
+    """Compile trees into functions which evaluate them over whole columns
+
+    Labels are bound to NumPy arrays, one value for every row, and every
+    infix is applied to all rows at once. Scalars may be given along
+    with the columns, and are the same for every row. The logical infixes
+    are applied element by element, so both of their operands are always
+    evaluated. Infixes which can not be applied to whole arrays, such as
+    'in' and 'is', can not be compiled.
+
+    NumPy has to be installed to use this compiler.
+    """
+
+    # Arithmetic and comparisons work the same on arrays
+    OPERATORS = {
+        type_: operator
+        for type_, operator in Compiler.OPERATORS.items()
+        if type_ not in ('or', 'and', 'in', 'not in', 'is', 'is not')
+    }
+
+    REVERSED = {}
+
+    # Names of the NumPy functions for the logical infixes
+    LOGICAL = {
+        'and': '_and',
+        'or': '_or',
+    }
+
+    def __init__(self, functions=None, maxsize=256):
+        import numpy
+
+        super().__init__(functions, maxsize)
+        self.numpy = numpy
+
+    def names(self):
+        names = super().names()
+        names['_and'] = self.numpy.logical_and
+        names['_or'] = self.numpy.logical_or
+        return names
+
+    def expression(self, element):
+        if element.type in self.LOGICAL:
+            left, right = element.value
+            return f'{self.LOGICAL[element.type]}({self.expression(left)[0]}, ' \
+                   f'{self.expression(right)[0]})', ATOM
+
+        return super().expression(element)
+
+    def evaluate(self, tree, columns=None, chunk_size=None):
+        """Evaluate a tree over columns of rows
+
+        Arguments:
+            columns -- dict: Arrays of a value for every row, and scalars
+            chunk_size -- int: Number of rows to evaluate at a time,
+                               which limits the memory taken by the arrays
+                               in between. All rows at once if None
+
+        If any of the columns are arrays, the result has a value for every
+        row, even if it does not depend on any of them
+        """
+
+        if columns is None:
+            columns = {}
+
+        function = self.compile(tree)
+
+        numpy = self.numpy
+        arrays = [name for name, value in columns.items()
+                  if isinstance(value, numpy.ndarray) and value.ndim]
+
+        rows = len(columns[arrays[0]]) if arrays else 0
+        if any(len(columns[name]) != rows for name in arrays):
+            raise ValueError('Columns do not have the same number of rows')
+
+        if chunk_size is None or rows <= chunk_size:
+            # Variables set by the tree are left out of the columns given
+            result = function(dict(columns))
+
+            # The result may not depend on any of the columns
+            if arrays and numpy.shape(result) != (rows,):
+                result = numpy.broadcast_to(result, (rows,)).copy()
+
+            return result
+
+        results = []
+
+        for start in range(0, rows, chunk_size):
+            end = min(start + chunk_size, rows)
+
+            # Variables set by the tree are only kept for the chunk
+            chunk = dict(columns)
+            for name in arrays:
+                chunk[name] = columns[name][start:end]
+
+            # The result may not depend on any of the columns
+            results.append(numpy.broadcast_to(function(chunk), (end - start,)))
+
+        return numpy.concatenate(results)
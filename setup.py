@@ -8,6 +8,7 @@ setup(
     author_email='maximillian.strand@gmail.com',
     packages=['clouscript'],
     install_requires=[],
+    extras_require={'numpy': ['numpy'], 'pretty': ['rich']},
     version='0.1',
     license='GPLv3',
     description='A basic and easy-to-use programming language parsing library',
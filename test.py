@@ -1,5 +1,3 @@
-from rich import print
-
 import clouscript
 
 
@@ -11,4 +9,4 @@ hearts(-1)
 print(f'{text}\n')
 
 elements = clouscript.loads(text)
-print(elements.asstring())
\ No newline at end of file
+clouscript.pprint(elements)
@@ -0,0 +1,92 @@
+"""Sources generated at random to parse in every way and compare,
+and the outcome of parsing one to compare them by"""
+
+import random
+
+
+ATOMS = ['a', 'foo', 'x_1', '12', '-3', '0.5', '-.25', '0xff', '"str"', '"es\\"c"',
+         'true', 'false', 'null']
+INFIXES = ['=', 'or', 'and', 'in', 'is', '==', '!=', '<=', '<', '>=', '>',
+           '+', '-', '*', '/', '%', '^', '.']
+DELIMITERS = [',', ';']
+PARENTHESES = ['()', '[]', '{}']
+SPACES = ['\n', ' // c\n', ' /* c */ ']
+
+
+def anything(rnd, depth=0, length=None):
+    """Get any sequence of tokens, which is often not well formed"""
+
+    tokens = []
+
+    for _ in range(rnd.randint(0, 8) if length is None else length):
+        r = rnd.random()
+        if r < 0.35:
+            tokens.append(rnd.choice(ATOMS))
+        elif r < 0.6:
+            tokens.append(rnd.choice(INFIXES))
+        elif r < 0.75:
+            tokens.append(rnd.choice(DELIMITERS))
+        elif r < 0.95 and depth < 4:
+            left, right = rnd.choice(PARENTHESES)
+            tokens.append(left + anything(rnd, depth + 1) + right)
+        else:
+            tokens.append(rnd.choice(SPACES))
+
+    return ' '.join(tokens)
+
+
+def expression(rnd, depth=0):
+    """Get a well formed expression"""
+
+    r = rnd.random()
+
+    if r < 0.4 or depth > 3:
+        return rnd.choice(ATOMS[:9])
+
+    if r < 0.7:
+        return f'{expression(rnd, depth + 1)} {rnd.choice(INFIXES[1:])} {expression(rnd, depth + 1)}'
+
+    if r < 0.85:
+        arguments = ', '.join(expression(rnd, depth + 1) for _ in range(rnd.randint(0, 3)))
+        return f'{rnd.choice("fg")}({arguments})'
+
+    left, right = rnd.choice(PARENTHESES)
+    separator = rnd.choice([', ', '; ', ' '])
+    return left + separator.join(expression(rnd, depth + 1) for _ in range(rnd.randint(0, 4))) + right
+
+
+def statements(rnd):
+    """Get a few assignments on lines of their own"""
+    return '\n'.join(f'{rnd.choice("xy")} = {expression(rnd)}' for _ in range(rnd.randint(1, 5)))
+
+
+def sources(count, seed=0):
+    """Get a number of sources, half well formed and half not,
+    with a character replaced in some of them"""
+
+    rnd = random.Random(seed)
+    generated = []
+
+    for k in range(count):
+        source = anything(rnd, length=rnd.randint(0, 10)) if k % 2 else statements(rnd)
+
+        # Break the parentheses of some
+        if k % 7 == 3 and source:
+            i = rnd.randrange(len(source))
+            source = source[:i] + rnd.choice('()[]{} ') + source[i + 1:]
+
+        generated.append(source)
+
+    return generated
+
+
+def outcome(function, *arguments, **keywords):
+    """Get the tree a function returns, or the type and message
+    of the error it raises, without the line and column"""
+
+    from clouscript.exceptions import ClouScriptException
+
+    try:
+        return function(*arguments, **keywords)
+    except ClouScriptException as error:
+        return type(error), error.args[0]
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+import clouscript
+from clouscript.exceptions import NoMatch
+
+from .corpus import sources, outcome
+
+
+class Counting(ThreadPoolExecutor):
+    """A pool of threads which counts the most calls it runs at once"""
+
+    def __init__(self, workers):
+        super().__init__(workers)
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most = 0
+
+    def submit(self, function, *arguments, **keywords):
+        def counted():
+            with self.lock:
+                self.running += 1
+                self.most = max(self.most, self.running)
+            try:
+                # Long enough for the others to be handed over meanwhile
+                time.sleep(0.01)
+                return function(*arguments, **keywords)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        return super().submit(counted)
+
+
+def test_max_in_flight_is_shared():
+    executor = Counting(16)
+
+    async def main():
+        return await asyncio.gather(*(
+            clouscript.aloads('a + 1', executor=executor, max_in_flight=3)
+            for _ in range(20)
+        ))
+
+    try:
+        trees = asyncio.run(main())
+    finally:
+        executor.shutdown()
+
+    assert all(tree == clouscript.loads('a + 1') for tree in trees)
+    assert 1 < executor.most <= 3
+
+
+def test_aiterload():
+    source = 'a\nb + 1\nf(c)'
+
+    async def main():
+        fp = io.StringIO(source)
+        return [e async for e in clouscript.aiterload(fp, max_in_flight=2)]
+
+    assert asyncio.run(main()) == list(clouscript.loads(source).value)
+
+
+class Reads(io.StringIO):
+    """A file which counts how much of it has been read"""
+
+    def __init__(self, string):
+        super().__init__(string)
+        self.taken = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.taken += len(chunk)
+        return chunk
+
+
+def aiterload(source, executor, count=None, **keywords):
+    """Get the top-level elements of a source from aiterload,
+    or only the first of them, along with how much of it was read"""
+
+    async def main():
+        fp = Reads(source)
+        elements = []
+
+        async for element in clouscript.aiterload(fp, executor=executor, **keywords):
+            elements.append(element)
+            if len(elements) == count:
+                break
+
+        return elements, fp.taken
+
+    return asyncio.run(main())
+
+
+@pytest.fixture(scope='module')
+def processes():
+    with ProcessPoolExecutor(2) as executor:
+        yield executor
+
+
+def test_aiterload_processes(processes):
+    generated = sources(200, seed=5)
+
+    for k in range(0, len(generated), 20):
+        source = '\n'.join(generated[k:k + 20])
+
+        expected = outcome(lambda: list(clouscript.iterload(io.StringIO(source))))
+        result = outcome(lambda: aiterload(source, processes, chunk_size=16, max_in_flight=3)[0])
+        assert result == expected
+
+
+def test_aiterload_processes_streams(processes):
+    # Only the parts in flight are read ahead of the first element
+    source = '\n'.join(f'x{k} = f({k})' for k in range(20000))
+
+    elements, taken = aiterload(source, processes, 1, chunk_size=1024, max_in_flight=2)
+    assert elements == [clouscript.loads(source).value[0]]
+    assert taken < len(source) // 10
+
+
+def test_aiterload_processes_error(processes):
+    # Errors have the positions in the whole file, as from iterload
+    source = '\n'.join(f'x{k} = f({k})' for k in range(500)) + '\n$'
+
+    with pytest.raises(NoMatch) as expected:
+        list(clouscript.iterload(io.StringIO(source), chunk_size=64))
+
+    with pytest.raises(NoMatch) as raised:
+        aiterload(source, processes, chunk_size=64)
+
+    assert raised.value.span == expected.value.span
+
+
+def test_aloads_processes_error(processes):
+    # Errors know the string, as from loads
+    async def main():
+        return await clouscript.aloads('a\n$', executor=processes)
+
+    with pytest.raises(NoMatch) as raised:
+        asyncio.run(main())
+
+    assert raised.value.source == 'a\n$'
+    assert raised.value.location() is not None
@@ -0,0 +1,43 @@
+import io
+
+import pytest
+
+import clouscript
+from clouscript.exceptions import UnmatchedInfix
+from clouscript.grammar import Grammar
+from clouscript.lexer import Lexer
+from clouscript.parser import Parser
+
+from .corpus import sources, outcome
+
+
+GRAMMAR = Grammar(arrays=2)
+
+
+def test_floats_without_integer_part():
+    # Lexed as the default lexer does, not into an array
+    with pytest.raises(UnmatchedInfix):
+        clouscript.loads('[.5, .5, .5, .5]', Lexer(grammar=GRAMMAR), Parser(grammar=GRAMMAR))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 5, 4096])
+def test_arrays_across_lines(chunk_size):
+    lexer, parser = Lexer(grammar=GRAMMAR), Parser(grammar=GRAMMAR)
+    source = 'a = [1.5,\n -2.25,\n 3.0]\nb = [1, 2,\n 3]\nc = [-.5, 1.0]'
+
+    tree = clouscript.loads(source, lexer, parser)
+    assert [e.value[1].type for e in tree.value] == ['ARRAY', 'ARRAY', 'ARRAY']
+
+    assert clouscript.load(io.StringIO(source), lexer, parser, chunk_size=chunk_size) == tree
+
+
+def test_same_errors_as_without_arrays():
+    lexer, parser = Lexer(grammar=GRAMMAR), Parser(grammar=GRAMMAR)
+
+    for source in sources(400, seed=2):
+        tree = outcome(clouscript.loads, source, lexer, parser)
+        expected = outcome(clouscript.loads, source)
+
+        # Arrays are not the same as the square sections they are lexed from
+        if isinstance(expected, tuple):
+            assert tree == expected
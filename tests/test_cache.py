@@ -0,0 +1,132 @@
+import os
+import random
+
+import pytest
+
+import clouscript
+from clouscript.cache import ParseCache
+from clouscript.delimiters import Delimiters
+from clouscript.element import Element
+from clouscript.grammar import default_grammar
+from clouscript.lexer import Lexer
+from clouscript.parser import Parser
+
+from .corpus import statements
+
+
+def scaled(scale):
+    """Get a lexer whose integers are multiplied by a captured scale"""
+    rule = (r'\-?\d+', lambda g: ('INTEGER', int(g[0]) * scale))
+    return Lexer(spacious=[rule] + default_grammar().spacious)
+
+
+def test_hits_and_misses():
+    cache = ParseCache()
+
+    rnd = random.Random(4)
+
+    for source in {statements(rnd) for _ in range(25)}:
+        tree = clouscript.loads(source, cache=cache)
+        assert clouscript.loads(source, cache=cache) is tree
+        assert tree == clouscript.loads(source)
+
+    stats = cache.stats()
+    assert stats['hits'] == stats['misses'] == stats['size'] > 20
+
+
+def test_eviction():
+    cache = ParseCache(maxsize=2)
+
+    first = clouscript.loads('a', cache=cache)
+    clouscript.loads('b', cache=cache)
+    clouscript.loads('c', cache=cache)
+
+    assert cache.stats()['evictions'] == 1
+    assert clouscript.loads('a', cache=cache) is not first
+
+
+def test_configurations_apart():
+    cache = ParseCache()
+    local = Parser(delimiters=Delimiters(';,', 'local'))
+
+    assert clouscript.loads('a b, c', cache=cache) \
+        != clouscript.loads('a b, c', parser=local, cache=cache)
+    assert cache.stats()['misses'] == 2
+
+
+def test_closures_apart():
+    # Processes with the same code but other captured values
+    cache = ParseCache()
+
+    assert clouscript.loads('5', scaled(1), cache=cache).value[0] == Element('INTEGER', 5)
+    assert clouscript.loads('5', scaled(1000), cache=cache).value[0] == Element('INTEGER', 5000)
+    assert cache.stats()['hits'] == 0
+
+    assert scaled(2).fingerprint() == scaled(2).fingerprint()
+
+
+SCALE = 1
+
+
+def test_globals_apart():
+    global SCALE
+
+    rule = (r'\-?\d+', lambda g: ('INTEGER', int(g[0]) * SCALE))
+    lexer = Lexer(spacious=[rule] + default_grammar().spacious)
+
+    first = lexer.fingerprint()
+    SCALE = 1000
+    try:
+        assert lexer.fingerprint() != first
+    finally:
+        SCALE = 1
+
+
+def test_key_required():
+    # A process bound to an object can not be told apart from others
+    class Scale:
+        def __init__(self, scale):
+            self.scale = scale
+
+        def process(self, g):
+            return 'INTEGER', int(g[0]) * self.scale
+
+    lexer = Lexer(spacious=[(r'\-?\d+', Scale(3).process)] + default_grammar().spacious)
+    cache = ParseCache()
+
+    assert lexer.fingerprint() is None
+
+    with pytest.raises(ValueError):
+        clouscript.loads('5', lexer, cache=cache)
+
+    tree = clouscript.loads('5', lexer, cache=cache, cache_key='scale 3')
+    assert tree.value[0] == Element('INTEGER', 15)
+    assert clouscript.loads('5', lexer, cache=cache, cache_key='scale 3') is tree
+
+
+def test_disk(tmp_path):
+    source = 'a = f(1, "s", [true, null]) {x; y}'
+    expected = clouscript.loads(source)
+
+    clouscript.loads(source, cache=ParseCache(directory=tmp_path))
+
+    cache = ParseCache(directory=tmp_path)
+    assert clouscript.loads(source, cache=cache) == expected
+    assert cache.stats()['disk_hits'] == 1
+
+    # Files which can not be read are removed and written again
+    for name in os.listdir(tmp_path):
+        with open(tmp_path / name, 'r+b') as file:
+            file.truncate(20)
+
+    cache = ParseCache(directory=tmp_path)
+    assert clouscript.loads(source, cache=cache) == expected
+    assert cache.stats()['disk_hits'] == 0
+    assert cache.stats()['disk_writes'] == 1
+
+
+def test_disk_closures_apart(tmp_path):
+    clouscript.loads('5', scaled(1), cache=ParseCache(directory=tmp_path))
+
+    tree = clouscript.loads('5', scaled(1000), cache=ParseCache(directory=tmp_path))
+    assert tree.value[0] == Element('INTEGER', 5000)
@@ -0,0 +1,150 @@
+import operator
+import random
+import threading
+
+import pytest
+
+import clouscript
+from clouscript.compiler import Compiler
+from clouscript.exceptions import CompilingError
+
+
+# What the infixes of arithmetic do, to evaluate trees by walking them
+ARITHMETIC = {
+    'ADD': operator.add,
+    'SUB': operator.sub,
+    'MUL': operator.mul,
+    'DIV': operator.truediv,
+    'MOD': operator.mod,
+    'POW': operator.pow,
+}
+
+
+def arithmetic(rnd, depth=0, after_infix=False):
+    """Get a random expression of small integers"""
+
+    if depth > 3 or rnd.random() < 0.3:
+        return str(rnd.randint(1, 4))
+
+    # Round parentheses right after an infix would call it
+    if not after_infix and rnd.random() < 0.3:
+        left = f'({arithmetic(rnd, depth + 1)})'
+    else:
+        left = arithmetic(rnd, depth + 1, after_infix)
+
+    infix = rnd.choice(['+', '-', '*', '/', '%', '^'])
+
+    return f'{left} {infix} {arithmetic(rnd, depth + 1, True)}'
+
+
+def walk(element):
+    """Evaluate an arithmetic tree by walking it"""
+
+    if element.type == 'INTEGER':
+        return element.value
+
+    if element.type in ('ROUND', ''):
+        return walk(element.value[0])
+
+    left, right = element.value
+    return ARITHMETIC[element.type](walk(left), walk(right))
+
+
+def result(function, *arguments):
+    """Get what a function gives, or the type of the error it raises"""
+
+    try:
+        return function(*arguments)
+    except (ArithmeticError, ValueError) as error:
+        return type(error)
+
+
+def test_like_the_tree():
+    # The Python expression binds the same way as the tree
+    rnd = random.Random(0)
+    compiler = Compiler()
+
+    for _ in range(500):
+        tree = clouscript.loads(arithmetic(rnd))
+        assert result(compiler.evaluate, tree) == result(walk, tree)
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('x * 2 + 1', 7),
+    ('y = x + 1; y * y', 16),
+    ('{y = 1; y + x}', 4),
+    ('d.k', 7),
+    ('d.k = 5; d.k', 5),
+    ('f(1, x, 3)', 7),
+    ('[1, 2, x]', [1, 2, 3]),
+    ('(1, x)', (1, 3)),
+    ('(x)', 3),
+    ('l has 2', True),
+    ('x < 3 or x == 3.0', True),
+    ('"a\\"b"', 'a"b'),
+    ('null', None),
+    ('', None),
+])
+def test_evaluate(source, expected):
+    compiler = Compiler({'f': lambda *arguments: sum(arguments)})
+    variables = {'x': 3, 'd': {'k': 7}, 'l': [2]}
+
+    assert compiler.evaluate(clouscript.loads(source), variables) == expected
+
+
+def test_functions_changed_afterward():
+    compiler = Compiler({'f': abs})
+    function = compiler.compile(clouscript.loads('f(-2)'))
+
+    compiler.functions['f'] = str
+    assert function({}) == '-2'
+
+
+def test_kept():
+    compiler = Compiler(maxsize=2)
+    trees = [clouscript.loads(f'{k} + 1') for k in range(3)]
+
+    function = compiler.compile(trees[0])
+    assert compiler.compile(trees[0]) is function
+
+    # The least recently used is let go of
+    compiler.compile(trees[1])
+    compiler.compile(trees[2])
+    assert compiler.compile(trees[0]) is not function
+
+
+def test_long_and_deep():
+    # Long chains compile, and trees nested too deeply raise CompilingError
+    compiler = Compiler()
+    assert compiler.evaluate(clouscript.loads(' + '.join(['1'] * 2000))) == 2000
+
+    with pytest.raises(CompilingError):
+        compiler.compile(clouscript.loads('(' * 5000 + '1' + ')' * 5000))
+
+
+def test_not_compiled():
+    with pytest.raises(CompilingError):
+        Compiler().compile(clouscript.loads('1 = 2'))
+
+
+def test_threads():
+    # Threads sharing a compiler get the right function for every tree
+    compiler = Compiler(maxsize=8)
+    trees = [clouscript.loads(f'x + {k}') for k in range(32)]
+    errors = []
+
+    def evaluate():
+        try:
+            for _ in range(20):
+                for k, tree in enumerate(trees):
+                    assert compiler.evaluate(tree, {'x': 1}) == k + 1
+        except AssertionError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=evaluate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
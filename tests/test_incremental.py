@@ -0,0 +1,212 @@
+import random
+
+import pytest
+
+import clouscript
+from clouscript.delimiters import Delimiters
+from clouscript.exceptions import ClouScriptException, EmptySection, MismatchedParentheses, \
+    UnmatchedInfix
+from clouscript.incremental import Document
+from clouscript.parser import Parser
+
+from .corpus import sources, outcome
+
+
+SOURCES = sources(1000, seed=1)
+
+# Inserted at random, to open and close parentheses, strings and comments
+INSERTS = ['', '\n', '+', ' ', ')', '(', '"', ';', 'x', '1', '\n+ a', ' f(2)\n',
+           '{', '}', '//', '/*', '*/']
+
+PARSERS = [
+    None,
+    Parser(delimiters=Delimiters(';,', 'local')),
+    Parser(delimiters=Delimiters(';,', 'global', True)),
+    Parser(delimiters=Delimiters(';,:', 'none')),
+]
+
+
+def nest(rnd, parts):
+    """Join sources, with some inside of large sections"""
+
+    nested = []
+
+    for part in parts:
+        r = rnd.random()
+        if r < 0.3:
+            nested.append(f'cfg {{\n{part}\n}}')
+        elif r < 0.45:
+            nested.append(f'f(\n{part}\n, [\n{part}\n])')
+        elif r < 0.55:
+            nested.append(f'(\n{part}\n{{\n{part}\n}}\n)')
+        else:
+            nested.append(part)
+
+    return '\n'.join(nested)
+
+
+def delimited(rnd):
+    """Get lines ending in delimiters, inside of a large section or not"""
+
+    atoms = ['a', 'b = 1', 'c + 2', 'f(x)', '(1, 2)', 'x y', '']
+    lines = []
+
+    for _ in range(rnd.randint(1, 30)):
+        line = rnd.choice(atoms)
+        for _ in range(rnd.randint(0, 2)):
+            line += rnd.choice([', ', ' : ', ' ']) + rnd.choice(atoms)
+        lines.append(line + rnd.choice([';', ';', ',', '']))
+
+    return rnd.choice(['cfg {\n%s\n}\nz', '%s', 'a = [\n%s\n]', 'f(\n%s\n)']) % '\n'.join(lines)
+
+
+def expected(text, parser=None):
+    """Get the outcome of loads, or the error of Parser.nest
+    if the parentheses go deeper than the top level or stay open"""
+
+    if parser is None:
+        parser = clouscript.default_parser()
+
+    try:
+        elements = list(clouscript.default_lexer().lex(text))
+    except ClouScriptException:
+        return outcome(clouscript.loads, text, parser=parser)
+
+    parentheses = parser.parentheses
+    depth = 0
+
+    for element in elements:
+        if element.type in parentheses.groups:
+            depth += 1 if element.value in parentheses.left else -1
+            if depth < 0:
+                break
+
+    if depth == 0:
+        return outcome(clouscript.loads, text, parser=parser)
+
+    return outcome(parser.nest, elements)
+
+
+def check(rnd, document, inserts, edits, parser=None):
+    """Edit a document at random, and compare its tree with that of loads"""
+
+    assert outcome(lambda: document.tree) == expected(document.text, parser)
+
+    for _ in range(edits):
+        length = len(document.text)
+        offset = rnd.randint(0, length)
+        removed = rnd.randint(0, min(5, length - offset))
+        inserted = rnd.choice(inserts)
+
+        text = document.text[:offset] + inserted + document.text[offset + removed:]
+        # The edit raises the same error as loads, and is kept either way
+        result = expected(text, parser)
+        assert outcome(document.edit, offset, removed, inserted) in (None, result)
+
+        assert document.text == text
+        assert outcome(lambda: document.tree) == result
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_edits(seed):
+    rnd = random.Random(seed)
+    inserts = INSERTS + [source[:12] for source in SOURCES[:50]]
+
+    for _ in range(15):
+        text = nest(rnd, rnd.sample(SOURCES, 8))
+
+        document = Document(text, chunk_size=rnd.choice([1, 8, 64]),
+                            section_size=rnd.choice([1, 10, 40, 10 ** 9]))
+        check(rnd, document, inserts, 20)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_delimited_edits(seed):
+    rnd = random.Random(seed)
+    inserts = ['', ';', ';', ',', ':', ' x', '\n', 'q;\n', ', 1', '\nr = 2;', '+']
+
+    for _ in range(15):
+        parser = rnd.choice(PARSERS)
+
+        document = Document(delimited(rnd), parser=parser, chunk_size=rnd.choice([1, 8, 64]),
+                            section_size=rnd.choice([1, 10, 40]))
+        check(rnd, document, inserts, 30, parser)
+
+
+def test_error_on_open():
+    # The document is opened with the error kept, and fixed by editing it
+    document = Document('a ; ; b')
+    assert isinstance(document.error, EmptySection)
+
+    document.edit(4, 2, '')
+    assert document.tree == clouscript.loads('a ; b')
+
+    document = Document('"abc')
+    assert document.error is not None
+
+    document.edit(4, 0, '"')
+    assert document.tree == clouscript.loads('"abc"')
+
+
+def test_innermost_section():
+    # An edit in a large section inside of another is parsed again on its own
+    inner = ';\n'.join(f'x{k} = {k}' for k in range(200))
+    text = f'a = {{\n  b = [\n{inner}\n  ]\n}}'
+
+    document = Document(text, chunk_size=16, section_size=64)
+
+    offset = text.index('x100')
+    document.edit(offset, 4, 'y + 1')
+    text = text[:offset] + 'y + 1' + text[offset + 4:]
+    assert document.tree == clouscript.loads(text)
+
+    with pytest.raises(UnmatchedInfix):
+        document.edit(offset, 0, '+ + ')
+    assert isinstance(document.error, UnmatchedInfix)
+
+
+def test_unbalanced_edit():
+    # Only the chunk left open is parsed again, and the ones after it are kept
+    text = '\n'.join(f'x{k} = f({k})' for k in range(500))
+    document = Document(text, chunk_size=16)
+
+    after = document.top.chunks[10:]
+    offset = text.index('x5 ')
+
+    with pytest.raises(MismatchedParentheses):
+        document.edit(offset, 0, 'g(')
+    assert all(a is b for a, b in zip(after, document.top.chunks[-len(after):]))
+
+    document.edit(offset + 2, 0, ')')
+    assert document.tree == clouscript.loads(text[:offset] + 'g()' + text[offset:])
+
+
+def test_inner_mismatch():
+    # A parenthesis of another group only fails the section it is in
+    inner = ';\n'.join(f'x{k} = {k}' for k in range(200))
+    text = f'a = {{\n{inner}\n}}\nb = [\n{inner}\n]'
+
+    document = Document(text, chunk_size=16, section_size=64)
+    offset = text.index('x100')
+
+    for inserted, message in (('[', 'CURLY does not match with SQUARE'),
+                              (')', 'ROUND does not match with CURLY')):
+        with pytest.raises(MismatchedParentheses, match=message):
+            document.edit(offset, 0, inserted)
+        assert expected(document.text) == (MismatchedParentheses, message)
+
+        document.edit(offset, 1, '')
+        assert document.tree == clouscript.loads(text)
+
+
+def test_old_tree():
+    # A tree which was read is not changed by later edits
+    text = 'a = {\n' + ';\n'.join(f'x{k} = [{k}]' for k in range(100)) + '\n}'
+    document = Document(text, chunk_size=16, section_size=64)
+
+    tree = document.tree
+    document.edit(text.index('x50'), 3, 'y')
+    document.edit(0, 1, 'b')
+
+    assert tree == clouscript.loads(text)
+    assert document.tree == clouscript.loads(document.text)
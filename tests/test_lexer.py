@@ -0,0 +1,57 @@
+import pytest
+
+import clouscript
+from clouscript.element import Element
+from clouscript.exceptions import InvalidRule
+from clouscript.grammar import default_grammar
+from clouscript.lexer import Lexer
+
+
+def lexer(*rules):
+    """Get a lexer which tries some rules before the default ones"""
+    return Lexer(solids=list(rules) + default_grammar().solids)
+
+
+def test_backreference():
+    heredoc = (r'<<(\w+)\n([\s\S]*?)\n\1', lambda g: ('HEREDOC', g[2]))
+    tree = clouscript.loads('x = <<END\nhi\nthere\nEND', lexer(heredoc))
+
+    assert tree.value[0].value[1] == Element('HEREDOC', 'hi\nthere')
+
+
+def test_named_group():
+    tag = (r'@(?P<tag>\w+)', lambda g: ('TAG', g[1]))
+    tree = clouscript.loads('@foo + 1', lexer(tag))
+
+    assert tree.value[0].value[0] == Element('TAG', 'foo')
+
+
+def test_invalid_rule():
+    with pytest.raises(InvalidRule):
+        lexer((r'(oops', lambda g: ('X', None)))
+
+
+def test_rules_of_tokens():
+    # A rule on its own before the joined ones is numbered after them
+    heredoc = (r'<<(\w+)\n([\s\S]*?)\n\1', lambda g: ('HEREDOC', g[2]))
+    rules = [heredoc] + default_grammar().solids
+    source = 'f(<<END\nhi\nEND) + 1'
+
+    stream = lexer(heredoc).tokens(source)
+    found = {stream.text(i): stream.rule(i) for i in range(len(stream))}
+
+    assert found['<<END\nhi\nEND'] is heredoc
+    assert found['('] is found[')'] is rules[1]
+    assert found[' '] is rules[4]
+
+
+def test_stats_of_rules():
+    heredoc = (r'<<(\w+)\n([\s\S]*?)\n\1', lambda g: ('HEREDOC', g[2]))
+    _, stats = clouscript.profile('f(<<END\nhi\nEND) + 1', lexer(heredoc))
+
+    matches = {(group, k): matched for group, k, _, matched, _ in stats.rules()}
+
+    assert matches['solids', 0] == 1
+    assert matches['solids', 1] == 2
+    assert matches['solids', 4] == 2
+    assert sum(matches.values()) == 8
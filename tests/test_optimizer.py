@@ -0,0 +1,28 @@
+import math
+
+import clouscript
+from clouscript.lexer import Lexer
+from clouscript.optimizer import optimize
+
+
+def test_negative_zero():
+    tree, _ = optimize(clouscript.loads('a = -0.0\nb = 0.0\nc = 0.0 * -1'))
+    values = [e.value[1].value for e in tree.value]
+
+    assert [math.copysign(1.0, v) for v in values] == [-1.0, 1.0, -1.0]
+
+
+def test_spans_are_kept():
+    # Identical elements from different places are not shared
+    tree, _ = optimize(clouscript.loads('x + x\ny = 1 + 2', Lexer(spans=True)))
+    add, set_ = tree.value
+
+    assert [e.span for e in add.value] == [(0, 1), (4, 5)]
+    assert set_.value[1].span == (10, 15)
+
+
+def test_sharing_keeps_the_tree():
+    source = 'a = 1 + 2 * 3\nb = [a, a, "s", "s"]\nf(-0.0, 0.0)'
+    tree, _ = optimize(clouscript.loads(source), fold=False)
+
+    assert tree == clouscript.loads(source)
@@ -0,0 +1,80 @@
+import threading
+
+import clouscript
+from clouscript.cache import ParseCache
+from clouscript.lexer import Lexer
+from clouscript import parallel
+from clouscript.parallel import ParallelParser
+
+from .corpus import sources, outcome
+
+
+def test_same_as_loads():
+    generated = sources(300, seed=3)
+
+    with ParallelParser(workers=2, chunk_size=1) as parallel:
+        for k in range(0, len(generated), 5):
+            source = '\n'.join(generated[k:k + 5])
+            assert outcome(parallel.loads, source) == outcome(clouscript.loads, source)
+
+
+def test_split_chunks():
+    # Splitting as a string is read gives the same parts as all at once
+    source = '\n'.join(sources(200, seed=4))
+
+    for chunk_size in (1, 16, 1000):
+        splitter = ParallelParser(chunk_size=chunk_size)
+        chunks = (source[k:k + 7] for k in range(0, len(source), 7))
+
+        assert list(splitter.split_chunks(chunks)) == splitter.split(source)
+
+
+def test_workers():
+    source = '\n'.join(f'x{k} = f({k}, [{k}])' for k in range(500))
+    assert clouscript.loads(source, workers=2, chunk_size=1024) == clouscript.loads(source)
+
+
+def test_spans():
+    # Elements from other processes would have no spans
+    source = '\n'.join(f'x{k} = f({k})' for k in range(200))
+    lexer = Lexer(spans=True)
+
+    tree = clouscript.loads(source, lexer, workers=2, chunk_size=64)
+    assert tree.value[1].span == clouscript.loads(source, lexer).value[1].span
+
+    cache = ParseCache()
+    clouscript.loads(source, lexer, workers=2, chunk_size=64, cache=cache)
+    assert clouscript.loads(source, lexer, cache=cache).value[1].span is not None
+
+
+def test_kept_while_used(monkeypatch):
+    # A pool replaced by another thread is not shut down under a call
+    # using it, and is shut down once the call is done
+    created = []
+
+    class Recorded(ParallelParser):
+        def __init__(self, *arguments):
+            super().__init__(*arguments)
+            created.append(self)
+
+    monkeypatch.setattr(parallel, 'ParallelParser', Recorded)
+
+    source = '\n'.join(f'x{k} = f({k})' for k in range(2000))
+    expected = clouscript.loads(source)
+    errors = []
+
+    def parse(chunk_size):
+        try:
+            for _ in range(3):
+                assert clouscript.loads(source, workers=2, chunk_size=chunk_size) == expected
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=parse, args=(size,)) for size in (1024, 2048, 4096)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert [p for p in created if p.executor is not None] == [clouscript._parallel]
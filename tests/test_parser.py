@@ -0,0 +1,115 @@
+import io
+import random
+
+import pytest
+
+import clouscript
+from clouscript import binary
+from clouscript.delimiters import Delimiters
+from clouscript.element import Element
+from clouscript.lexer import Lexer
+from clouscript.parser import Parser
+
+from .corpus import sources, statements, outcome
+
+
+SOURCES = sources(600)
+
+
+def test_compare_pipeline():
+    # Raises PipelineMismatch on any difference between the fused and staged pipelines
+    compare = Parser(pipeline='compare')
+
+    for source in SOURCES:
+        assert outcome(clouscript.loads, source, parser=compare) \
+            == outcome(clouscript.loads, source)
+
+
+def test_compare_pipeline_with_spans():
+    lexer = Lexer(spans=True)
+    compare = Parser(pipeline='compare')
+
+    for source in SOURCES:
+        assert outcome(clouscript.loads, source, lexer, compare) \
+            == outcome(clouscript.loads, source)
+
+
+def read(tree):
+    """Read every value of a tree, so that all of its sections are parsed"""
+
+    if isinstance(tree.value, tuple):
+        for element in tree.value:
+            read(element)
+
+    return tree
+
+
+def test_lazy():
+    lazy = Parser(lazy=True)
+
+    for source in SOURCES:
+        expected = outcome(clouscript.loads, source)
+        tree = outcome(lambda: read(clouscript.loads(source, parser=lazy)))
+
+        # The outer sections are read first, so another error may come first
+        if isinstance(expected, Element):
+            assert tree == expected
+        else:
+            assert not isinstance(tree, Element)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_load(chunk_size):
+    for source in SOURCES:
+        assert outcome(clouscript.load, io.StringIO(source), chunk_size=chunk_size) \
+            == outcome(clouscript.loads, source)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_iterload(chunk_size):
+    rnd = random.Random(0)
+
+    for _ in range(300):
+        source = statements(rnd)
+
+        # Only the top level of loads is grouped by delimiters
+        if any(d in source for d in ',;'):
+            continue
+
+        elements = clouscript.iterload(io.StringIO(source), chunk_size=chunk_size)
+        assert list(elements) == list(clouscript.loads(source).value)
+
+
+def test_local_flatten_mode():
+    parser = Parser(delimiters=Delimiters(';,', 'local'))
+    compare = Parser(delimiters=Delimiters(';,', 'local'), pipeline='compare')
+
+    for source in SOURCES:
+        assert outcome(clouscript.loads, source, parser=compare) \
+            == outcome(clouscript.loads, source, parser=parser)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_binary(lazy):
+    for source in SOURCES:
+        tree = outcome(clouscript.loads, source)
+
+        if not isinstance(tree, Element):
+            continue
+
+        # The types of the values are kept, such as true and 1
+        assert repr(binary.loads(binary.dumps(tree), lazy=lazy)) == repr(tree)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_binary_files(tmp_path, lazy):
+    tree = clouscript.loads('a = f(1, [true, 2.5], "b")\nc + 1')
+    path = tmp_path / 'tree.bin'
+
+    with open(path, 'wb') as fp:
+        binary.dump(tree, fp)
+
+    with open(path, 'rb') as fp:
+        assert repr(binary.load(fp, lazy=lazy)) == repr(tree)
+
+    assert repr(binary.load_mapped(path, lazy=lazy)) == repr(tree)
@@ -0,0 +1,82 @@
+import io
+
+import pytest
+
+import clouscript
+from clouscript import pull
+from clouscript.delimiters import Delimiters
+from clouscript.element import Element
+from clouscript.exceptions import EmptySection, MismatchedParentheses
+from clouscript.parser import Parser
+
+from .corpus import sources, outcome
+
+
+SOURCES = sources(1000, seed=3)
+
+
+def built(source, parser=None):
+    """Get the tree built from the events of a source"""
+    return pull.build(clouscript.events(source, parser=parser), parser)
+
+
+@pytest.mark.parametrize('parser', [None, Parser(delimiters=Delimiters(';,', 'local'))])
+def test_build_like_loads(parser):
+    for source in SOURCES:
+        expected = outcome(clouscript.loads, source, parser=parser)
+        tree = outcome(built, source, parser)
+
+        if isinstance(expected, Element):
+            # Unlike loads, a parenthesis left open is always an error, and so is
+            # a section of only a lower delimiter between two higher ones
+            if tree != expected:
+                assert tree[0] is MismatchedParentheses and tree[1].endswith('never closed') \
+                    or tree[0] is EmptySection and parser is not None
+        else:
+            # Errors are raised as soon as they are found, so another may come first
+            assert not isinstance(tree, Element)
+
+
+def test_order():
+    # The events come in the order in which the elements are finished
+    kinds = [(kind, value if isinstance(value, str) else value.value)
+             for kind, value in clouscript.events('a + f(b)')]
+
+    assert kinds == [
+        (pull.ENTER, ''),
+        (pull.TOKEN, 'a'),
+        (pull.TOKEN, 'f'),
+        (pull.ENTER, 'ROUND'),
+        (pull.TOKEN, 'b'),
+        (pull.LEAVE, 'ROUND'),
+        (pull.CALL, 'CALL'),
+        (pull.INFIX, 'ADD'),
+        (pull.LEAVE, ''),
+    ]
+
+
+def test_delimiters():
+    events = list(clouscript.events('a; b, c'))
+
+    assert [value for kind, value in events if kind == pull.DELIMITER] == [';', ',']
+    assert built('a; b, c') == clouscript.loads('a; b, c')
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 4096])
+def test_iterevents(chunk_size):
+    for source in SOURCES[:300]:
+        assert outcome(lambda: list(clouscript.iterevents(io.StringIO(source),
+                                                          chunk_size=chunk_size))) \
+            == outcome(lambda: list(clouscript.events(source)))
+
+
+def test_lazily():
+    # Events are given before the rest of the elements are read
+    def elements():
+        yield from clouscript.default_lexer().lex('a + b')
+        raise AssertionError('Read past the first events')
+
+    events = clouscript.default_parser().events(elements())
+
+    assert next(events) == (pull.ENTER, '')
+    assert next(events)[1].value == 'a'
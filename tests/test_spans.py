@@ -0,0 +1,72 @@
+import pytest
+
+import clouscript
+from clouscript.cache import ParseCache
+from clouscript.exceptions import EmptySection, MismatchedParentheses, UnmatchedInfix
+from clouscript.lexer import Lexer
+
+
+@pytest.mark.parametrize('source, error, span', [
+    # Infixes beside each other, across lines
+    ('a +\n+ b', UnmatchedInfix, (4, 5)),
+    # Empty sections of the top level
+    ('a ; ; b', EmptySection, (0, 7)),
+    # A right-hand parenthesis which is never opened
+    ('a)', MismatchedParentheses, (1, 2)),
+])
+def test_top_level_errors(source, error, span):
+    with pytest.raises(error) as raised:
+        clouscript.loads(source, Lexer(spans=True))
+
+    assert raised.value.span == span
+
+
+def test_fingerprint():
+    assert Lexer().fingerprint() != Lexer(spans=True).fingerprint()
+
+
+def test_cache():
+    # A tree without spans is never given where one with spans is asked for
+    cache = ParseCache()
+    source = 'a = f(b, 1)'
+
+    clouscript.loads(source, Lexer(), cache=cache)
+    tree = clouscript.loads(source, Lexer(spans=True), cache=cache)
+
+    assert tree.value[0].span == (0, len(source))
+    assert tree.value[0].value[0].span == (0, 1)
+
+
+def test_looked_up_later():
+    # Spans are right even after elements made before them are let go of
+    # and their identities are given to others
+    lexer = Lexer(spans=True)
+    trees = []
+
+    for k in range(200):
+        source = ' ' * k + 'f(a + [b, 2]) ; c'
+        tree = clouscript.loads(source, lexer)
+        clouscript.loads('x (y)', lexer)
+        trees.append((k, source, tree))
+
+    for k, source, tree in trees:
+        call, c = tree.value
+        assert call.span == (k, k + 13)
+        assert c.span == (len(source) - 1, len(source))
+
+        add = call.value[1]
+        assert add.span == (k + 2, k + 12)
+        assert add.value[1].span == (k + 6, k + 12)
+
+
+def test_pickle():
+    # Trees with spans are pickled with the offsets of every element
+    import pickle
+    from clouscript.element import Spanned
+
+    tree = clouscript.loads('a = f(b + 1)', Lexer(spans=True))
+    loaded = pickle.loads(pickle.dumps(tree))
+
+    assert loaded == tree
+    assert type(loaded.value[0]) is Spanned
+    assert loaded.value[0].value[1].span == tree.value[0].value[1].span == (4, 12)
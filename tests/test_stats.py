@@ -0,0 +1,93 @@
+import pytest
+
+import clouscript
+from clouscript.element import Element
+from clouscript.lexer import Lexer
+from clouscript.parser import Parser
+from clouscript.stats import Stats
+
+from .corpus import sources, outcome
+
+
+SOURCES = sources(200, seed=2)
+
+
+def read(tree):
+    """Read every value of a tree, so that all of its sections are parsed"""
+
+    if isinstance(tree, Element) and isinstance(tree.value, tuple):
+        for element in tree.value:
+            read(element)
+
+    return tree
+
+
+def spanned(tree):
+    """Get the spans of the elements of a tree, in order"""
+
+    if not isinstance(tree, Element):
+        return []
+
+    found = [getattr(tree, 'span', None)]
+
+    if isinstance(tree.value, tuple):
+        for element in tree.value:
+            found.extend(spanned(element))
+
+    return found
+
+
+@pytest.mark.parametrize('pipeline', ['fused', 'staged', 'compare'])
+@pytest.mark.parametrize('lazy', [False, True])
+@pytest.mark.parametrize('spans', [False, True])
+def test_profile_like_loads(pipeline, lazy, spans):
+    # The tree is the one the parser and lexer give to loads
+    lexer = Lexer(spans=spans)
+    parser = Parser(pipeline=pipeline, lazy=lazy)
+
+    for source in SOURCES:
+        expected = outcome(lambda: read(clouscript.loads(source, lexer, parser)))
+        profiled = outcome(lambda: read(clouscript.profile(source, lexer, parser)[0]))
+
+        assert profiled == expected
+        assert outcome(spanned, profiled) == outcome(spanned, expected)
+
+
+def test_profile_stages():
+    # The stages are only timed apart when the pipeline reduces in stages
+    source = 'a = f(b, [1, 2]) + {c; 3}'
+
+    _, stats = clouscript.profile(source, parser=Parser(pipeline='staged'))
+    assert all(stats.times[stage] > 0 for stage in Stats.STAGES)
+
+    _, stats = clouscript.profile(source, parser=Parser(pipeline='fused'))
+    assert stats.times['structure'] == 0 and stats.times['parse'] > 0
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_counts(lazy):
+    tree, stats = clouscript.profile('a = f(b, [1, {c}]) + (d) // e', parser=Parser(lazy=lazy))
+    read(tree)
+
+    # Spaces and the comment are tokens, but not elements
+    assert stats.tokens == 26
+    assert stats.elements == (14 if lazy else 18)
+    assert stats.sections == 4
+    assert stats.depth == 3
+    assert sum(stats.kinds.values()) == stats.tokens
+
+
+def test_callback():
+    timed = []
+    _, stats = clouscript.profile('f(a + b)', parser=Parser(pipeline='staged'),
+                                  callback=lambda stage, elapsed: timed.append(stage))
+
+    assert {'lex', 'encapsulate', 'structure', 'segment', 'parse'} == set(timed)
+
+
+def test_profile_subclass():
+    class Custom(Parser):
+        pass
+
+    with pytest.raises(ValueError):
+        clouscript.profile('a', parser=Custom())
@@ -0,0 +1,60 @@
+import io
+
+import random
+
+import clouscript
+from clouscript.grammar import Grammar
+from clouscript.lexer import Lexer
+from clouscript.parser import Parser
+
+from .corpus import sources, statements, outcome
+
+
+def test_load_delimited_top_level():
+    # The top level is segmented by its delimiters, as by loads
+    for source in ['a; b', 'a, b; c', 'f(a);\ng(b)\n;h', 'a ; ; b']:
+        for chunk_size in [1, 3, 4096]:
+            assert outcome(clouscript.load, io.StringIO(source), chunk_size=chunk_size) \
+                == outcome(clouscript.loads, source)
+
+
+class Reader(io.StringIO):
+    """A file which counts how much of it has been read"""
+
+    def __init__(self, string):
+        super().__init__(string)
+        self.count = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.count += len(chunk)
+        return chunk
+
+
+def test_one_line_is_not_held_whole():
+    # Elements of a single line are passed on once a delimiter follows them
+    source = '; '.join(f'x = f({k}, "a;b", [1, 2.5])' for k in range(1000))
+    fp = Reader(source)
+
+    elements = clouscript.iterload(fp, chunk_size=64)
+    first = next(elements)
+
+    assert fp.count < 256
+    assert [first, *elements] == list(clouscript.loads(source).value)
+
+
+def test_one_line():
+    rnd = random.Random(5)
+    grammar = Grammar(arrays=2)
+    arrays = Lexer(grammar=grammar), Parser(grammar=grammar)
+
+    generated = [statements(rnd).replace('\n', '; ') for _ in range(100)]
+    generated += [source.replace('\n', ' ') for source in sources(200, seed=5)]
+    generated += ['a = [1, 2, 3, 4]; b = [1.5, -2.5, 3.5]; c = "x;y"; d = [1, a]']
+
+    for source in generated:
+        for chunk_size in [1, 2, 5, 16]:
+            assert outcome(clouscript.load, io.StringIO(source), chunk_size=chunk_size) \
+                == outcome(clouscript.loads, source)
+            assert outcome(clouscript.load, io.StringIO(source), *arrays, chunk_size=chunk_size) \
+                == outcome(clouscript.loads, source, *arrays)
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+
+import clouscript
+from clouscript.element import Element
+from clouscript.exceptions import ClouScriptException
+from clouscript.lexer import Lexer
+from clouscript.parser import Parser
+
+from .corpus import sources, outcome
+
+
+SOURCES = sources(400, seed=4)
+
+
+def together(function, count=4):
+    """Call a function in a number of threads started at once,
+    giving back what each of them gave or raised"""
+
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(k):
+        barrier.wait()
+        try:
+            results[k] = function()
+        except Exception as error:
+            results[k] = error
+
+    threads = [threading.Thread(target=run, args=(k,)) for k in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return results
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_loads_many(workers):
+    # The trees come in the same order as the strings
+    trees = [outcome(clouscript.loads, source) for source in SOURCES]
+    formed = [source for source, tree in zip(SOURCES, trees) if isinstance(tree, Element)]
+
+    assert clouscript.loads_many(formed, workers=workers) \
+        == [tree for tree in trees if isinstance(tree, Element)]
+
+
+def test_loads_many_error():
+    # The first error is raised, with the source it was found in
+    with pytest.raises(ClouScriptException) as info:
+        clouscript.loads_many(['a', 'b ) c', 'd'], workers=2)
+
+    assert info.value.source == 'b ) c'
+
+
+def test_default_once(monkeypatch):
+    # Threads asking for the default lexer and parser at once all get the same ones
+    monkeypatch.setattr(clouscript, '_lexer', None)
+    monkeypatch.setattr(clouscript, '_parser', None)
+
+    lexers = together(clouscript.default_lexer)
+    parsers = together(clouscript.default_parser)
+
+    assert all(lexer is lexers[0] for lexer in lexers)
+    assert all(parser is parsers[0] for parser in parsers)
+
+
+def test_shared_lexer_compiled_again():
+    # A lexer lexes the same while another thread compiles its rules again
+    lexer = Lexer()
+    source = '\n'.join(SOURCES[:100])
+    expected = outcome(lambda: list(lexer.lex(source)))
+    running = True
+
+    def compile_again():
+        while running:
+            lexer.compile()
+
+    compiler = threading.Thread(target=compile_again)
+    compiler.start()
+
+    try:
+        results = together(lambda: outcome(lambda: list(lexer.lex(source))))
+    finally:
+        running = False
+        compiler.join()
+
+    assert all(result == expected for result in results)
+
+
+def test_lazy_read_at_once():
+    # Threads reading the sections of a lazy tree at once all get the same values
+    lazy = Parser(lazy=True)
+    source = '\n'.join(f'x{k} = f({k}, [{k}, {{a; b}}])' for k in range(200))
+    tree = clouscript.loads(source, parser=lazy)
+
+    def read(element=tree):
+        if isinstance(element.value, tuple):
+            for inner in element.value:
+                read(inner)
+        return element
+
+    assert all(result == clouscript.loads(source) for result in together(read))
@@ -0,0 +1,35 @@
+import pytest
+
+import clouscript
+
+numpy = pytest.importorskip('numpy')
+
+from clouscript.vector import VectorCompiler
+
+
+@pytest.mark.parametrize('chunk_size', [None, 3, 100])
+def test_broadcast(chunk_size):
+    # A result which does not depend on any column still has every row
+    columns = {'x': numpy.arange(10.0), 'k': 2}
+    result = VectorCompiler().evaluate(clouscript.loads('1 + k'), columns, chunk_size)
+
+    assert result.shape == (10,)
+    assert (result == 3).all()
+
+
+@pytest.mark.parametrize('chunk_size', [None, 3])
+def test_columns(chunk_size):
+    columns = {'x': numpy.arange(10.0), 'y': numpy.ones(10)}
+    result = VectorCompiler().evaluate(clouscript.loads('x * 2 + y'), columns, chunk_size)
+
+    assert (result == numpy.arange(10.0) * 2 + 1).all()
+
+
+@pytest.mark.parametrize('chunk_size', [None, 3, 100])
+def test_columns_kept(chunk_size):
+    # Variables set by the tree are not added to the columns given
+    columns = {'x': numpy.arange(10.0)}
+    result = VectorCompiler().evaluate(clouscript.loads('y = x + 1'), columns, chunk_size)
+
+    assert (result == numpy.arange(10.0) + 1).all()
+    assert list(columns) == ['x']